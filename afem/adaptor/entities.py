@@ -21,11 +21,26 @@ from OCCT.Adaptor3d import Adaptor3d_Curve, Adaptor3d_Surface
 from OCCT.BRepAdaptor import (BRepAdaptor_Curve, BRepAdaptor_CompCurve,
                               BRepAdaptor_Surface)
 from OCCT.GCPnts import GCPnts_AbscissaPoint
+from OCCT.GeomAbs import GeomAbs_Shape
 from OCCT.GeomAdaptor import GeomAdaptor_Curve, GeomAdaptor_Surface
+from OCCT.Precision import Precision
+from OCCT.TColStd import TColStd_Array1OfReal
+from numpy import (abs as np_abs, array, clip, concatenate, cumsum, float64,
+                   linspace, searchsorted, where, zeros)
+from numpy.linalg import norm
+from numpy.polynomial.legendre import leggauss
+
+from afem.occ.utils import (eval_curve_array, eval_surface_array,
+                            eval_surface_norm_array,
+                            to_np_from_tcolstd_array1_real)
 
 __all__ = ["AdaptorBase", "AdaptorCurve", "GeomAdaptorCurve",
            "EdgeAdaptorCurve", "WireAdaptorCurve",
-           "AdaptorSurface", "GeomAdaptorSurface", "FaceAdaptorSurface"]
+           "AdaptorSurface", "GeomAdaptorSurface", "FaceAdaptorSurface",
+           "ArcLengthTable"]
+
+# Number of Gauss-Legendre points for the arc-length integrals
+_NGAUSS = 8
 
 
 class AdaptorBase(object):
@@ -56,6 +71,10 @@ class AdaptorCurve(AdaptorBase):
     # Expected type
     _OCC_TYPE = Adaptor3d_Curve
 
+    def __init__(self, obj):
+        super(AdaptorCurve, self).__init__(obj)
+        self._arc_tables = {}
+
     @property
     def object(self):
         """
@@ -149,6 +168,29 @@ class AdaptorCurve(AdaptorBase):
 
         return Vector(self.object.DN(u, d).XYZ())
 
+    def eval_array(self, u):
+        """
+        Evaluate points on the curve at many parameters.
+
+        :param array_like u: Curve parameters.
+
+        :return: Array of curve points with shape (N, 3).
+        :rtype: numpy.ndarray
+        """
+        return eval_curve_array(self.object, u)
+
+    def deriv_array(self, u, d=1):
+        """
+        Evaluate derivatives on the curve at many parameters.
+
+        :param array_like u: Curve parameters.
+        :param int d: Derivative to evaluate.
+
+        :return: Array of curve derivatives with shape (N, 3).
+        :rtype: numpy.ndarray
+        """
+        return eval_curve_array(self.object, u, d)
+
     def arc_length(self, u1, u2, tol=1.0e-7):
         """
         Calculate the curve length between the parameters.
@@ -164,6 +206,20 @@ class AdaptorCurve(AdaptorBase):
             u1, u2 = u2, u1
         return GCPnts_AbscissaPoint.Length_(self.object, u1, u2, tol)
 
+    def arc_length_table(self, tol=1.0e-7):
+        """
+        Get the arc-length table of the adaptor curve. The table is built on
+        the first request and cached for each tolerance.
+
+        :param float tol: The tolerance.
+
+        :return: The arc-length table.
+        :rtype: afem.adaptor.entities.ArcLengthTable
+        """
+        if tol not in self._arc_tables:
+            self._arc_tables[tol] = ArcLengthTable(self, tol)
+        return self._arc_tables[tol]
+
     @staticmethod
     def to_adaptor(entity):
         """
@@ -377,6 +433,55 @@ class AdaptorSurface(AdaptorBase):
         dv = self.deriv(u, v, 0, 1)
         return Vector(du.Crossed(dv).XYZ())
 
+    def eval_array(self, u, v, grid=False):
+        """
+        Evaluate points on the surface at many parameters.
+
+        :param array_like u: Surface u-parameters.
+        :param array_like v: Surface v-parameters.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+
+        :return: Array of surface points with shape (N, 3), or with shape
+            (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+        """
+        return eval_surface_array(self.object, u, v, grid=grid)
+
+    def deriv_array(self, u, v, nu, nv, grid=False):
+        """
+        Evaluate derivatives on the surface at many parameters.
+
+        :param array_like u: Surface u-parameters.
+        :param array_like v: Surface v-parameters.
+        :param int nu: Derivative in u-direction.
+        :param int nv: Derivative in v-direction.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+
+        :return: Array of surface derivatives with shape (N, 3), or with
+            shape (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+        """
+        return eval_surface_array(self.object, u, v, nu, nv, grid)
+
+    def norm_array(self, u, v, grid=False, unit=True):
+        """
+        Evaluate normals on the surface at many parameters.
+
+        :param array_like u: Surface u-parameters.
+        :param array_like v: Surface v-parameters.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+        :param bool unit: Option to return unit normals. If *False* the
+            normals have the same length as those from :meth:`.norm`.
+
+        :return: Array of surface normals with shape (N, 3), or with shape
+            (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+        """
+        return eval_surface_norm_array(self.object, u, v, grid, unit)
+
     @staticmethod
     def to_adaptor(entity):
         """
@@ -463,3 +568,197 @@ class FaceAdaptorSurface(AdaptorSurface):
         """
         adp_srf = BRepAdaptor_Surface(face.object, restrict)
         return cls(adp_srf)
+
+
+class ArcLengthTable(object):
+    """
+    Monotone map between the parameter and the arc length of a curve. The
+    curve domain is split at its C2 breaks and the segments are refined
+    until the Gauss-Legendre length of each segment is within the tolerance.
+    Queries are answered in batch by interpolating the table and refining
+    with Newton iterations, so the curve length is not integrated from
+    scratch for every query.
+
+    :param afem.adaptor.entities.AdaptorCurve adp_crv: The curve. Its domain
+        must be finite.
+    :param float tol: The tolerance of the total length.
+
+    :raise ValueError: If the curve domain is infinite.
+
+    .. note::
+
+        Distances are measured from the first parameter of the table and
+        parameters outside the domain are clamped to it. The table is not
+        updated if the curve is modified.
+    """
+
+    def __init__(self, adp_crv, tol=1.0e-7):
+        u1, u2 = adp_crv.u1, adp_crv.u2
+        if Precision.IsInfinite_(u1) or Precision.IsInfinite_(u2):
+            raise ValueError('Curve domain must be finite.')
+
+        self._adp_crv = adp_crv
+        self._tol = tol
+        self._x, self._w = leggauss(_NGAUSS)
+
+        # Split at the continuity breaks
+        nb = adp_crv.object.NbIntervals(GeomAbs_Shape.GeomAbs_C2)
+        tcol_array = TColStd_Array1OfReal(1, nb + 1)
+        adp_crv.object.Intervals(tcol_array, GeomAbs_Shape.GeomAbs_C2)
+        breaks = to_np_from_tcolstd_array1_real(tcol_array)
+        breaks = [min(max(ui, u1), u2) for ui in breaks]
+        breaks = sorted(set([u1, u2] + breaks))
+        a = concatenate([linspace(ui, uj, 5)[:-1]
+                         for ui, uj in zip(breaks[:-1], breaks[1:])])
+        b = concatenate([linspace(ui, uj, 5)[1:]
+                         for ui, uj in zip(breaks[:-1], breaks[1:])])
+
+        # Refine the segments until the length of each is converged
+        du = u2 - u1
+        done_a, done_b, done_s = [], [], []
+        for _ in range(50):
+            if a.size == 0:
+                break
+            m = 0.5 * (a + b)
+            coarse = self._gauss(a, b)
+            fine = self._gauss(a, m) + self._gauss(m, b)
+            ok = np_abs(fine - coarse) <= tol * (b - a) / du
+            done_a.append(a[ok])
+            done_b.append(b[ok])
+            done_s.append(fine[ok])
+            a = concatenate((a[~ok], m[~ok]))
+            b = concatenate((m[~ok], b[~ok]))
+        if a.size > 0:
+            done_a.append(a)
+            done_b.append(b)
+            done_s.append(self._gauss(a, b))
+
+        a = concatenate(done_a)
+        indx = a.argsort()
+        self._u = concatenate((a[indx], concatenate(done_b)[indx][-1:]))
+        self._s = concatenate(([0.], cumsum(concatenate(done_s)[indx])))
+
+    @property
+    def adaptor(self):
+        """
+        :return: The adaptor curve.
+        :rtype: afem.adaptor.entities.AdaptorCurve
+        """
+        return self._adp_crv
+
+    @property
+    def tol(self):
+        """
+        :return: The tolerance.
+        :rtype: float
+        """
+        return self._tol
+
+    @property
+    def u1(self):
+        """
+        :return: The first parameter.
+        :rtype: float
+        """
+        return self._u[0]
+
+    @property
+    def u2(self):
+        """
+        :return: The last parameter.
+        :rtype: float
+        """
+        return self._u[-1]
+
+    @property
+    def length(self):
+        """
+        :return: The curve length.
+        :rtype: float
+        """
+        return self._s[-1]
+
+    def distance(self, u):
+        """
+        Calculate the arc length from the first parameter.
+
+        :param array_like u: The parameters.
+
+        :return: The distances.
+        :rtype: numpy.ndarray
+        """
+        u = clip(array(u, dtype=float64).ravel(), self._u[0], self._u[-1])
+        i = self._segment(self._u, u)
+        return self._s[i] + self._gauss(self._u[i], u)
+
+    def parameter(self, s, tol=None):
+        """
+        Find the parameters at the arc lengths from the first parameter.
+
+        :param array_like s: The distances.
+        :param float tol: The tolerance of the distance. The table tolerance
+            is used by default.
+
+        :return: The parameters.
+        :rtype: numpy.ndarray
+        """
+        if tol is None:
+            tol = self._tol
+        s = clip(array(s, dtype=float64).ravel(), 0., self._s[-1])
+        i = self._segment(self._s, s)
+        ua = self._u[i]
+        lo, hi = ua.copy(), self._u[i + 1].copy()
+        s0, ds = self._s[i], self._s[i + 1] - self._s[i]
+
+        # Linear interpolation of the table for the first guess
+        t = where(ds > 0., (s - s0) / where(ds > 0., ds, 1.), 0.)
+        u = lo + t * (hi - lo)
+
+        # Newton iterations kept inside the bracket of the segment
+        for _ in range(20):
+            f = s0 + self._gauss(ua, u) - s
+            active = np_abs(f) > tol
+            if not active.any():
+                break
+            lo = where(active & (f < 0.), u, lo)
+            hi = where(active & (f > 0.), u, hi)
+            speed = norm(self._adp_crv.deriv_array(u, 1), axis=1)
+            un = u - f / where(speed > 0., speed, 1.)
+            bad = (speed <= 0.) | (un < lo) | (un > hi)
+            un = where(bad, 0.5 * (lo + hi), un)
+            u = where(active, un, u)
+        return u
+
+    def arc_length(self, u1, u2):
+        """
+        Calculate the curve length between the parameters.
+
+        :param float u1: First parameter.
+        :param float u2: Last parameter.
+
+        :return: Curve length.
+        :rtype: float
+        """
+        s1, s2 = self.distance([u1, u2])
+        return abs(s2 - s1)
+
+    def _gauss(self, a, b):
+        """
+        Integrate the curve speed between the parameters.
+        """
+        a = array(a, dtype=float64)
+        b = array(b, dtype=float64)
+        if a.size == 0:
+            return zeros(0, dtype=float64)
+        h = 0.5 * (b - a)
+        x = (0.5 * (a + b))[:, None] + h[:, None] * self._x[None, :]
+        speed = norm(self._adp_crv.deriv_array(x.ravel(), 1), axis=1)
+        return h * speed.reshape(x.shape).dot(self._w)
+
+    @staticmethod
+    def _segment(values, x):
+        """
+        Find the segment index of each value.
+        """
+        i = searchsorted(values, x, side='right') - 1
+        return clip(i, 0, values.size - 2)
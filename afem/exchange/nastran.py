@@ -17,18 +17,58 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
-__all__ = ["export_bdf"]
+from array import array
 
+from numpy import (arange, argmin, empty, eye, frombuffer, full, int64,
+                   zeros)
 
-def export_bdf(the_mesh, fn):
+from afem.config import logger
+
+__all__ = ["export_bdf", "import_bdf"]
+
+# Number of cards formatted and written in a single block
+_CHUNK_SIZE = 50000
+
+# Dummy material properties
+_E = 1.0e7
+_NU = 0.3
+
+# Cards supported by the importer
+_CARDS = {'GRID', 'CTRIA3', 'CQUAD4', 'CBAR'}
+
+
+def export_bdf(the_mesh, fn, fmt='small', chunk_size=_CHUNK_SIZE,
+               parts=None):
     """
     Export groups of parts to Nastran bulk data format (only nodes and
     elements). Dummy materials and properties are applied to enable import into
     some pre-processors. Intended for development and debugging. Only supports
-    tri and quad elements for now.
+    tri, quad, and bar elements for now.
+
+    The node coordinates and element connectivity are gathered into arrays in
+    a single pass over the mesh data structure (see
+    :meth:`.MeshDS.node_arrays` and :meth:`.MeshDS.face_arrays`). Cards are
+    then formatted and written in blocks of *chunk_size* to avoid per-field
+    file writes.
+
+    If *parts* are provided, the elements are written part by part from
+    their mesh groups. Each part gets its own material and property cards
+    using the part ID. Surface parts with elements in their face group get a
+    PSHELL and CTRIA3/CQUAD4 elements, otherwise the edge group is used for a
+    PBAR and CBAR elements. The elements are renumbered sequentially
+    starting at one so that each part occupies a contiguous range of element
+    ID's, which is recorded in a "$ PART" comment before its elements. The
+    element ID's in the file therefore do not match those of the mesh, while
+    the node ID's are kept.
 
     :param afem.smesh.entities.Mesh the_mesh: The mesh.
     :param str fn: The filename.
+    :param str fmt: The field format ('small', 'large', or 'free').
+    :param int chunk_size: The number of cards formatted and written at once.
+    :param parts: The parts to export. The parts should have been
+        initialized for meshing with *the_mesh*. If not provided, all face
+        elements of the mesh are written with a single dummy property.
+    :type parts: collections.Sequence(afem.structure.entities.Part) or None
 
     :return: *True* if done, *False* if not.
     :rtype: bool
@@ -44,48 +84,21 @@ def export_bdf(the_mesh, fn):
 
     fout.write("BEGIN BULK\n")
 
-    # Dummy property for shells.
-    fout.write("%-8s" % "PSHELL")
-    # PID
-    _write_field(1, fout)
-    # MID
-    _write_field(1, fout)
-    # T
-    _write_field(1., fout)
-    fout.write('\n')
+    if parts is None:
+        # Dummy property for shells.
+        _write_cards(fout, 'PSHELL', [[1], [1], [1.]], fmt, chunk_size)
 
     # Write grids.
-    for node in the_mesh.ds.node_iter:
-        fout.write("%-8s" % "GRID")
-        # ID
-        _write_field(node.id, fout)
-        # CP
-        _write_field(None, fout)
-        # X1
-        _write_field(node.x, fout)
-        # X2
-        _write_field(node.y, fout)
-        # X3
-        _write_field(node.z, fout)
-        # CD
-        _write_field(None, fout)
-        fout.write('\n')
+    nids, xyz = the_mesh.ds.node_arrays()
+    _write_grids(fout, nids, xyz, fmt, chunk_size)
 
     # Write elements.
-    for elm in the_mesh.ds.faces_iter:
-        if elm.is_tri:
-            fout.write("%-8s" % "CTRIA3")
-        elif elm.is_quad:
-            fout.write("%-8s" % "CQUAD4")
-        else:
-            continue
-        # EID
-        _write_field(elm.id, fout)
-        # PID
-        _write_field(1, fout)
-        for nid in elm.nids:
-            _write_field(nid, fout)
-        fout.write('\n')
+    if parts is None:
+        eids, conn, nnodes = _linear_faces(*the_mesh.ds.face_arrays())
+        pids = [1] * eids.size
+        _write_shells(fout, eids, pids, conn, nnodes, fmt, chunk_size)
+    else:
+        _write_parts(fout, parts, nids, xyz, fmt, chunk_size)
 
     fout.write("ENDDATA")
 
@@ -93,10 +106,408 @@ def export_bdf(the_mesh, fn):
     return True
 
 
+def import_bdf(the_mesh, fn, part_groups=True, ranges=None):
+    """
+    Import nodes and elements from a Nastran bulk data file into a mesh. The
+    file is streamed line by line and only GRID, CTRIA3, CQUAD4, and CBAR
+    cards are read. Small, large, and free field formats are supported.
+    Node and element ID's are preserved so the mesh should be empty. Grid
+    coordinate systems are not supported and are assumed to be basic.
+
+    The cards are parsed into compact arrays first so that the nodes can be
+    bulk-inserted into the mesh data structure before the elements, without
+    creating any intermediate node or element wrappers.
+
+    :param afem.smesh.entities.Mesh the_mesh: The mesh.
+    :param str fn: The filename.
+    :param bool part_groups: Option to create element groups for parts
+        using element ID ranges. The ranges are read from the "$ PART"
+        comments written by :func:`export_bdf` unless *ranges* is provided.
+    :param dict ranges: Dictionary where the key is the part name and the
+        value is a tuple of the first and last element ID of the part.
+
+    :return: Dictionary of the created groups where the key is the part name
+        and the value is a face or edge group.
+    :rtype: dict(str, afem.smesh.entities.MeshGroup)
+    """
+    nids = array('q')
+    xyz = array('d')
+    fids = array('q')
+    fconn = array('q')
+    bids = array('q')
+    bconn = array('q')
+    bdf_ranges = {}
+
+    # Parse cards. Large field cards may need their continuation line.
+    pending = None
+    with open(fn, 'r') as fin:
+        for line in fin:
+            if pending is not None:
+                if line[:1] == '*':
+                    fields = pending + _large_fields(line)
+                    name = fields.pop(0)
+                    _store_card(name, fields, nids, xyz, fids, fconn, bids,
+                                bconn)
+                    pending = None
+                    continue
+                name = pending.pop(0)
+                _store_card(name, pending, nids, xyz, fids, fconn, bids,
+                            bconn)
+                pending = None
+
+            if line[:1] == '$':
+                if line.startswith('$ PART'):
+                    data = line.split(None, 5)
+                    if len(data) == 6:
+                        bdf_ranges[data[5].rstrip('\n')] = (int(data[3]),
+                                                             int(data[4]))
+                continue
+
+            if ',' in line[:9]:
+                fields = [f.strip() for f in line.rstrip('\n').split(',')]
+                name = fields.pop(0).rstrip('*').upper()
+            else:
+                name = line[:8].strip().upper()
+                if name.endswith('*'):
+                    if name[:-1] in _CARDS:
+                        pending = [name[:-1]] + _large_fields(line)
+                    continue
+                fields = _small_fields(line)
+
+            if name in _CARDS:
+                _store_card(name, fields, nids, xyz, fids, fconn, bids, bconn)
+
+        if pending is not None:
+            name = pending.pop(0)
+            _store_card(name, pending, nids, xyz, fids, fconn, bids, bconn)
+
+    # Bulk insert nodes and then elements
+    ds = the_mesh.ds.object
+    for i, nid in enumerate(nids):
+        j = 3 * i
+        ds.AddNodeWithID(xyz[j], xyz[j + 1], xyz[j + 2], nid)
+
+    for i, eid in enumerate(fids):
+        n1, n2, n3, n4 = fconn[4 * i:4 * i + 4]
+        if n4 > 0:
+            ds.AddFaceWithID(n1, n2, n3, n4, eid)
+        else:
+            ds.AddFaceWithID(n1, n2, n3, eid)
+
+    for i, eid in enumerate(bids):
+        ds.AddEdgeWithID(bconn[2 * i], bconn[2 * i + 1], eid)
+
+    msg = 'Imported {} nodes, {} faces, and {} edges from {}.'
+    logger.info(msg.format(len(nids), len(fids), len(bids), fn))
+
+    # Bind elements to part groups by element ID range
+    groups = {}
+    if not part_groups:
+        return groups
+    if ranges is None:
+        ranges = bdf_ranges
+    face_ids = frombuffer(fids, dtype=int64)
+    bar_ids = frombuffer(bids, dtype=int64)
+    for name in ranges:
+        eid1, eid2 = ranges[name]
+        in_range = face_ids[(face_ids >= eid1) & (face_ids <= eid2)]
+        type_, suffix = the_mesh.FACE, 'faces'
+        if in_range.size == 0:
+            in_range = bar_ids[(bar_ids >= eid1) & (bar_ids <= eid2)]
+            type_, suffix = the_mesh.EDGE, 'edges'
+        group = the_mesh.create_group(' '.join([name, suffix]), type_)
+        group_ds = group.object.GetGroupDS()
+        for eid in in_range.tolist():
+            group_ds.Add(eid)
+        groups[name] = group
+
+    return groups
+
+
+def _store_card(name, fields, nids, xyz, fids, fconn, bids, bconn):
+    """
+    Store the data of a supported card in the arrays.
+    """
+    if name == 'GRID':
+        if fields[1] and int(fields[1]) != 0:
+            msg = 'Grid coordinate systems are not supported. Using basic.'
+            logger.warning(msg)
+        nids.append(int(fields[0]))
+        xyz.extend([_parse_float(f) for f in fields[2:5]])
+    elif name == 'CTRIA3':
+        fids.append(int(fields[0]))
+        fconn.extend([int(f) for f in fields[2:5]] + [0])
+    elif name == 'CQUAD4':
+        fids.append(int(fields[0]))
+        fconn.extend([int(f) for f in fields[2:6]])
+    elif name == 'CBAR':
+        bids.append(int(fields[0]))
+        bconn.extend([int(f) for f in fields[2:4]])
+
+
+def _small_fields(line):
+    """
+    Split a small field line into its data fields.
+    """
+    return [line[i:i + 8].strip() for i in range(8, 72, 8)]
+
+
+def _large_fields(line):
+    """
+    Split a large field line into its data fields.
+    """
+    return [line[i:i + 16].strip() for i in range(8, 72, 16)]
+
+
+def _parse_float(str_val):
+    """
+    Convert a Nastran real field to a float, including the implied exponent
+    forms like "1.0+7" and "-.5-3".
+    """
+    try:
+        return float(str_val)
+    except ValueError:
+        pass
+
+    # Also tolerate a doubled exponent sign like "1++20"
+    str_val = str_val.upper().replace('D', 'E').replace('++', '+')
+    for i in range(len(str_val) - 1, 0, -1):
+        if str_val[i] in '+-' and str_val[i - 1] != 'E':
+            return float(str_val[:i] + 'E' + str_val[i:])
+    return float(str_val)
+
+
+def _write_parts(fout, parts, nids, xyz, fmt='small',
+                 chunk_size=_CHUNK_SIZE):
+    """
+    Write material, property, and element cards part by part. Only the
+    elements of the current part are held in memory.
+    """
+    # Map node ID's to rows of the coordinate array for bar orientations
+    if nids.size > 0:
+        rows = full(nids.max() + 1, -1, dtype=int64)
+        rows[nids] = arange(nids.size)
+    else:
+        rows = empty(0, dtype=int64)
+
+    eid = 1
+    for part in parts:
+        try:
+            face_group = part.face_group
+            edge_group = part.edge_group
+        except AttributeError:
+            continue
+
+        pid = part.id
+        if not face_group.is_empty:
+            _, conn, nnodes = _linear_faces(*face_group.elm_arrays())
+            card = 'PSHELL'
+        elif not edge_group.is_empty:
+            _, conn = _linear_edges(*edge_group.elm_arrays())
+            card = 'PBAR'
+        else:
+            continue
+
+        n = conn.shape[0]
+        if n == 0:
+            continue
+        eids = arange(eid, eid + n, dtype=int64)
+        pids = [pid] * n
+        eid += n
+
+        fout.write('$ PART {0} {1} {2} {3}\n'.format(pid, eids[0], eids[-1],
+                                                     part.name))
+        _write_cards(fout, 'MAT1', [[pid], [_E], None, [_NU]], fmt,
+                     chunk_size)
+        _write_cards(fout, card, [[pid], [pid], [1.]], fmt, chunk_size)
+        if card == 'PSHELL':
+            _write_shells(fout, eids, pids, conn, nnodes, fmt, chunk_size)
+        else:
+            vxyz = _bar_orientations(xyz[rows[conn[:, 0]]],
+                                     xyz[rows[conn[:, 1]]])
+            _write_bars(fout, eids, pids, conn, vxyz, fmt, chunk_size)
+
+
+def _linear_faces(eids, conn, nnodes):
+    """
+    Select the linear tri and quad elements and pad their connectivity to
+    four columns.
+    """
+    keep = (nnodes == 3) | (nnodes == 4)
+    conn4 = zeros((keep.sum(), 4), dtype=int64)
+    ncols = min(conn.shape[1], 4)
+    conn4[:, :ncols] = conn[keep, :ncols]
+    return eids[keep], conn4, nnodes[keep]
+
+
+def _linear_edges(eids, conn, nnodes):
+    """
+    Select the linear edge elements.
+    """
+    keep = nnodes == 2
+    return eids[keep], conn[keep, :2]
+
+
+def _bar_orientations(xyz1, xyz2):
+    """
+    Select the global axis least aligned with each bar as its orientation
+    vector.
+    """
+    d = abs(xyz2 - xyz1)
+    return eye(3)[argmin(d, axis=1)]
+
+
+def _write_grids(fout, nids, xyz, fmt='small', chunk_size=_CHUNK_SIZE):
+    """
+    Write GRID cards in blocks.
+    """
+    cols = [nids, None, xyz[:, 0], xyz[:, 1], xyz[:, 2], None]
+    _write_cards(fout, 'GRID', cols, fmt, chunk_size)
+
+
+def _write_shells(fout, eids, pids, conn, nnodes, fmt='small',
+                  chunk_size=_CHUNK_SIZE):
+    """
+    Write CTRIA3 and CQUAD4 cards in blocks while preserving the order of
+    the elements.
+    """
+    n = len(eids)
+    tri_template = _card_template('CTRIA3', 5, fmt)
+    quad_template = _card_template('CQUAD4', 6, fmt)
+    for i1 in range(0, n, chunk_size):
+        i2 = min(i1 + chunk_size, n)
+        cols = [_format_column(eids[i1:i2], fmt),
+                _format_column(pids[i1:i2], fmt)]
+        for j in range(4):
+            cols.append(_format_column(conn[i1:i2, j], fmt))
+        is_tri = (nnodes[i1:i2] == 3).tolist()
+        lines = []
+        for tri, row in zip(is_tri, zip(*cols)):
+            if tri:
+                lines.append(tri_template % row[:5])
+            else:
+                lines.append(quad_template % row)
+        fout.write(''.join(lines))
+
+
+def _write_bars(fout, eids, pids, conn, vxyz, fmt='small',
+                chunk_size=_CHUNK_SIZE):
+    """
+    Write CBAR cards in blocks using an orientation vector for each bar.
+    """
+    cols = [eids, pids, conn[:, 0], conn[:, 1], vxyz[:, 0], vxyz[:, 1],
+            vxyz[:, 2]]
+    _write_cards(fout, 'CBAR', cols, fmt, chunk_size)
+
+
+def _write_cards(fout, name, cols, fmt='small', chunk_size=_CHUNK_SIZE):
+    """
+    Write a block of cards of the same type. Each column is a sequence of
+    values for one field or *None* for a blank field.
+    """
+    n = max([len(c) for c in cols if c is not None])
+    template = _card_template(name, len(cols), fmt)
+    for i1 in range(0, n, chunk_size):
+        i2 = min(i1 + chunk_size, n)
+        fields = []
+        for col in cols:
+            if col is None:
+                fields.append([_format_field(None, fmt)] * (i2 - i1))
+            else:
+                fields.append(_format_column(col[i1:i2], fmt))
+        fout.write(''.join([template % row for row in zip(*fields)]))
+
+
+def _card_template(name, nfields, fmt='small'):
+    """
+    Build the format string of a card with the given number of fields.
+    """
+    fmt = fmt.lower()
+    if fmt in ['free', 'f']:
+        return ','.join([name] + ['%s'] * nfields) + '\n'
+
+    if fmt in ['small', 's']:
+        return '%-8s' % name + '%s' * nfields + '\n'
+
+    # Large field uses four fields per line with implicit continuations
+    lines = ['%-8s' % (name + '*')]
+    for i in range(nfields):
+        if i > 0 and i % 4 == 0:
+            lines.append('\n%-8s' % '*')
+        lines.append('%s')
+    return ''.join(lines) + '\n'
+
+
+def _format_column(values, fmt='small'):
+    """
+    Format a column of values into a list of fields.
+    """
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    if not values:
+        return []
+
+    fmt = fmt.lower()
+    free = fmt in ['free', 'f']
+    if fmt in ['small', 's']:
+        width = 8
+    else:
+        width = 16
+
+    if isinstance(values[0], int):
+        if free:
+            return [str(v) for v in values]
+        return [str(v)[:width].rjust(width) for v in values]
+
+    # Most floats fit the field as is so only the others need the full
+    # conversion
+    fields = []
+    append = fields.append
+    for value in values:
+        str_val = str(value)
+        if len(str_val) <= width and 'e' not in str_val:
+            if free:
+                append(str_val)
+            else:
+                append(str_val.rjust(width))
+        else:
+            append(_format_field(value, fmt))
+    return fields
+
+
+def _large_float(value):
+    """
+    Convert a float to a string of at most 16 characters, using scientific
+    notation if it does not fit otherwise.
+    """
+    str_val = str(value)
+    if len(str_val) <= 16 and 'e' not in str_val:
+        return str_val
+    for precision in range(9, 0, -1):
+        str_val = '%.*E' % (precision, value)
+        if len(str_val) <= 16:
+            return str_val
+    return str_val
+
+
 def _write_field(value, fout, fmt='small'):
     """
     Write data to Nastran bulk data file.
     """
+    fout.write(_format_field(value, fmt))
+    return True
+
+
+def _format_field(value, fmt='small'):
+    """
+    Format data for a Nastran bulk data file. Free field data uses the large
+    field conversion without padding.
+    """
+    if fmt.lower() in ['free', 'f']:
+        if value is None:
+            return ''
+        return _format_field(value, 'large').strip()
+
     if fmt.lower() in ['small', 's']:
         small = True
     else:
@@ -105,39 +516,37 @@ def _write_field(value, fout, fmt='small'):
     # If None
     if value is None:
         if small:
-            fout.write("        ")
-            return True
+            return "        "
         else:
-            fout.write("                ")
-            return True
+            return "                "
 
     # Integer
     if isinstance(value, int):
         if small:
-            fout.write("%8s" % str(value)[:8])
-            return True
+            return "%8s" % str(value)[:8]
         else:
-            fout.write("%16s" % str(value)[:16])
-            return True
+            return "%16s" % str(value)[:16]
 
     # String
     if isinstance(value, str):
         if small:
-            fout.write("%8s" % value[:8])
-            return True
+            return "%8s" % value[:8]
         else:
-            fout.write("%16s" % value[:16])
-            return True
+            return "%16s" % value[:16]
 
     # Float
     if isinstance(value, float):
+        # Large field format
+        if not small:
+            return "%16s" % _large_float(value)
+
         # Get string representation of value
         str_val = str(value)
         # Get length of string representation
         len_value = len(str_val)
 
         # If the float has an exponent in it, split it there and then write
-        # it depending on the format.
+        # it.
         exp = False
         for c in str_val:
             if c == 'e':
@@ -148,88 +557,21 @@ def _write_field(value, fout, fmt='small'):
             str_left, str_right = str_val.split('e')
             # Determine length of exponent
             len_exp = len(str_right)
-            # Trim left string to fit based on format
-            if small:
-                if str_right[0] == '-':
-                    str_left = str_left[:8 - len_exp]
-                    str_out = str_left + str_right
-                else:
-                    str_left = str_left[:8 - (len_exp - 1)]
-                    str_out = str_left + '+' + str_right
-                fout.write("%8s" % str_out[:8])
+            # Trim left string to fit
+            if str_right[0] == '-':
+                str_left = str_left[:8 - len_exp]
+                str_out = str_left + str_right
             else:
-                if str_right[0] == '-':
-                    str_left = str_left[:16 - len_exp]
-                    str_out = str_left + str_right
-                else:
-                    str_left = str_left[:16 - (len_exp - 1)]
-                    str_out = str_left + '+' + str_right
-                fout.write("%16s" % str_out[:16])
-            return True
+                str_left = str_left[:8 - (len_exp - 1)]
+                str_out = str_left + '+' + str_right
+            return "%8s" % str_out[:8]
 
         # Small field format
-        if small:
-            # If string representation is less than 8, write it.
-            if len_value <= 8:
-                fout.write("%8s" % str_val)
-                return True
-
-            # If string representation is greater than 8,
-            # split the string at the "." and convert to scientific
-            # notation. Trim trailing digits to fit the exponent.
-
-            # Split string at "."
-            str_left, str_right = str_val.split('.')
-
-            # If the left side is greater than or equal to 1 and the
-            # first digit is not 0, convert to a "+" scientific notation.
-            # Also, only use scientific notation if the length of the left
-            # string is greater than 7.
-            if len(str_left) >= 1 and str_left[0] != '0':
-                if len(str_left) > 7:
-                    exp = len(str_left) - 1
-                    new_val = value / 10. ** exp
-                    str_val = str(new_val)
-                    # Export the string value making room for the exponent.
-                    str_out = str_val[:7 - len(str(exp))] + "+" + str(exp)
-                else:
-                    str_out = str_val
-
-                fout.write("%8s" % str_out[:8])
-                return True
-
-            # If the right side has more digits, convert to "-" scientific
-            # notation only if the exponent is greater than 3.
-
-            # Loop through the right string and find the first digit that
-            # isn't 0.
-            exp = 1
-            for c in str_right:
-                if int(c) == 0:
-                    exp += 1
-                else:
-                    break
-
-            # You only get an advantage from scientific notation if exp > 3.
-            if exp > 3:
-                new_val = value * 10. ** exp
-                str_val = str(new_val)
-                # Make room for the exponent.
-                str_out = str_val[:7 - len(str(exp))] + "-" + str(exp)
-            else:
-                str_out = "." + str_right[:7]
-
-            # Write to file
-            fout.write("%8s" % str_out[:8])
-            return True
+        # If string representation is less than 8, write it.
+        if len_value <= 8:
+            return "%8s" % str_val
 
-        # Large field format
-        # If string representation is less than 16, write it.
-        if len_value <= 16:
-            fout.write("%16s" % str_val)
-            return True
-
-        # If string representation is greater than 16,
+        # If string representation is greater than 8,
         # split the string at the "." and convert to scientific
         # notation. Trim trailing digits to fit the exponent.
 
@@ -238,14 +580,22 @@ def _write_field(value, fout, fmt='small'):
 
         # If the left side is greater than or equal to 1 and the
         # first digit is not 0, convert to a "+" scientific notation.
+        # Also, only use scientific notation if the length of the left
+        # string is greater than 7.
         if len(str_left) >= 1 and str_left[0] != '0':
-            exp = len(str_left) - 1
-            new_val = value / 10. ** exp
-            str_val = str(new_val)
-            # Export the string value making room for the exponent.
-            str_out = str_val[:15 - len(str(exp))] + "+" + str(exp)
-            fout.write("%16s" % str_out[:16])
-            return True
+            if len(str_left) > 7:
+                exp = len(str_left) - 1
+                new_val = value / 10. ** exp
+                str_val = str(new_val)
+                # Export the string value making room for the exponent.
+                str_out = str_val[:7 - len(str(exp))] + "+" + str(exp)
+            else:
+                str_out = str_val
+
+            return "%8s" % str_out[:8]
+
+        # If the right side has more digits, convert to "-" scientific
+        # notation only if the exponent is greater than 3.
 
         # Loop through the right string and find the first digit that
         # isn't 0.
@@ -256,11 +606,17 @@ def _write_field(value, fout, fmt='small'):
             else:
                 break
 
-        new_val = value * 10. ** exp
-        str_val = str(new_val)
-        # Make room for the exponent.
-        str_out = str_val[:15 - len(str(exp))] + "-" + str(exp)
+        # You only get an advantage from scientific notation if exp > 3.
+        if exp > 3:
+            new_val = value * 10. ** exp
+            str_val = str(new_val)
+            # Make room for the exponent.
+            str_out = str_val[:7 - len(str(exp))] + "-" + str(exp)
+        else:
+            str_out = "." + str_right[:7]
+
+        # Format the field
+        return "%8s" % str_out[:8]
 
-        # Write to file
-        fout.write("%16s" % str_out[:16])
-        return True
+    # Unsupported type
+    return ''
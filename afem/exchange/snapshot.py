@@ -0,0 +1,426 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import json
+import struct
+from array import array
+
+from OCCT.SMDSAbs import SMDSAbs_ElementType
+from OCCT.SMESH import SMESH_MesherHelper
+from numpy import dtype as np_dtype, empty, frombuffer, int64, memmap
+
+from afem.config import logger
+from afem.topology.entities import Shape
+
+__all__ = ["MeshSnapshot", "write_snapshot", "read_snapshot"]
+
+# File signature and alignment of each array in the file
+_MAGIC = b'AFEMMSH1'
+_ALIGN = 64
+
+# Element types stored by integer value
+_TYPES = {int(t): t for t in [SMDSAbs_ElementType.SMDSAbs_Node,
+                              SMDSAbs_ElementType.SMDSAbs_0DElement,
+                              SMDSAbs_ElementType.SMDSAbs_Edge,
+                              SMDSAbs_ElementType.SMDSAbs_Face,
+                              SMDSAbs_ElementType.SMDSAbs_Volume]}
+
+
+def write_snapshot(the_mesh, fn):
+    """
+    Write a binary snapshot of the mesh data structure. The snapshot stores
+    node ID's and coordinates, element ID's, types and connectivity, the
+    shape index of each node and element, the parameters of the nodes on
+    edges and faces, and the mesh group membership as
+    contiguous arrays. The arrays are aligned in the file so that they can be
+    memory-mapped by :class:`.MeshSnapshot`.
+
+    :param afem.smesh.entities.Mesh the_mesh: The mesh.
+    :param str fn: The filename.
+
+    :return: *True* if done, *False* if not.
+    :rtype: bool
+    """
+    ds = the_mesh.ds.object
+    helper = SMESH_MesherHelper(the_mesh.object)
+
+    # Nodes
+    nids, xyz, node_shapes = array('q'), array('d'), array('q')
+    node_params, shapes = array('d'), {}
+    iter_ = ds.nodesIterator(True)
+    while iter_.more():
+        node = iter_.next()
+        nids.append(node.GetID())
+        xyz.extend((node.X(), node.Y(), node.Z()))
+        indx = node.getshapeId()
+        node_shapes.append(indx)
+        node_params.extend(_node_params(helper, ds, node, indx, shapes))
+
+    # Elements stored with compressed connectivity
+    eids, types, elm_shapes = array('q'), array('q'), array('q')
+    offsets, conn = array('q', [0]), array('q')
+    iter_ = ds.elementsIterator(SMDSAbs_ElementType.SMDSAbs_All)
+    while iter_.more():
+        elm = iter_.next()
+        eids.append(elm.GetID())
+        types.append(int(elm.GetType()))
+        elm_shapes.append(elm.getshapeId())
+        nn = elm.NbNodes()
+        conn.extend([elm.GetNode(i).GetID() for i in range(nn)])
+        offsets.append(len(conn))
+
+    # Groups stored with compressed membership
+    groups = []
+    group_offsets, group_ids = array('q', [0]), array('q')
+    iter_ = the_mesh.object.GetGroups()
+    while iter_.more():
+        group = iter_.next()
+        group_ds = group.GetGroupDS()
+        groups.append([group.GetName(), int(group_ds.GetType())])
+        elm_iter = group_ds.GetElements()
+        while elm_iter.more():
+            group_ids.append(elm_iter.next().GetID())
+        group_offsets.append(len(group_ids))
+
+    arrays = [('nids', nids, (-1,)),
+              ('xyz', xyz, (-1, 3)),
+              ('node_shapes', node_shapes, (-1,)),
+              ('node_params', node_params, (-1, 2)),
+              ('eids', eids, (-1,)),
+              ('types', types, (-1,)),
+              ('elm_shapes', elm_shapes, (-1,)),
+              ('offsets', offsets, (-1,)),
+              ('conn', conn, (-1,)),
+              ('group_offsets', group_offsets, (-1,)),
+              ('group_ids', group_ids, (-1,))]
+
+    # Header with the location of each array relative to the data block
+    header = {'arrays': {}, 'groups': groups}
+    offset = 0
+    for name, data, shape in arrays:
+        a = _as_ndarray(data).reshape(shape)
+        header['arrays'][name] = [a.dtype.str, list(a.shape), offset]
+        offset += _padded(a.nbytes)
+    header = json.dumps(header).encode('utf-8')
+
+    with open(fn, 'wb') as fout:
+        fout.write(_MAGIC)
+        fout.write(struct.pack('<Q', len(header)))
+        fout.write(header)
+        start = len(_MAGIC) + 8 + len(header)
+        fout.write(b'\0' * (_padded(start) - start))
+        for _, data, _ in arrays:
+            nbytes = len(data) * data.itemsize
+            fout.write(data.tobytes())
+            fout.write(b'\0' * (_padded(nbytes) - nbytes))
+
+    msg = 'Wrote mesh snapshot with {} nodes and {} elements to {}.'
+    logger.info(msg.format(len(nids), len(eids), fn))
+    return True
+
+
+def read_snapshot(the_mesh, fn, bind_shapes=True, groups=True):
+    """
+    Read a binary mesh snapshot into the mesh. See
+    :meth:`.MeshSnapshot.restore`.
+
+    :param afem.smesh.entities.Mesh the_mesh: The mesh. It should be empty
+        since node and element ID's are preserved.
+    :param str fn: The filename.
+    :param bool bind_shapes: Option to bind nodes and elements to the
+        sub-shapes of the mesh shape using the stored shape indices.
+    :param bool groups: Option to create the stored mesh groups.
+
+    :return: Dictionary of created groups where the key is the group name.
+    :rtype: dict(str, afem.smesh.entities.MeshGroup)
+    """
+    return MeshSnapshot(fn).restore(the_mesh, bind_shapes, groups)
+
+
+class MeshSnapshot(object):
+    """
+    Binary mesh snapshot. The arrays are memory-mapped so they can be used
+    directly (e.g., for export or post-processing) without rebuilding the
+    mesh.
+
+    :param str fn: The filename.
+
+    :raise ValueError: If the file is not a mesh snapshot.
+    """
+
+    def __init__(self, fn):
+        with open(fn, 'rb') as fin:
+            if fin.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError('File is not a mesh snapshot.')
+            size = struct.unpack('<Q', fin.read(8))[0]
+            header = json.loads(fin.read(size).decode('utf-8'))
+        start = _padded(len(_MAGIC) + 8 + size)
+
+        self._arrays = {}
+        for name, (dtype, shape, offset) in header['arrays'].items():
+            shape = tuple(shape)
+            if 0 in shape:
+                a = empty(shape, dtype=np_dtype(dtype))
+            else:
+                a = memmap(fn, dtype=np_dtype(dtype), mode='r',
+                           offset=start + offset, shape=shape)
+            self._arrays[name] = a
+        self._groups = [tuple(g) for g in header['groups']]
+
+    @property
+    def num_nodes(self):
+        """
+        :return: Number of nodes.
+        :rtype: int
+        """
+        return self._arrays['nids'].size
+
+    @property
+    def num_elms(self):
+        """
+        :return: Number of elements.
+        :rtype: int
+        """
+        return self._arrays['eids'].size
+
+    @property
+    def nids(self):
+        """
+        :return: The node ID's.
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['nids']
+
+    @property
+    def xyz(self):
+        """
+        :return: The node coordinates as an array of shape (n, 3).
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['xyz']
+
+    @property
+    def node_shapes(self):
+        """
+        :return: The shape index of each node (0 if not on a shape).
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['node_shapes']
+
+    @property
+    def node_params(self):
+        """
+        :return: The parameters of each node on its shape as an array of
+            shape (n, 2). Nodes on edges only use the first column and the
+            rest are zero.
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['node_params']
+
+    @property
+    def eids(self):
+        """
+        :return: The element ID's.
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['eids']
+
+    @property
+    def types(self):
+        """
+        :return: The element types as integer values of
+            OCCT.SMDSAbs.SMDSAbs_ElementType.
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['types']
+
+    @property
+    def elm_shapes(self):
+        """
+        :return: The shape index of each element (0 if not on a shape).
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['elm_shapes']
+
+    @property
+    def offsets(self):
+        """
+        :return: The offsets into the connectivity array. The nodes of
+            element *i* are in *conn[offsets[i]:offsets[i + 1]]*.
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['offsets']
+
+    @property
+    def conn(self):
+        """
+        :return: The node ID's of all elements.
+        :rtype: numpy.ndarray
+        """
+        return self._arrays['conn']
+
+    @property
+    def group_names(self):
+        """
+        :return: The mesh group names.
+        :rtype: list(str)
+        """
+        return [name for name, _ in self._groups]
+
+    def group_ids(self, name):
+        """
+        Get the ID's of the nodes or elements in a group.
+
+        :param str name: The group name.
+
+        :return: The group type and the ID's.
+        :rtype: tuple(OCCT.SMDSAbs.SMDSAbs_ElementType, numpy.ndarray)
+
+        :raise KeyError: If the group is not found.
+        """
+        for i, (gname, type_) in enumerate(self._groups):
+            if gname == name:
+                i1, i2 = self._arrays['group_offsets'][i:i + 2]
+                return _TYPES[type_], self._arrays['group_ids'][i1:i2]
+        raise KeyError('Group with given name could not be found.')
+
+    def restore(self, the_mesh, bind_shapes=True, groups=True):
+        """
+        Rebuild the nodes, elements, and groups in the mesh. Node and element
+        ID's are preserved so the mesh should be empty. Shape binding
+        requires the mesh to have the same shape to mesh as when the
+        snapshot was written. Groups are restored as standalone groups.
+
+        :param afem.smesh.entities.Mesh the_mesh: The mesh.
+        :param bool bind_shapes: Option to bind nodes and elements to the
+            sub-shapes of the mesh shape using the stored shape indices.
+        :param bool groups: Option to create the stored mesh groups.
+
+        :return: Dictionary of created groups where the key is the group
+            name.
+        :rtype: dict(str, afem.smesh.entities.MeshGroup)
+        """
+        ds = the_mesh.ds.object
+
+        xyz = self.xyz.tolist()
+        for nid, (x, y, z) in zip(self.nids.tolist(), xyz):
+            ds.AddNodeWithID(x, y, z, nid)
+
+        conn = self.conn.tolist()
+        offsets = self.offsets.tolist()
+        edge = int(SMDSAbs_ElementType.SMDSAbs_Edge)
+        face = int(SMDSAbs_ElementType.SMDSAbs_Face)
+        volume = int(SMDSAbs_ElementType.SMDSAbs_Volume)
+        skipped = 0
+        for i, (eid, type_) in enumerate(zip(self.eids.tolist(),
+                                             self.types.tolist())):
+            nodes = conn[offsets[i]:offsets[i + 1]]
+            if type_ == edge:
+                ds.AddEdgeWithID(*(nodes + [eid]))
+            elif type_ == face:
+                ds.AddFaceWithID(*(nodes + [eid]))
+            elif type_ == volume:
+                ds.AddVolumeWithID(*(nodes + [eid]))
+            elif len(nodes) == 1:
+                ds.Add0DElementWithID(nodes[0], eid)
+            else:
+                skipped += 1
+        if skipped:
+            logger.warning('Skipped {} unsupported elements.'.format(skipped))
+
+        if bind_shapes and the_mesh.has_shape:
+            self._bind_shapes(ds)
+
+        new_groups = {}
+        if not groups:
+            return new_groups
+        for name in self.group_names:
+            type_, ids = self.group_ids(name)
+            group = the_mesh.create_group(name, type_)
+            group_ds = group.object.GetGroupDS()
+            for id_ in ids.tolist():
+                group_ds.Add(id_)
+            new_groups[name] = group
+        return new_groups
+
+    def _bind_shapes(self, ds):
+        """
+        Bind nodes and elements to sub-shapes by their shape index.
+        """
+        shape_types = {}
+
+        def _shape_type(indx):
+            if indx not in shape_types:
+                shape_types[indx] = ds.IndexToShape(indx).ShapeType()
+            return shape_types[indx]
+
+        for nid, indx, (u, v) in zip(self.nids.tolist(),
+                                     self.node_shapes.tolist(),
+                                     self.node_params.tolist()):
+            if indx <= 0:
+                continue
+            node = ds.FindNode(nid)
+            stype = _shape_type(indx)
+            if stype == Shape.VERTEX:
+                ds.SetNodeOnVertex(node, indx)
+            elif stype == Shape.EDGE:
+                ds.SetNodeOnEdge(node, indx, u)
+            elif stype == Shape.FACE:
+                ds.SetNodeOnFace(node, indx, u, v)
+            else:
+                ds.SetNodeInVolume(node, indx)
+
+        for eid, indx in zip(self.eids.tolist(), self.elm_shapes.tolist()):
+            if indx <= 0:
+                continue
+            ds.SetMeshElementOnShape(ds.FindElement(eid), indx)
+
+
+def _node_params(helper, ds, node, indx, shapes):
+    """
+    Get the parameters of a node on an edge or a face. Nodes on other shapes
+    get zeros.
+    """
+    if indx <= 0:
+        return 0., 0.
+    if indx not in shapes:
+        shapes[indx] = Shape.wrap(ds.IndexToShape(indx))
+    shape = shapes[indx]
+    if shape.is_edge:
+        return helper.GetNodeU(shape.object, node), 0.
+    if shape.is_face:
+        uv = helper.GetNodeUV(shape.object, node)
+        return uv.X(), uv.Y()
+    return 0., 0.
+
+
+def _as_ndarray(data):
+    """
+    View a typed array as a NumPy array without copying.
+    """
+    if data.typecode == 'd':
+        return frombuffer(data, dtype=float)
+    return frombuffer(data, dtype=int64)
+
+
+def _padded(nbytes):
+    """
+    Round the number of bytes up to the array alignment.
+    """
+    return -(-nbytes // _ALIGN) * _ALIGN
@@ -22,4 +22,5 @@ from afem.geometry.create import *
 from afem.geometry.distance import *
 from afem.geometry.entities import *
 from afem.geometry.intersect import *
+from afem.geometry.nurbs import *
 from afem.geometry.project import *
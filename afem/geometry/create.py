@@ -35,7 +35,7 @@ from OCCT.TColgp import TColgp_Array1OfPnt
 from OCCT.gce import gce_MakeCirc
 from OCCT.gp import gp_Ax3, gp_Pln, gp_Quaternion, gp_Trsf
 from OCCT.gp import gp_Extrinsic_XYZ
-from numpy import array, cross, mean, zeros
+from numpy import array, cross, linspace, mean, zeros
 from numpy.linalg import norm
 from scipy.linalg import lu_factor, lu_solve
 
@@ -112,6 +112,8 @@ class PointByArray(PointByXYZ):
 class PointFromParameter(object):
     """
     Create a point along a curve at a specified distance from a parameter.
+    The cached arc-length table of a curve or adaptor curve is used if its
+    domain is finite.
 
     :param c: The curve.
     :type c: afem.adaptor.entities.AdaptorCurve or afem.geometry.entities.Curve
@@ -124,15 +126,19 @@ class PointFromParameter(object):
     def __init__(self, c, u0, ds, tol=1.0e-7):
         adp_curve = AdaptorCurve.to_adaptor(c)
 
-        tool = GCPnts_AbscissaPoint(tol, adp_curve.object, ds, u0)
-        if not tool.IsDone():
-            msg = 'GCPnts_AbscissaPoint failed in PointFromParameter.'
-            logger.warning(msg)
+        # Use the cached arc-length table if available
+        u = _parameter_from_table(c, u0, ds, tol)
+        if u is None:
+            tool = GCPnts_AbscissaPoint(tol, adp_curve.object, ds, u0)
+            if not tool.IsDone():
+                msg = 'GCPnts_AbscissaPoint failed in PointFromParameter.'
+                logger.warning(msg)
+            else:
+                u = tool.Parameter()
 
-        self._is_done = tool.IsDone()
+        self._is_done = u is not None
         self._u, self._p = None, None
         if self._is_done:
-            u = tool.Parameter()
             self._u = u
             p = adp_curve.eval(u)
             self._p = p
@@ -165,7 +171,8 @@ class PointFromParameter(object):
 class PointsAlongCurveByNumber(object):
     """
     Create a specified number of points along a curve. The points will be
-    equidistant.
+    equidistant. The cached arc-length table of a curve or adaptor curve is
+    used if its domain is finite.
 
     :param c: The curve.
     :type c: afem.adaptor.entities.AdaptorCurve or afem.geometry.entities.Curve
@@ -194,31 +201,37 @@ class PointsAlongCurveByNumber(object):
 
         # Adjust u1 and u2 if d1 or d2 != 0
         if d1 is not None:
-            tool = PointFromParameter(adp_crv, u1, d1, tol)
+            tool = PointFromParameter(c, u1, d1, tol)
             if tool.is_done:
                 u1 = tool.parameter
         if d2 is not None:
-            tool = PointFromParameter(adp_crv, u2, d2, tol)
+            tool = PointFromParameter(c, u2, d2, tol)
             if tool.is_done:
                 u2 = tool.parameter
 
-        # Create uniform abscissa
-        tool = GCPnts_UniformAbscissa(adp_crv.object, n, u1, u2, tol)
-        if not tool.IsDone():
-            msg = 'GCPnts_UniformAbscissa failed in PointsAlongCurveByNumber.'
-            logger.warning(msg)
+        # Create uniform abscissa using the cached arc-length table if
+        # available
+        prms = _uniform_parameters(c, n, u1, u2, tol)
+        if prms is None:
+            tool = GCPnts_UniformAbscissa(adp_crv.object, n, u1, u2, tol)
+            if not tool.IsDone():
+                msg = ('GCPnts_UniformAbscissa failed in '
+                       'PointsAlongCurveByNumber.')
+                logger.warning(msg)
+            else:
+                prms = [tool.Parameter(i)
+                        for i in range(1, tool.NbPoints() + 1)]
 
         # Gather results
-        self._is_done = tool.IsDone()
+        self._is_done = prms is not None
         self._npts = 0
         self._prms = []
         self._pnts = []
         self._ds = None
 
         if self._is_done:
-            self._npts = tool.NbPoints()
-            for i in range(1, self._npts + 1):
-                u = tool.Parameter(i)
+            self._npts = len(prms)
+            for u in prms:
                 p = adp_crv.eval(u)
                 self._pnts.append(p)
                 self._prms.append(u)
@@ -277,7 +290,9 @@ class PointsAlongCurveByDistance(object):
     """
     Create points along a curve by distance between points. The points will
     be equidistant. This method calculates the number of points given the
-    curve length and then uses :class:`.PointsAlongCurveByNumber`.
+    curve length and then uses :class:`.PointsAlongCurveByNumber`. The cached
+    arc-length table of a curve or adaptor curve is used if its domain is
+    finite.
 
     :param c: The curve.
     :type c: afem.adaptor.entities.AdaptorCurve or afem.geometry.entities.Curve
@@ -311,35 +326,40 @@ class PointsAlongCurveByDistance(object):
 
         # Adjust u1 and u2 if d1 or d2 != 0
         if d1 is not None:
-            tool = PointFromParameter(adp_crv, u1, d1, tol)
+            tool = PointFromParameter(c, u1, d1, tol)
             if tool.is_done:
                 u1 = tool.parameter
         if d2 is not None:
-            tool = PointFromParameter(adp_crv, u2, d2, tol)
+            tool = PointFromParameter(c, u2, d2, tol)
             if tool.is_done:
                 u2 = tool.parameter
 
         # Determine number of points
-        arc_length = adp_crv.arc_length(u1, u2, tol)
+        table = _arc_length_table(c, tol)
+        if table is not None and _in_table(table, u1, u2):
+            arc_length = table.arc_length(u1, u2)
+        else:
+            arc_length = adp_crv.arc_length(u1, u2, tol)
         n = ceil(arc_length / maxd) + 1
         if n < nmin:
             n = nmin
 
-        # Create uniform abscissa
-        ua = GCPnts_UniformAbscissa(adp_crv.object, int(n), u1, u2, tol)
-        if not ua.IsDone():
-            msg = "GCPnts_UniformAbscissa failed."
-            raise RuntimeError(msg)
+        # Create uniform abscissa using the cached arc-length table if
+        # available
+        prms = _uniform_parameters(c, int(n), u1, u2, tol)
+        if prms is None:
+            ua = GCPnts_UniformAbscissa(adp_crv.object, int(n), u1, u2, tol)
+            if not ua.IsDone():
+                msg = "GCPnts_UniformAbscissa failed."
+                raise RuntimeError(msg)
+            prms = [ua.Parameter(i) for i in range(1, ua.NbPoints() + 1)]
 
         # Gather results
-        npts = ua.NbPoints()
+        npts = len(prms)
         pnts = []
-        prms = []
-        for i in range(1, npts + 1):
-            u = ua.Parameter(i)
+        for u in prms:
             p = adp_crv.eval(u)
             pnts.append(p)
-            prms.append(u)
         self._npts = npts
         self._prms = prms
         self._pnts = pnts
@@ -1103,7 +1123,7 @@ class PlaneFromParameter(object):
     def __init__(self, c, u0, ds, ref_pln=None, tol=1.0e-7):
         adp_curve = AdaptorCurve.to_adaptor(c)
 
-        tool = PointFromParameter(adp_curve, u0, ds, tol)
+        tool = PointFromParameter(c, u0, ds, tol)
 
         u = tool.parameter
         self._u = u
@@ -1232,7 +1252,7 @@ class PlanesAlongCurveByNumber(object):
     def __init__(self, c, n, ref_pln=None, u1=None, u2=None, d1=None,
                  d2=None, tol=1.0e-7):
         adp_crv = AdaptorCurve.to_adaptor(c)
-        pnt_builder = PointsAlongCurveByNumber(adp_crv, n, u1, u2, d1, d2, tol)
+        pnt_builder = PointsAlongCurveByNumber(c, n, u1, u2, d1, d2, tol)
         if pnt_builder.npts == 0:
             msg = ('Failed to generate points along the curve for creating '
                    'planes along a curve by number.')
@@ -1340,7 +1360,7 @@ class PlanesAlongCurveByDistance(object):
     def __init__(self, c, maxd, ref_pln=None, u1=None, u2=None, d1=None,
                  d2=None, nmin=0, tol=1.0e-7):
         adp_crv = AdaptorCurve.to_adaptor(c)
-        pnt_builder = PointsAlongCurveByDistance(adp_crv, maxd, u1, u2, d1, d2,
+        pnt_builder = PointsAlongCurveByDistance(c, maxd, u1, u2, d1, d2,
                                                  nmin, tol)
         if pnt_builder.npts == 0:
             msg = ('Failed to generate points along the curve for creating '
@@ -1941,3 +1961,53 @@ class NurbsSurfaceByApprox(object):
         :rtype: float
         """
         return self._tol2d_reached
+
+
+def _arc_length_table(c, tol):
+    """
+    Get the cached arc-length table of a curve or adaptor curve, or *None*
+    if the entity does not cache one or its domain is infinite.
+    """
+    if not isinstance(c, (Curve, AdaptorCurve)):
+        return None
+    try:
+        return c.arc_length_table(tol)
+    except ValueError:
+        return None
+
+
+def _in_table(table, *u):
+    """
+    Check if the parameters are in the table domain.
+    """
+    return all(table.u1 <= ui <= table.u2 for ui in u)
+
+
+def _parameter_from_table(c, u0, ds, tol):
+    """
+    Find the parameter at a distance along the curve from a parameter using
+    the cached arc-length table. Return *None* if no table is available or
+    the result is outside the table domain.
+    """
+    table = _arc_length_table(c, tol)
+    if table is None or not _in_table(table, u0):
+        return None
+    s = table.distance(u0)[0] + ds
+    if s < -tol or s > table.length + tol:
+        return None
+    return float(table.parameter(s)[0])
+
+
+def _uniform_parameters(c, n, u1, u2, tol):
+    """
+    Find the parameters of equally spaced points between the parameters
+    using the cached arc-length table. Return *None* if no table is
+    available or the parameters are outside the table domain.
+    """
+    table = _arc_length_table(c, tol)
+    if table is None or n < 2 or not _in_table(table, u1, u2):
+        return None
+    s1, s2 = table.distance([u1, u2])
+    prms = table.parameter(linspace(s1, s2, n))
+    prms[0], prms[-1] = u1, u2
+    return prms.tolist()
@@ -43,6 +43,7 @@ from OCCT.gp import (gp_Ax1, gp_Ax2, gp_Ax3, gp_Dir, gp_Pnt, gp_Pnt2d,
                      gp_Vec2d, gp_Dir2d, gp_Vec)
 from numpy import add, array, float64, subtract, ones
 
+from afem.adaptor.entities import ArcLengthTable, GeomAdaptorCurve
 from afem.base.entities import ViewableItem
 from afem.geometry import utils as geom_utils
 from afem.misc import utils as misc_utils
@@ -768,6 +769,29 @@ class Curve2D(Geometry2D):
         """
         return Vector2D(self.object.DN(u, d).XY())
 
+    def eval_array(self, u):
+        """
+        Evaluate points on the curve at many parameters.
+
+        :param array_like u: Curve parameters.
+
+        :return: Array of curve points with shape (N, 2).
+        :rtype: numpy.ndarray
+        """
+        return occ_utils.eval_curve2d_array(self.object, u)
+
+    def deriv_array(self, u, d=1):
+        """
+        Evaluate derivatives on the curve at many parameters.
+
+        :param array_like u: Curve parameters.
+        :param int d: Derivative to evaluate.
+
+        :return: Array of curve derivatives with shape (N, 2).
+        :rtype: numpy.ndarray
+        """
+        return occ_utils.eval_curve2d_array(self.object, u, d)
+
     def reverse(self):
         """
         Reverse curve direction.
@@ -1925,6 +1949,10 @@ class Curve(Geometry):
     OFFSET = GeomAbs_CurveType.GeomAbs_OffsetCurve
     OTHER = GeomAbs_CurveType.GeomAbs_OtherCurve
 
+    def __init__(self, obj):
+        super(Curve, self).__init__(obj)
+        self._arc_tables = {}
+
     @property
     def displayed_shape(self):
         """
@@ -2047,12 +2075,49 @@ class Curve(Geometry):
         """
         return Vector(self.object.DN(u, d).XYZ())
 
+    def eval_array(self, u):
+        """
+        Evaluate points on the curve at many parameters.
+
+        :param array_like u: Curve parameters.
+
+        :return: Array of curve points with shape (N, 3).
+        :rtype: numpy.ndarray
+        """
+        return occ_utils.eval_curve_array(self.object, u)
+
+    def deriv_array(self, u, d=1):
+        """
+        Evaluate derivatives on the curve at many parameters.
+
+        :param array_like u: Curve parameters.
+        :param int d: Derivative to evaluate.
+
+        :return: Array of curve derivatives with shape (N, 3).
+        :rtype: numpy.ndarray
+        """
+        return occ_utils.eval_curve_array(self.object, u, d)
+
+    def scale(self, pnt, s):
+        """
+        Scale the geometry.
+
+        :param point_like pnt: The reference point.
+        :param float s: The scaling value.
+
+        :return: *True* if scaled.
+        :rtype: bool
+        """
+        self.clear_arc_length_tables()
+        return super(Curve, self).scale(pnt, s)
+
     def reverse(self):
         """
         Reverse curve direction.
 
         :return: None.
         """
+        self.clear_arc_length_tables()
         self.object.Reverse()
 
     def reversed_u(self, u):
@@ -2079,9 +2144,41 @@ class Curve(Geometry):
         """
         if u1 > u2:
             u1, u2 = u2, u1
+        if self.u1 <= u1 and u2 <= self.u2:
+            try:
+                return self.arc_length_table(tol).arc_length(u1, u2)
+            except ValueError:
+                pass
         adp_crv = GeomAdaptor_Curve(self.object)
         return GCPnts_AbscissaPoint.Length_(adp_crv, u1, u2, tol)
 
+    def arc_length_table(self, tol=1.0e-7):
+        """
+        Get the arc-length table of the curve. The table is built on the
+        first request and cached for each tolerance. The cache is cleared
+        when the curve is modified by its methods.
+
+        :param float tol: The tolerance.
+
+        :return: The arc-length table.
+        :rtype: afem.adaptor.entities.ArcLengthTable
+
+        :raise ValueError: If the curve domain is infinite.
+        """
+        if tol not in self._arc_tables:
+            adp_crv = GeomAdaptorCurve.by_curve(self)
+            self._arc_tables[tol] = ArcLengthTable(adp_crv, tol)
+        return self._arc_tables[tol]
+
+    def clear_arc_length_tables(self):
+        """
+        Clear the cached arc-length tables. This should be called if the
+        underlying OpenCASCADE curve is modified directly.
+
+        :return: None.
+        """
+        self._arc_tables.clear()
+
     def invert(self, p):
         """
         Invert the point on the curve to find the parameter.
@@ -2189,6 +2286,7 @@ class Circle(Curve):
 
         :return: None.
         """
+        self.clear_arc_length_tables()
         self.object.SetRadius(r)
 
 
@@ -2222,6 +2320,7 @@ class Ellipse(Curve):
 
         :return: None.
         """
+        self.clear_arc_length_tables()
         self.object.SetMajorRadius(r)
 
     def set_minor_radius(self, r):
@@ -2232,6 +2331,7 @@ class Ellipse(Curve):
 
         :return: None.
         """
+        self.clear_arc_length_tables()
         self.object.SetMinorRadius(r)
 
 
@@ -2332,6 +2432,7 @@ class NurbsCurve(Curve):
         self.object.Knots(tcol_knots)
         geom_utils.reparameterize_knots(u1, u2, tcol_knots)
         self.object.SetKnots(tcol_knots)
+        self.clear_arc_length_tables()
         return True
 
     def segment(self, u1, u2):
@@ -2347,6 +2448,7 @@ class NurbsCurve(Curve):
         if u1 > u2:
             return False
         self.object.Segment(u1, u2)
+        self.clear_arc_length_tables()
         return True
 
     def set_cp(self, i, cp, weight=None):
@@ -2360,6 +2462,7 @@ class NurbsCurve(Curve):
 
         :return: None.
         """
+        self.clear_arc_length_tables()
         if weight is None:
             self.object.SetPole(i, cp)
         else:
@@ -2423,6 +2526,7 @@ class TrimmedCurve(Curve):
         :raise RuntimeError: If *u1* or *u2* is outside the bounds of the basis
             curve.
         """
+        self.clear_arc_length_tables()
         self.object.SetTrim(u1, u2, sense, adjust_periodic)
 
     @classmethod
@@ -2639,6 +2743,55 @@ class Surface(Geometry):
         dv = self.deriv(u, v, 0, 1)
         return Vector(du.Crossed(dv).XYZ())
 
+    def eval_array(self, u, v, grid=False):
+        """
+        Evaluate points on the surface at many parameters.
+
+        :param array_like u: Surface u-parameters.
+        :param array_like v: Surface v-parameters.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+
+        :return: Array of surface points with shape (N, 3), or with shape
+            (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+        """
+        return occ_utils.eval_surface_array(self.object, u, v, grid=grid)
+
+    def deriv_array(self, u, v, nu, nv, grid=False):
+        """
+        Evaluate derivatives on the surface at many parameters.
+
+        :param array_like u: Surface u-parameters.
+        :param array_like v: Surface v-parameters.
+        :param int nu: Derivative in u-direction.
+        :param int nv: Derivative in v-direction.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+
+        :return: Array of surface derivatives with shape (N, 3), or with
+            shape (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+        """
+        return occ_utils.eval_surface_array(self.object, u, v, nu, nv, grid)
+
+    def norm_array(self, u, v, grid=False, unit=True):
+        """
+        Evaluate normals on the surface at many parameters.
+
+        :param array_like u: Surface u-parameters.
+        :param array_like v: Surface v-parameters.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+        :param bool unit: Option to return unit normals. If *False* the
+            normals have the same length as those from :meth:`.norm`.
+
+        :return: Array of surface normals with shape (N, 3), or with shape
+            (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+        """
+        return occ_utils.eval_surface_norm_array(self.object, u, v, grid, unit)
+
     def surface_area(self, u1, v1, u2, v2, tol=1.0e-7):
         """
         Calculate the surface area between the parameters.
@@ -0,0 +1,428 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from numpy import array, float64, swapaxes, unique
+
+from afem.geometry import utils as geom_utils
+from afem.geometry.entities import NurbsCurve, NurbsSurface
+from afem.occ import utils as occ_utils
+
+__all__ = ["NurbsCurveKernel", "NurbsSurfaceKernel"]
+
+
+class NurbsCurveKernel(object):
+    """
+    Evaluate a NURBS curve at many parameters using NumPy. The knots and
+    control points are extracted from OCC once so sampling does not call
+    OCC for every parameter. Periodic curves are converted to their
+    non-periodic form.
+
+    :param int p: Degree.
+    :param array_like uk: Knot sequence.
+    :param array_like cpw: Homogeneous control points.
+    """
+
+    def __init__(self, p, uk, cpw):
+        self._p = int(p)
+        self._uk = array(uk, dtype=float64)
+        self._cpw = array(cpw, dtype=float64)
+
+    @property
+    def p(self):
+        """
+        :return: Degree of curve.
+        :rtype: int
+        """
+        return self._p
+
+    @property
+    def n(self):
+        """
+        :return: Number of control points.
+        :rtype: int
+        """
+        return self._cpw.shape[0]
+
+    @property
+    def uk(self):
+        """
+        :return: Knot sequence.
+        :rtype: numpy.ndarray
+        """
+        return self._uk
+
+    @property
+    def cpw(self):
+        """
+        :return: Homogeneous control points.
+        :rtype: numpy.ndarray
+        """
+        return self._cpw
+
+    @property
+    def cp(self):
+        """
+        :return: Control points.
+        :rtype: numpy.ndarray
+        """
+        return geom_utils.dehomogenize_array1d(self._cpw)[0]
+
+    @property
+    def w(self):
+        """
+        :return: Weights of control points.
+        :rtype: numpy.ndarray
+        """
+        return self._cpw[:, -1].copy()
+
+    @property
+    def u1(self):
+        """
+        :return: The first parameter.
+        :rtype: float
+        """
+        return self._uk[self._p]
+
+    @property
+    def u2(self):
+        """
+        :return: The last parameter.
+        :rtype: float
+        """
+        return self._uk[-self._p - 1]
+
+    def eval(self, u):
+        """
+        Evaluate points on the curve.
+
+        :param array_like u: Curve parameters.
+
+        :return: Array of curve points with shape (N, 3).
+        :rtype: numpy.ndarray
+        """
+        return self.derivs(u, 0)[:, 0]
+
+    def deriv(self, u, d=1):
+        """
+        Evaluate a derivative on the curve.
+
+        :param array_like u: Curve parameters.
+        :param int d: Derivative to evaluate.
+
+        :return: Array of curve derivatives with shape (N, 3).
+        :rtype: numpy.ndarray
+        """
+        return self.derivs(u, d)[:, d]
+
+    def derivs(self, u, d=1):
+        """
+        Evaluate the point and all derivatives up to *d* on the curve.
+
+        :param array_like u: Curve parameters.
+        :param int d: Highest derivative to evaluate.
+
+        :return: Array with shape (N, d + 1, 3). The point is at index 0.
+        :rtype: numpy.ndarray
+        """
+        return geom_utils.curve_derivs_array(self.n - 1, self._p, self._uk,
+                                             self._cpw, u, d)
+
+    def insert_knot(self, u, r=1):
+        """
+        Insert a knot.
+
+        :param float u: Knot value.
+        :param int r: Number of times to insert the knot. It is limited so
+            the multiplicity is not greater than the degree.
+
+        :return: New kernel with the knot inserted.
+        :rtype: afem.geometry.nurbs.NurbsCurveKernel
+        """
+        uq, qw = geom_utils.curve_knot_ins(self.n - 1, self._p, self._uk,
+                                           self._cpw, u, r)
+        return NurbsCurveKernel(self._p, uq, qw)
+
+    def elevate_degree(self, t=1):
+        """
+        Elevate the degree.
+
+        :param int t: Number of degrees to elevate.
+
+        :return: New kernel with the elevated degree.
+        :rtype: afem.geometry.nurbs.NurbsCurveKernel
+        """
+        uh, qw = geom_utils.degree_elevate_curve(self.n - 1, self._p,
+                                                 self._uk, self._cpw, t)
+        return NurbsCurveKernel(self._p + t, uh, qw)
+
+    def to_curve(self):
+        """
+        Build a NURBS curve from the kernel data.
+
+        :return: The curve.
+        :rtype: afem.geometry.entities.NurbsCurve
+        """
+        cp, w = geom_utils.dehomogenize_array1d(self._cpw)
+        knots, mult = unique(self._uk, return_counts=True)
+        return NurbsCurve.by_data(cp, knots, mult, self._p, w)
+
+    @classmethod
+    def by_curve(cls, crv):
+        """
+        Extract the kernel data from a NURBS curve.
+
+        :param afem.geometry.entities.NurbsCurve crv: The curve.
+
+        :return: The kernel.
+        :rtype: afem.geometry.nurbs.NurbsCurveKernel
+        """
+        if crv.is_periodic:
+            crv = crv.copy()
+            crv.object.SetNotPeriodic()
+        return cls(crv.p, crv.uk, crv.cpw)
+
+
+class NurbsSurfaceKernel(object):
+    """
+    Evaluate a NURBS surface at many parameters using NumPy. The knots and
+    control points are extracted from OCC once so sampling does not call
+    OCC for every parameter. Periodic surfaces are converted to their
+    non-periodic form.
+
+    :param int p: Degree in u-direction.
+    :param int q: Degree in v-direction.
+    :param array_like uk: Knot sequence in u-direction.
+    :param array_like vk: Knot sequence in v-direction.
+    :param array_like cpw: Homogeneous control points.
+    """
+
+    def __init__(self, p, q, uk, vk, cpw):
+        self._p = int(p)
+        self._q = int(q)
+        self._uk = array(uk, dtype=float64)
+        self._vk = array(vk, dtype=float64)
+        self._cpw = array(cpw, dtype=float64)
+
+    @property
+    def p(self):
+        """
+        :return: Degree in u-direction.
+        :rtype: int
+        """
+        return self._p
+
+    @property
+    def q(self):
+        """
+        :return: Degree in v-direction.
+        :rtype: int
+        """
+        return self._q
+
+    @property
+    def n(self):
+        """
+        :return: Number of control points in u-direction.
+        :rtype: int
+        """
+        return self._cpw.shape[0]
+
+    @property
+    def m(self):
+        """
+        :return: Number of control points in v-direction.
+        :rtype: int
+        """
+        return self._cpw.shape[1]
+
+    @property
+    def uk(self):
+        """
+        :return: Knot sequence in u-direction.
+        :rtype: numpy.ndarray
+        """
+        return self._uk
+
+    @property
+    def vk(self):
+        """
+        :return: Knot sequence in v-direction.
+        :rtype: numpy.ndarray
+        """
+        return self._vk
+
+    @property
+    def cpw(self):
+        """
+        :return: Homogeneous control points.
+        :rtype: numpy.ndarray
+        """
+        return self._cpw
+
+    @property
+    def cp(self):
+        """
+        :return: Control points.
+        :rtype: numpy.ndarray
+        """
+        return self._cpw[:, :, :3] / self._cpw[:, :, 3:]
+
+    @property
+    def w(self):
+        """
+        :return: Weights of control points.
+        :rtype: numpy.ndarray
+        """
+        return self._cpw[:, :, -1].copy()
+
+    def eval(self, u, v, grid=False):
+        """
+        Evaluate points on the surface.
+
+        :param array_like u: The u-parameters.
+        :param array_like v: The v-parameters.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+
+        :return: Array of surface points with shape (N, 3), or with shape
+            (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+
+        :raise ValueError: If the parameters are paired but their sizes are
+            different.
+        """
+        return self.deriv(u, v, 0, 0, grid)
+
+    def deriv(self, u, v, nu, nv, grid=False):
+        """
+        Evaluate a derivative on the surface.
+
+        :param array_like u: The u-parameters.
+        :param array_like v: The v-parameters.
+        :param int nu: The derivative in u-direction.
+        :param int nv: The derivative in v-direction.
+        :param bool grid: Option to evaluate every combination of the u- and
+            v-parameters. Otherwise they are evaluated in pairs.
+
+        :return: Array of surface derivatives with shape (N, 3), or with
+            shape (Nu, Nv, 3) for a grid.
+        :rtype: numpy.ndarray
+
+        :raise ValueError: If the parameters are paired but their sizes are
+            different.
+        """
+        u, v, shape = occ_utils._surface_params(u, v, grid)
+        skl = self.derivs(u, v, nu + nv)
+        return skl[:, nu, nv].reshape(shape + (3,))
+
+    def derivs(self, u, v, d=1):
+        """
+        Evaluate the point and all derivatives up to order *d* on the
+        surface at pairs of parameters.
+
+        :param array_like u: The u-parameters.
+        :param array_like v: The v-parameters.
+        :param int d: Highest derivative to evaluate.
+
+        :return: Array with shape (N, d + 1, d + 1, 3). The derivative with
+            respect to u *k* times and v *l* times is at index [:, k, l]
+            when *k* + *l* <= *d*.
+        :rtype: numpy.ndarray
+        """
+        return geom_utils.surface_derivs_array(self.n - 1, self._p,
+                                               self._uk, self.m - 1,
+                                               self._q, self._vk, self._cpw,
+                                               u, v, d)
+
+    def insert_uknot(self, u, r=1):
+        """
+        Insert a knot in u-direction.
+
+        :param float u: Knot value.
+        :param int r: Number of times to insert the knot. It is limited so
+            the multiplicity is not greater than the degree.
+
+        :return: New kernel with the knot inserted.
+        :rtype: afem.geometry.nurbs.NurbsSurfaceKernel
+        """
+        uq, qw = geom_utils.curve_knot_ins(self.n - 1, self._p, self._uk,
+                                           self._cpw, u, r)
+        return NurbsSurfaceKernel(self._p, self._q, uq, self._vk, qw)
+
+    def insert_vknot(self, v, r=1):
+        """
+        Insert a knot in v-direction.
+
+        :param float v: Knot value.
+        :param int r: Number of times to insert the knot. It is limited so
+            the multiplicity is not greater than the degree.
+
+        :return: New kernel with the knot inserted.
+        :rtype: afem.geometry.nurbs.NurbsSurfaceKernel
+        """
+        vq, qw = geom_utils.curve_knot_ins(self.m - 1, self._q, self._vk,
+                                           swapaxes(self._cpw, 0, 1), v, r)
+        return NurbsSurfaceKernel(self._p, self._q, self._uk, vq,
+                                  swapaxes(qw, 0, 1))
+
+    def elevate_degree(self, tu=0, tv=0):
+        """
+        Elevate the degree.
+
+        :param int tu: Number of degrees to elevate in u-direction.
+        :param int tv: Number of degrees to elevate in v-direction.
+
+        :return: New kernel with the elevated degree.
+        :rtype: afem.geometry.nurbs.NurbsSurfaceKernel
+        """
+        uh, qw = geom_utils.degree_elevate_curve(self.n - 1, self._p,
+                                                 self._uk, self._cpw, tu)
+        vh, qw = geom_utils.degree_elevate_curve(self.m - 1, self._q,
+                                                 self._vk,
+                                                 swapaxes(qw, 0, 1), tv)
+        return NurbsSurfaceKernel(self._p + tu, self._q + tv, uh, vh,
+                                  swapaxes(qw, 0, 1))
+
+    def to_surface(self):
+        """
+        Build a NURBS surface from the kernel data.
+
+        :return: The surface.
+        :rtype: afem.geometry.entities.NurbsSurface
+        """
+        uknots, umult = unique(self._uk, return_counts=True)
+        vknots, vmult = unique(self._vk, return_counts=True)
+        return NurbsSurface.by_data(self.cp, uknots, vknots, umult, vmult,
+                                    self._p, self._q, self.w)
+
+    @classmethod
+    def by_surface(cls, srf):
+        """
+        Extract the kernel data from a NURBS surface.
+
+        :param afem.geometry.entities.NurbsSurface srf: The surface.
+
+        :return: The kernel.
+        :rtype: afem.geometry.nurbs.NurbsSurfaceKernel
+        """
+        if srf.object.IsUPeriodic() or srf.object.IsVPeriodic():
+            srf = srf.copy()
+            srf.object.SetUNotPeriodic()
+            srf.object.SetVNotPeriodic()
+        return cls(srf.p, srf.q, srf.uk, srf.vk, srf.cpw)
@@ -22,14 +22,18 @@ from math import sqrt
 from OCCT.Extrema import (Extrema_ExtPC, Extrema_ExtCC, Extrema_POnCurv,
                           Extrema_ExtPS, Extrema_ExtCS, Extrema_POnSurf)
 from OCCT.GeomProjLib import GeomProjLib
+from OCCT.Precision import Precision
+from OCCT.gp import gp_Pnt, gp_Vec
+from numpy import argmin, array, dot, float64, full, linspace, nan, ndarray
 
 from afem.adaptor.entities import AdaptorCurve, AdaptorSurface
 from afem.geometry.check import CheckGeom
 from afem.geometry.entities import Curve, Line
 
 __all__ = ["PointProjector", "ProjectPointToCurve",
-           "ProjectPointToSurface", "CurveProjector", "ProjectCurveToPlane",
-           "ProjectCurveToSurface"]
+           "ProjectPointToSurface", "PointsToCurveProjector",
+           "PointsToSurfaceProjector", "CurveProjector",
+           "ProjectCurveToPlane", "ProjectCurveToSurface"]
 
 
 class PointProjector(object):
@@ -251,6 +255,364 @@ class ProjectPointToSurface(PointProjector):
             pnt.set_xyz(self.nearest_point)
 
 
+class PointsToCurveProjector(object):
+    """
+    Project many points to a curve. The curve is sampled and the global
+    extrema tool is initialized once so the projector can be reused for any
+    number of point arrays. Each point is first solved by Newton iterations
+    starting from the previous solution or the nearest sample, whichever is
+    closer. The global search is only used when the iterations do not
+    converge or the result is farther than the starting point. An infinite
+    curve is not sampled so it is only started from the previous solution.
+
+    :param crv: Curve to project to.
+    :type crv: afem.adaptor.entities.AdaptorCurve or
+        afem.geometry.entities.Curve or afem.topology.entities.Edge or
+        afem.topology.entities.Wire
+    :param int nsample: Number of samples used to find a starting parameter.
+    :param float tol: The tolerance.
+    :param int max_iter: The maximum number of Newton iterations.
+    """
+
+    def __init__(self, crv, nsample=100, tol=1.0e-7, max_iter=20):
+        adp_crv = AdaptorCurve.to_adaptor(crv)
+        self._adp_crv = adp_crv
+        self._u1, self._u2 = adp_crv.u1, adp_crv.u2
+        self._period = None
+        if adp_crv.is_periodic:
+            self._period = adp_crv.object.Period()
+        self._tol = tol
+        self._max_iter = max_iter
+        self._num_global = 0
+
+        self._ext = Extrema_ExtPC()
+        self._ext.Initialize(adp_crv.object, self._u1, self._u2, tol)
+
+        self._us, self._xyz = None, None
+        if not _is_infinite(self._u1, self._u2):
+            self._us = linspace(self._u1, self._u2, max(nsample, 2))
+            self._xyz = adp_crv.eval_array(self._us)
+
+        self._p, self._d1, self._d2 = gp_Pnt(), gp_Vec(), gp_Vec()
+
+    @property
+    def adaptor(self):
+        """
+        :return: The curve adaptor.
+        :rtype: afem.adaptor.entities.AdaptorCurve
+        """
+        return self._adp_crv
+
+    @property
+    def num_global(self):
+        """
+        :return: The number of points of the last projection that needed
+            the global search.
+        :rtype: int
+        """
+        return self._num_global
+
+    def project(self, pnts, warm_start=True):
+        """
+        Project the points to the curve.
+
+        :param pnts: The points.
+        :type pnts: collections.Sequence(point_like) or numpy.ndarray
+        :param bool warm_start: Option to start from the previous or nearest
+            solution. If *False* the global search is used for every point.
+
+        :return: The parameters with shape (N,), the projected points with
+            shape (N, 3), and the distances with shape (N,). The values are
+            NaN for a point that could not be projected.
+        :rtype: tuple(numpy.ndarray)
+        """
+        pnts = _to_xyz_array(pnts)
+        npts = pnts.shape[0]
+        params = full(npts, nan, dtype=float64)
+        points = full((npts, 3), nan, dtype=float64)
+        dists = full(npts, nan, dtype=float64)
+        self._num_global = 0
+
+        prev = None
+        for i, xyz in enumerate(pnts):
+            sol = None
+            seed = None
+            if warm_start:
+                seed = _nearest_seed(xyz, self._us, self._xyz, prev)
+            if seed is not None:
+                sol = self._newton(xyz, seed[0])
+                if sol is not None and sol[2] > seed[1] + self._tol:
+                    sol = None
+            if sol is None:
+                self._num_global += 1
+                sol = self._global(xyz)
+            if sol is None:
+                prev = None
+                continue
+            params[i], points[i], dists[i] = sol
+            prev = sol
+
+        return params, points, dists
+
+    def _eval(self, u):
+        """
+        Evaluate the point at the parameter.
+        """
+        self._adp_crv.object.D0(u, self._p)
+        return array(self._p.Coord(), dtype=float64)
+
+    def _bound(self, u):
+        """
+        Keep the parameter in the curve domain.
+        """
+        if self._period is not None:
+            return self._u1 + (u - self._u1) % self._period
+        return min(max(u, self._u1), self._u2)
+
+    def _newton(self, xyz, u):
+        """
+        Point inversion by Newton iterations.
+
+        Reference: Section 6.1 from "The NURBS Book"
+        """
+        p, d1, d2 = self._p, self._d1, self._d2
+        for _ in range(self._max_iter):
+            self._adp_crv.object.D2(u, p, d1, d2)
+            r = array(p.Coord(), dtype=float64) - xyz
+            c1 = array(d1.Coord(), dtype=float64)
+            c2 = array(d2.Coord(), dtype=float64)
+            if _norm(r) <= self._tol:
+                return u, xyz + r, _norm(r)
+            df = dot(c2, r) + dot(c1, c1)
+            if df == 0.:
+                return None
+            un = self._bound(u - dot(c1, r) / df)
+            if abs(un - u) * _norm(c1) <= self._tol:
+                pi = self._eval(un)
+                return un, pi, _norm(pi - xyz)
+            u = un
+        return None
+
+    def _global(self, xyz):
+        """
+        Global search of the nearest point including the curve ends.
+        """
+        candidates = []
+        self._ext.Perform(gp_Pnt(*xyz))
+        if self._ext.IsDone():
+            for i in range(1, self._ext.NbExt() + 1):
+                candidates.append(self._ext.Point(i).Parameter())
+        if self._period is None:
+            candidates += [self._u1, self._u2]
+
+        best = None
+        for u in candidates:
+            pi = self._eval(u)
+            di = _norm(pi - xyz)
+            if best is None or di < best[2]:
+                best = (u, pi, di)
+        return best
+
+
+class PointsToSurfaceProjector(object):
+    """
+    Project many points to a surface. The surface is sampled and the global
+    extrema tool is initialized once so the projector can be reused for any
+    number of point arrays. Each point is first solved by Newton iterations
+    starting from the previous solution or the nearest sample, whichever is
+    closer. The global search is only used when the iterations do not
+    converge or the result is farther than the starting point. An infinite
+    surface is not sampled so it is only started from the previous solution.
+
+    :param srf: Surface to project to.
+    :type srf: afem.adaptor.entities.AdaptorSurface or
+        afem.geometry.entities.Surface or afem.topology.entities.Face
+    :param int nsample: Number of samples in each direction used to find a
+        starting parameter.
+    :param float tol: The tolerance.
+    :param int max_iter: The maximum number of Newton iterations.
+    """
+
+    def __init__(self, srf, nsample=20, tol=1.0e-7, max_iter=20):
+        adp_srf = AdaptorSurface.to_adaptor(srf)
+        self._adp_srf = adp_srf
+        self._u1, self._u2 = adp_srf.u1, adp_srf.u2
+        self._v1, self._v2 = adp_srf.v1, adp_srf.v2
+        self._uperiod, self._vperiod = None, None
+        if adp_srf.object.IsUPeriodic():
+            self._uperiod = adp_srf.object.UPeriod()
+        if adp_srf.object.IsVPeriodic():
+            self._vperiod = adp_srf.object.VPeriod()
+        self._tol = tol
+        self._max_iter = max_iter
+        self._num_global = 0
+
+        self._ext = Extrema_ExtPS()
+        self._ext.Initialize(adp_srf.object, self._u1, self._u2, self._v1,
+                             self._v2, tol, tol)
+
+        self._uv, self._xyz = None, None
+        if not _is_infinite(self._u1, self._u2, self._v1, self._v2):
+            nsample = max(nsample, 2)
+            us = linspace(self._u1, self._u2, nsample)
+            vs = linspace(self._v1, self._v2, nsample)
+            self._uv = array([(u, v) for u in us for v in vs],
+                             dtype=float64)
+            self._xyz = adp_srf.eval_array(us, vs, grid=True).reshape(-1, 3)
+
+        self._p = gp_Pnt()
+        self._du, self._dv = gp_Vec(), gp_Vec()
+        self._duu, self._dvv, self._duv = gp_Vec(), gp_Vec(), gp_Vec()
+
+    @property
+    def adaptor(self):
+        """
+        :return: The surface adaptor.
+        :rtype: afem.adaptor.entities.AdaptorSurface
+        """
+        return self._adp_srf
+
+    @property
+    def num_global(self):
+        """
+        :return: The number of points of the last projection that needed
+            the global search.
+        :rtype: int
+        """
+        return self._num_global
+
+    def project(self, pnts, warm_start=True):
+        """
+        Project the points to the surface.
+
+        :param pnts: The points.
+        :type pnts: collections.Sequence(point_like) or numpy.ndarray
+        :param bool warm_start: Option to start from the previous or nearest
+            solution. If *False* the global search is used for every point.
+
+        :return: The parameters with shape (N, 2), the projected points with
+            shape (N, 3), and the distances with shape (N,). The values are
+            NaN for a point that could not be projected.
+        :rtype: tuple(numpy.ndarray)
+        """
+        pnts = _to_xyz_array(pnts)
+        npts = pnts.shape[0]
+        params = full((npts, 2), nan, dtype=float64)
+        points = full((npts, 3), nan, dtype=float64)
+        dists = full(npts, nan, dtype=float64)
+        self._num_global = 0
+
+        prev = None
+        for i, xyz in enumerate(pnts):
+            sol = None
+            seed = None
+            if warm_start:
+                seed = _nearest_seed(xyz, self._uv, self._xyz, prev)
+            if seed is not None:
+                sol = self._newton(xyz, *seed[0])
+                if sol is not None and sol[2] > seed[1] + self._tol:
+                    sol = None
+            if sol is None:
+                self._num_global += 1
+                sol = self._global(xyz)
+            if sol is None:
+                prev = None
+                continue
+            params[i], points[i], dists[i] = sol
+            prev = sol
+
+        return params, points, dists
+
+    def _eval(self, u, v):
+        """
+        Evaluate the point at the parameters.
+        """
+        self._adp_srf.object.D0(u, v, self._p)
+        return array(self._p.Coord(), dtype=float64)
+
+    def _bound(self, u, v):
+        """
+        Keep the parameters in the surface domain.
+        """
+        if self._uperiod is not None:
+            u = self._u1 + (u - self._u1) % self._uperiod
+        else:
+            u = min(max(u, self._u1), self._u2)
+        if self._vperiod is not None:
+            v = self._v1 + (v - self._v1) % self._vperiod
+        else:
+            v = min(max(v, self._v1), self._v2)
+        return u, v
+
+    def _newton(self, xyz, u, v):
+        """
+        Point inversion by Newton iterations.
+
+        Reference: Section 6.1 from "The NURBS Book"
+        """
+        p, du, dv = self._p, self._du, self._dv
+        duu, dvv, duv = self._duu, self._dvv, self._duv
+        for _ in range(self._max_iter):
+            self._adp_srf.object.D2(u, v, p, du, dv, duu, dvv, duv)
+            r = array(p.Coord(), dtype=float64) - xyz
+            if _norm(r) <= self._tol:
+                return (u, v), xyz + r, _norm(r)
+            su = array(du.Coord(), dtype=float64)
+            sv = array(dv.Coord(), dtype=float64)
+            suu = array(duu.Coord(), dtype=float64)
+            svv = array(dvv.Coord(), dtype=float64)
+            suv = array(duv.Coord(), dtype=float64)
+            f, g = dot(su, r), dot(sv, r)
+            a11 = dot(su, su) + dot(r, suu)
+            a12 = dot(su, sv) + dot(r, suv)
+            a22 = dot(sv, sv) + dot(r, svv)
+            det = a11 * a22 - a12 * a12
+            if det == 0.:
+                return None
+            step_u = -(a22 * f - a12 * g) / det
+            step_v = -(a11 * g - a12 * f) / det
+            # Slide along the boundary if the step leaves the domain
+            if self._uperiod is None and ((u <= self._u1 and step_u < 0.) or
+                                          (u >= self._u2 and step_u > 0.)):
+                step_u, step_v = 0., -g / a22 if a22 > 0. else 0.
+            if self._vperiod is None and ((v <= self._v1 and step_v < 0.) or
+                                          (v >= self._v2 and step_v > 0.)):
+                step_v = 0.
+                if step_u != 0.:
+                    step_u = -f / a11 if a11 > 0. else 0.
+            un, vn = self._bound(u + step_u, v + step_v)
+            if _norm((un - u) * su + (vn - v) * sv) <= self._tol:
+                pi = self._eval(un, vn)
+                return (un, vn), pi, _norm(pi - xyz)
+            u, v = un, vn
+        return None
+
+    def _global(self, xyz):
+        """
+        Global search of the nearest point. The nearest sample is also
+        refined in case the nearest point is on the boundary.
+        """
+        candidates = []
+        self._ext.Perform(gp_Pnt(*xyz))
+        if self._ext.IsDone():
+            for i in range(1, self._ext.NbExt() + 1):
+                candidates.append(self._ext.Point(i).Parameter(0., 0.))
+
+        best = None
+        for u, v in candidates:
+            pi = self._eval(u, v)
+            di = _norm(pi - xyz)
+            if best is None or di < best[2]:
+                best = ((u, v), pi, di)
+
+        seed = _nearest_seed(xyz, self._uv, self._xyz, None)
+        if seed is not None:
+            sol = self._newton(xyz, *seed[0])
+            if sol is not None and (best is None or sol[2] < best[2]):
+                best = sol
+        return best
+
+
 class CurveProjector(object):
     """
     Base class for curve projections.
@@ -320,3 +682,45 @@ class ProjectCurveToSurface(CurveProjector):
         # OCC projection
         hcrv = GeomProjLib.Project_(crv.object, srf.object)
         self._crv = Curve(hcrv)
+
+
+def _to_xyz_array(pnts):
+    """
+    Convert the points to an array with shape (N, 3).
+    """
+    if isinstance(pnts, ndarray):
+        return pnts.astype(float64).reshape(-1, 3)
+    return array([CheckGeom.to_point(p).xyz for p in pnts],
+                 dtype=float64).reshape(-1, 3)
+
+
+def _nearest_seed(xyz, params, samples, prev):
+    """
+    Pick the starting parameters from the nearest sample or the previous
+    solution, whichever is closer to the point. Return the parameters and
+    their distance to the point, or *None* if there is no start.
+    """
+    seed = None
+    if samples is not None:
+        d2 = ((samples - xyz) ** 2).sum(axis=1)
+        i = argmin(d2)
+        seed = (params[i], sqrt(d2[i]))
+    if prev is not None:
+        di = _norm(prev[1] - xyz)
+        if seed is None or di < seed[1]:
+            seed = (prev[0], di)
+    return seed
+
+
+def _is_infinite(*bounds):
+    """
+    Check if any parameter bound is infinite.
+    """
+    return any(Precision.IsInfinite_(x) for x in bounds)
+
+
+def _norm(x):
+    """
+    Length of a vector.
+    """
+    return sqrt(dot(x, x))
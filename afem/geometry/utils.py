@@ -19,8 +19,11 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from __future__ import division, division
 
+from math import factorial
+
 from OCCT.BSplCLib import BSplCLib
-from numpy import array, diff, float64, floor, hstack, sqrt, sum, zeros
+from numpy import (arange, array, asarray, clip, diff, einsum, float64, floor,
+                   hstack, searchsorted, sqrt, sum, zeros, zeros_like)
 from numpy.linalg import norm
 
 
@@ -244,3 +247,434 @@ def basis_funs(i, u, p, uk):
             saved = left[j - r] * temp
         bf[j] = saved
     return array(bf, dtype=float)
+
+
+def find_span_array(n, p, u, uk):
+    """
+    Determine the knot span index of many parameters.
+
+    :param int n: Number of control points - 1.
+    :param int p: Degree.
+    :param array_like u: Parameters.
+    :param ndarray uk: Knot vector.
+
+    :return: Knot spans.
+    :rtype: ndarray
+
+    *Reference:* Algorithm A2.1 from "The NURBS Book".
+    """
+    u = asarray(u, dtype=float64)
+    spans = searchsorted(uk, u, side='right') - 1
+    return clip(spans, p, n)
+
+
+def basis_funs_array(spans, u, p, uk):
+    """
+    Compute the non-vanishing basis functions of many parameters.
+
+    :param ndarray spans: Knot span indices.
+    :param ndarray u: Parameters.
+    :param int p: Degree.
+    :param ndarray uk: Knot vector.
+
+    :return: Non-vanishing basis functions with shape (N, p + 1).
+    :rtype: ndarray
+
+    Reference: Algorithm A2.2 from "The NURBS Book"
+    """
+    npts = u.size
+    bf = zeros((npts, p + 1), dtype=float64)
+    bf[:, 0] = 1.0
+    left = zeros((npts, p + 1), dtype=float64)
+    right = zeros((npts, p + 1), dtype=float64)
+    for j in range(1, p + 1):
+        left[:, j] = u - uk[spans + 1 - j]
+        right[:, j] = uk[spans + j] - u
+        saved = zeros(npts, dtype=float64)
+        for r in range(0, j):
+            temp = bf[:, r] / (right[:, r + 1] + left[:, j - r])
+            bf[:, r] = saved + right[:, r + 1] * temp
+            saved = left[:, j - r] * temp
+        bf[:, j] = saved
+    return bf
+
+
+def ders_basis_funs_array(spans, u, p, d, uk):
+    """
+    Compute the non-vanishing basis functions and their derivatives of many
+    parameters.
+
+    :param ndarray spans: Knot span indices.
+    :param ndarray u: Parameters.
+    :param int p: Degree.
+    :param int d: Highest derivative.
+    :param ndarray uk: Knot vector.
+
+    :return: Basis functions and derivatives with shape (N, d + 1, p + 1).
+        Derivatives higher than the degree are zero.
+    :rtype: ndarray
+
+    Reference: Algorithm A2.3 from "The NURBS Book"
+    """
+    npts = u.size
+    ndu = zeros((npts, p + 1, p + 1), dtype=float64)
+    ndu[:, 0, 0] = 1.0
+    left = zeros((npts, p + 1), dtype=float64)
+    right = zeros((npts, p + 1), dtype=float64)
+    for j in range(1, p + 1):
+        left[:, j] = u - uk[spans + 1 - j]
+        right[:, j] = uk[spans + j] - u
+        saved = zeros(npts, dtype=float64)
+        for r in range(0, j):
+            # Lower triangle stores the knot differences
+            ndu[:, j, r] = right[:, r + 1] + left[:, j - r]
+            temp = ndu[:, r, j - 1] / ndu[:, j, r]
+            # Upper triangle stores the basis functions
+            ndu[:, r, j] = saved + right[:, r + 1] * temp
+            saved = left[:, j - r] * temp
+        ndu[:, j, j] = saved
+
+    ders = zeros((npts, d + 1, p + 1), dtype=float64)
+    ders[:, 0, :] = ndu[:, :, p]
+    for r in range(0, p + 1):
+        a = zeros((2, npts, p + 1), dtype=float64)
+        s1, s2 = 0, 1
+        a[0, :, 0] = 1.0
+        for k in range(1, min(d, p) + 1):
+            dk = zeros(npts, dtype=float64)
+            rk = r - k
+            pk = p - k
+            if r >= k:
+                a[s2, :, 0] = a[s1, :, 0] / ndu[:, pk + 1, rk]
+                dk = a[s2, :, 0] * ndu[:, rk, pk]
+            j1 = 1 if rk >= -1 else -rk
+            j2 = k - 1 if r - 1 <= pk else p - r
+            for j in range(j1, j2 + 1):
+                a[s2, :, j] = ((a[s1, :, j] - a[s1, :, j - 1]) /
+                               ndu[:, pk + 1, rk + j])
+                dk += a[s2, :, j] * ndu[:, rk + j, pk]
+            if r <= pk:
+                a[s2, :, k] = -a[s1, :, k - 1] / ndu[:, pk + 1, r]
+                dk += a[s2, :, k] * ndu[:, r, pk]
+            ders[:, k, r] = dk
+            s1, s2 = s2, s1
+
+    r = p
+    for k in range(1, min(d, p) + 1):
+        ders[:, k, :] *= r
+        r *= p - k
+    return ders
+
+
+def curve_derivs_array(n, p, uk, cpw, u, d=0):
+    """
+    Compute the derivatives of a NURBS curve at many parameters.
+
+    :param int n: Number of control points - 1.
+    :param int p: Degree.
+    :param ndarray uk: Knot vector.
+    :param ndarray cpw: Homogeneous control points.
+    :param array_like u: Parameters.
+    :param int d: Highest derivative.
+
+    :return: Curve points and derivatives with shape (N, d + 1, 3).
+    :rtype: ndarray
+
+    Reference: Algorithms A3.2 and A4.2 from "The NURBS Book"
+    """
+    u = asarray(u, dtype=float64).ravel()
+    spans = find_span_array(n, p, u, uk)
+    nders = ders_basis_funs_array(spans, u, p, d, uk)
+    indx = spans[:, None] - p + arange(p + 1)
+    cpw = asarray(cpw, dtype=float64)
+    aders = einsum('nkr,nrj->nkj', nders, cpw[indx])
+    return rat_curve_derivs(aders, d)
+
+
+def rat_curve_derivs(aders, d):
+    """
+    Compute the derivatives of a rational curve from the derivatives of
+    its homogeneous form.
+
+    :param ndarray aders: Homogeneous derivatives with shape
+        (N, d + 1, 4).
+    :param int d: Highest derivative.
+
+    :return: Curve points and derivatives with shape (N, d + 1, 3).
+    :rtype: ndarray
+
+    Reference: Algorithm A4.2 from "The NURBS Book"
+    """
+    wders = aders[:, :, -1]
+    ck = zeros((aders.shape[0], d + 1, aders.shape[2] - 1), dtype=float64)
+    for k in range(0, d + 1):
+        v = aders[:, k, :-1].copy()
+        for i in range(1, k + 1):
+            v -= binomial(k, i) * wders[:, i, None] * ck[:, k - i]
+        ck[:, k] = v / wders[:, 0, None]
+    return ck
+
+
+def surface_derivs_array(n, p, uk, m, q, vk, cpw, u, v, d=0):
+    """
+    Compute the derivatives of a NURBS surface at many pairs of parameters.
+
+    :param int n: Number of control points in u-direction - 1.
+    :param int p: Degree in u-direction.
+    :param ndarray uk: Knot vector in u-direction.
+    :param int m: Number of control points in v-direction - 1.
+    :param int q: Degree in v-direction.
+    :param ndarray vk: Knot vector in v-direction.
+    :param ndarray cpw: Homogeneous control points.
+    :param array_like u: Parameters in u-direction.
+    :param array_like v: Parameters in v-direction.
+    :param int d: Highest derivative.
+
+    :return: Surface points and derivatives with shape
+        (N, d + 1, d + 1, 3). The derivative with respect to u *k* times
+        and v *l* times is at index [:, k, l] when *k* + *l* <= *d*.
+    :rtype: ndarray
+
+    Reference: Algorithms A3.6 and A4.4 from "The NURBS Book"
+    """
+    u = asarray(u, dtype=float64).ravel()
+    v = asarray(v, dtype=float64).ravel()
+    uspans = find_span_array(n, p, u, uk)
+    vspans = find_span_array(m, q, v, vk)
+    nu = ders_basis_funs_array(uspans, u, p, d, uk)
+    nv = ders_basis_funs_array(vspans, v, q, d, vk)
+    iu = uspans[:, None, None] - p + arange(p + 1)[None, :, None]
+    iv = vspans[:, None, None] - q + arange(q + 1)[None, None, :]
+    cpw = asarray(cpw, dtype=float64)
+    aders = einsum('nkr,nls,nrsj->nklj', nu, nv, cpw[iu, iv])
+    return rat_surface_derivs(aders, d)
+
+
+def rat_surface_derivs(aders, d):
+    """
+    Compute the derivatives of a rational surface from the derivatives of
+    its homogeneous form.
+
+    :param ndarray aders: Homogeneous derivatives with shape
+        (N, d + 1, d + 1, 4).
+    :param int d: Highest derivative.
+
+    :return: Surface points and derivatives with shape
+        (N, d + 1, d + 1, 3).
+    :rtype: ndarray
+
+    Reference: Algorithm A4.4 from "The NURBS Book"
+    """
+    wders = aders[:, :, :, -1]
+    skl = zeros((aders.shape[0], d + 1, d + 1, aders.shape[3] - 1),
+                dtype=float64)
+    for k in range(0, d + 1):
+        for l in range(0, d - k + 1):
+            v = aders[:, k, l, :-1].copy()
+            for j in range(1, l + 1):
+                v -= binomial(l, j) * wders[:, 0, j, None] * skl[:, k, l - j]
+            for i in range(1, k + 1):
+                v -= binomial(k, i) * wders[:, i, 0, None] * skl[:, k - i, l]
+                v2 = zeros_like(v)
+                for j in range(1, l + 1):
+                    v2 += (binomial(l, j) * wders[:, i, j, None] *
+                           skl[:, k - i, l - j])
+                v -= binomial(k, i) * v2
+            skl[:, k, l] = v / wders[:, 0, 0, None]
+    return skl
+
+
+def curve_knot_ins(n, p, uk, cpw, u, r=1):
+    """
+    Insert a knot into a curve. The control points may have any number of
+    trailing dimensions so the rows or columns of a surface control net can
+    be processed at once.
+
+    :param int n: Number of control points - 1.
+    :param int p: Degree.
+    :param ndarray uk: Knot vector.
+    :param ndarray cpw: Homogeneous control points.
+    :param float u: Knot to insert.
+    :param int r: Number of times to insert the knot. It is limited so the
+        multiplicity of the knot is not greater than the degree.
+
+    :return: The new knot vector and homogeneous control points.
+    :rtype: tuple(ndarray)
+
+    Reference: Algorithm A5.1 from "The NURBS Book"
+    """
+    uk = asarray(uk, dtype=float64)
+    cpw = asarray(cpw, dtype=float64)
+    k = find_span(n, p, u, uk)
+    s = int(sum(uk == u))
+    r = min(r, p - s)
+    if r <= 0:
+        return uk.copy(), cpw.copy()
+
+    uq = hstack((uk[:k + 1], [u] * r, uk[k + 1:]))
+    qw = zeros((n + 1 + r,) + cpw.shape[1:], dtype=float64)
+    qw[:k - p + 1] = cpw[:k - p + 1]
+    qw[k - s + r:] = cpw[k - s:]
+    rw = cpw[k - p:k - s + 1].copy()
+    lw = k - p
+    for j in range(1, r + 1):
+        lw = k - p + j
+        for i in range(0, p - j - s + 1):
+            alpha = (u - uk[lw + i]) / (uk[i + k + 1] - uk[lw + i])
+            rw[i] = alpha * rw[i + 1] + (1.0 - alpha) * rw[i]
+        qw[lw] = rw[0]
+        qw[k + r - j - s] = rw[p - j - s]
+    for i in range(lw + 1, k - s):
+        qw[i] = rw[i - lw]
+    return uq, qw
+
+
+def degree_elevate_curve(n, p, uk, cpw, t=1):
+    """
+    Elevate the degree of a curve. The control points may have any number
+    of trailing dimensions so the rows or columns of a surface control net
+    can be processed at once.
+
+    :param int n: Number of control points - 1.
+    :param int p: Degree.
+    :param ndarray uk: Knot vector.
+    :param ndarray cpw: Homogeneous control points.
+    :param int t: Number of degrees to elevate.
+
+    :return: The new knot vector and homogeneous control points.
+    :rtype: tuple(ndarray)
+
+    Reference: Algorithm A5.9 from "The NURBS Book"
+    """
+    uk = asarray(uk, dtype=float64)
+    cpw = asarray(cpw, dtype=float64)
+    if t <= 0:
+        return uk.copy(), cpw.copy()
+
+    m = n + p + 1
+    ph = p + t
+    ph2 = ph // 2
+    shape = cpw.shape[1:]
+
+    # Coefficients for degree elevating the Bezier segments
+    bezalfs = zeros((ph + 1, p + 1), dtype=float64)
+    bezalfs[0, 0] = bezalfs[ph, p] = 1.0
+    for i in range(1, ph2 + 1):
+        inv = 1.0 / binomial(ph, i)
+        for j in range(max(0, i - t), min(p, i) + 1):
+            bezalfs[i, j] = inv * binomial(p, j) * binomial(t, i - j)
+    for i in range(ph2 + 1, ph):
+        for j in range(max(0, i - t), min(p, i) + 1):
+            bezalfs[i, j] = bezalfs[ph - i, p - j]
+
+    nspans = len(set(uk.tolist())) - 1
+    uh = zeros(m + 1 + (nspans + 1) * t, dtype=float64)
+    qw = zeros((n + 1 + nspans * t,) + shape, dtype=float64)
+    bpts = cpw[:p + 1].copy()
+    ebpts = zeros((ph + 1,) + shape, dtype=float64)
+    nextbpts = zeros((max(p - 1, 0),) + shape, dtype=float64)
+    alfs = zeros(max(p - 1, 0), dtype=float64)
+
+    mh = ph
+    kind = ph + 1
+    r = -1
+    a = p
+    b = p + 1
+    cind = 1
+    ua = uk[0]
+    qw[0] = cpw[0]
+    uh[:ph + 1] = ua
+    while b < m:
+        i = b
+        while b < m and uk[b] == uk[b + 1]:
+            b += 1
+        mul = b - i + 1
+        mh += mul + t
+        ub = uk[b]
+        oldr = r
+        r = p - mul
+        lbz = (oldr + 2) // 2 if oldr > 0 else 1
+        rbz = ph - (r + 1) // 2 if r > 0 else ph
+
+        # Insert the knot to get the Bezier segment
+        if r > 0:
+            numer = ub - ua
+            for k in range(p, mul, -1):
+                alfs[k - mul - 1] = numer / (uk[a + k] - ua)
+            for j in range(1, r + 1):
+                save = r - j
+                s = mul + j
+                for k in range(p, s - 1, -1):
+                    bpts[k] = (alfs[k - s] * bpts[k] +
+                               (1.0 - alfs[k - s]) * bpts[k - 1])
+                nextbpts[save] = bpts[p]
+
+        # Degree elevate the Bezier segment
+        for i in range(lbz, ph + 1):
+            ebpts[i] = 0.0
+            for j in range(max(0, i - t), min(p, i) + 1):
+                ebpts[i] += bezalfs[i, j] * bpts[j]
+
+        # Remove the knot inserted for the previous segment
+        if oldr > 1:
+            first = kind - 2
+            last = kind
+            den = ub - ua
+            bet = (ub - uh[kind - 1]) / den
+            for tr in range(1, oldr):
+                i = first
+                j = last
+                kj = j - kind + 1
+                while j - i > tr:
+                    if i < cind:
+                        alf = (ub - uh[i]) / (ua - uh[i])
+                        qw[i] = alf * qw[i] + (1.0 - alf) * qw[i - 1]
+                    if j >= lbz:
+                        if j - tr <= kind - ph + oldr:
+                            gam = (ub - uh[j - tr]) / den
+                            ebpts[kj] = (gam * ebpts[kj] +
+                                         (1.0 - gam) * ebpts[kj + 1])
+                        else:
+                            ebpts[kj] = (bet * ebpts[kj] +
+                                         (1.0 - bet) * ebpts[kj + 1])
+                    i += 1
+                    j -= 1
+                    kj -= 1
+                first -= 1
+                last += 1
+
+        # Load the knots and control points
+        if a != p:
+            for i in range(0, ph - oldr):
+                uh[kind] = ua
+                kind += 1
+        for j in range(lbz, rbz + 1):
+            qw[cind] = ebpts[j]
+            cind += 1
+
+        if b < m:
+            bpts[:r] = nextbpts[:r]
+            bpts[r:] = cpw[b - p + r:b + 1]
+            a = b
+            b += 1
+            ua = ub
+        else:
+            uh[kind:kind + ph + 1] = ub
+
+    nh = mh - ph - 1
+    return uh[:nh + ph + 2].copy(), qw[:nh + 1].copy()
+
+
+def binomial(n, k):
+    """
+    Compute the binomial coefficient.
+
+    :param int n: Number of items.
+    :param int k: Number of items chosen.
+
+    :return: Binomial coefficient.
+    :rtype: int
+    """
+    if k < 0 or k > n:
+        return 0
+    return factorial(n) // (factorial(k) * factorial(n - k))
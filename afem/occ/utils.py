@@ -23,8 +23,9 @@ from OCCT.TColgp import (TColgp_Array1OfPnt, TColgp_Array1OfPnt2d,
                          TColgp_Array2OfPnt, TColgp_HArray1OfPnt,
                          TColgp_HArray1OfPnt2d)
 from OCCT.TopoDS import TopoDS_ListOfShape
-from OCCT.gp import gp_Pnt, gp_Pnt2d
-from numpy import array as np_array, zeros
+from OCCT.gp import gp_Pnt, gp_Pnt2d, gp_Vec, gp_Vec2d
+from numpy import array as np_array, cross, meshgrid, zeros
+from numpy.linalg import norm
 
 from afem.misc.utils import is_array_like
 
@@ -337,6 +338,174 @@ def to_np_from_tcolstd_array2_real(tcol_array):
     return array
 
 
+def eval_curve_array(crv, u, d=0):
+    """
+    Evaluate points or derivatives of a 3-D curve at many parameters. The
+    OCC objects receiving the results are reused for every parameter.
+
+    :param crv: The curve.
+    :type crv: OCCT.Geom.Geom_Curve or OCCT.Adaptor3d.Adaptor3d_Curve
+    :param array_like u: The parameters.
+    :param int d: The derivative to evaluate. Use zero for points.
+
+    :return: Array of points or derivatives with shape (N, 3).
+    :rtype: numpy.ndarray
+    """
+    u = np_array(u, dtype=float).ravel()
+    array = zeros((u.size, 3), dtype=float)
+    if d == 0:
+        p = gp_Pnt()
+        for i, ui in enumerate(u.tolist()):
+            crv.D0(ui, p)
+            array[i, :] = p.X(), p.Y(), p.Z()
+    elif d == 1:
+        p, v = gp_Pnt(), gp_Vec()
+        for i, ui in enumerate(u.tolist()):
+            crv.D1(ui, p, v)
+            array[i, :] = v.X(), v.Y(), v.Z()
+    else:
+        for i, ui in enumerate(u.tolist()):
+            v = crv.DN(ui, d)
+            array[i, :] = v.X(), v.Y(), v.Z()
+    return array
+
+
+def eval_curve2d_array(crv, u, d=0):
+    """
+    Evaluate points or derivatives of a 2-D curve at many parameters. The
+    OCC objects receiving the results are reused for every parameter.
+
+    :param OCCT.Geom2d.Geom2d_Curve crv: The curve.
+    :param array_like u: The parameters.
+    :param int d: The derivative to evaluate. Use zero for points.
+
+    :return: Array of points or derivatives with shape (N, 2).
+    :rtype: numpy.ndarray
+    """
+    u = np_array(u, dtype=float).ravel()
+    array = zeros((u.size, 2), dtype=float)
+    if d == 0:
+        p = gp_Pnt2d()
+        for i, ui in enumerate(u.tolist()):
+            crv.D0(ui, p)
+            array[i, :] = p.X(), p.Y()
+    elif d == 1:
+        p, v = gp_Pnt2d(), gp_Vec2d()
+        for i, ui in enumerate(u.tolist()):
+            crv.D1(ui, p, v)
+            array[i, :] = v.X(), v.Y()
+    else:
+        for i, ui in enumerate(u.tolist()):
+            v = crv.DN(ui, d)
+            array[i, :] = v.X(), v.Y()
+    return array
+
+
+def eval_surface_array(srf, u, v, nu=0, nv=0, grid=False):
+    """
+    Evaluate points or derivatives of a surface at many parameters. The
+    OCC objects receiving the results are reused for every parameter.
+
+    :param srf: The surface.
+    :type srf: OCCT.Geom.Geom_Surface or OCCT.Adaptor3d.Adaptor3d_Surface
+    :param array_like u: The u-parameters.
+    :param array_like v: The v-parameters.
+    :param int nu: The derivative in u-direction.
+    :param int nv: The derivative in v-direction.
+    :param bool grid: Option to evaluate every combination of the u- and
+        v-parameters. Otherwise they are evaluated in pairs.
+
+    :return: Array of points or derivatives with shape (N, 3), or with
+        shape (Nu, Nv, 3) for a grid.
+    :rtype: numpy.ndarray
+
+    :raise ValueError: If the parameters are paired but their sizes are
+        different.
+    """
+    u, v, shape = _surface_params(u, v, grid)
+    array = zeros((u.size, 3), dtype=float)
+    uv = zip(u.tolist(), v.tolist())
+    n = nu + nv
+    if n == 0:
+        p = gp_Pnt()
+        for i, (ui, vi) in enumerate(uv):
+            srf.D0(ui, vi, p)
+            array[i, :] = p.X(), p.Y(), p.Z()
+    elif n == 1:
+        p, du, dv = gp_Pnt(), gp_Vec(), gp_Vec()
+        d = du if nu == 1 else dv
+        for i, (ui, vi) in enumerate(uv):
+            srf.D1(ui, vi, p, du, dv)
+            array[i, :] = d.X(), d.Y(), d.Z()
+    elif n == 2:
+        p, du, dv = gp_Pnt(), gp_Vec(), gp_Vec()
+        duu, dvv, duv = gp_Vec(), gp_Vec(), gp_Vec()
+        d = {2: duu, 1: duv, 0: dvv}[nu]
+        for i, (ui, vi) in enumerate(uv):
+            srf.D2(ui, vi, p, du, dv, duu, dvv, duv)
+            array[i, :] = d.X(), d.Y(), d.Z()
+    else:
+        for i, (ui, vi) in enumerate(uv):
+            d = srf.DN(ui, vi, nu, nv)
+            array[i, :] = d.X(), d.Y(), d.Z()
+    return array.reshape(shape + (3,))
+
+
+def eval_surface_norm_array(srf, u, v, grid=False, unit=True):
+    """
+    Evaluate normals of a surface at many parameters as the cross product
+    of the first derivatives.
+
+    :param srf: The surface.
+    :type srf: OCCT.Geom.Geom_Surface or OCCT.Adaptor3d.Adaptor3d_Surface
+    :param array_like u: The u-parameters.
+    :param array_like v: The v-parameters.
+    :param bool grid: Option to evaluate every combination of the u- and
+        v-parameters. Otherwise they are evaluated in pairs.
+    :param bool unit: Option to normalize the normals. Normals with zero
+        length are left as zero.
+
+    :return: Array of normals with shape (N, 3), or with shape (Nu, Nv, 3)
+        for a grid.
+    :rtype: numpy.ndarray
+
+    :raise ValueError: If the parameters are paired but their sizes are
+        different.
+    """
+    u, v, shape = _surface_params(u, v, grid)
+    du_array = zeros((u.size, 3), dtype=float)
+    dv_array = zeros((u.size, 3), dtype=float)
+    p, du, dv = gp_Pnt(), gp_Vec(), gp_Vec()
+    for i, (ui, vi) in enumerate(zip(u.tolist(), v.tolist())):
+        srf.D1(ui, vi, p, du, dv)
+        du_array[i, :] = du.X(), du.Y(), du.Z()
+        dv_array[i, :] = dv.X(), dv.Y(), dv.Z()
+
+    array = cross(du_array, dv_array)
+    if unit:
+        mag = norm(array, axis=1)
+        nonzero = mag > 0.
+        array[nonzero] /= mag[nonzero, None]
+    return array.reshape(shape + (3,))
+
+
+def _surface_params(u, v, grid):
+    """
+    Flatten the surface parameters and get the shape of the results.
+    """
+    u = np_array(u, dtype=float).ravel()
+    v = np_array(v, dtype=float).ravel()
+    if grid:
+        shape = (u.size, v.size)
+        u, v = meshgrid(u, v, indexing='ij')
+        return u.ravel(), v.ravel(), shape
+
+    if u.size != v.size:
+        msg = 'The number of u- and v-parameters must be the same.'
+        raise ValueError(msg)
+    return u, v, (u.size,)
+
+
 def to_topods_list(shapes):
     """
     Create TopoDS_ListOfShape from shapes.
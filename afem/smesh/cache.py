@@ -0,0 +1,252 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import hashlib
+import os
+from tempfile import TemporaryDirectory
+
+from OCCT.BRepTools import BRepTools
+from OCCT.gp import gp_Pnt
+
+from afem.config import logger
+from afem.exchange.brep import write_brep
+from afem.exchange.snapshot import read_snapshot, write_snapshot
+from afem.topology.entities import Shape
+
+__all__ = ["MeshCache"]
+
+# Version of the key recipe so old entries are not reused if it changes
+_KEY_VERSION = b'1'
+_EXT = '.afm'
+
+
+class MeshCache(object):
+    """
+    On-disk cache of computed meshes. Each entry is a mesh snapshot keyed by
+    a hash of the shape to mesh and the controls applied to it. The least
+    recently used entries are removed when the total size exceeds the limit.
+
+    :param str path: The cache directory. It is created if needed.
+    :param int max_size: The maximum total size of the entries in bytes.
+    """
+
+    def __init__(self, path, max_size=2 ** 30):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._path = path
+        self._max_size = max_size
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def path(self):
+        """
+        :return: The cache directory.
+        :rtype: str
+        """
+        return self._path
+
+    @property
+    def max_size(self):
+        """
+        :return: The maximum total size of the entries in bytes.
+        :rtype: int
+        """
+        return self._max_size
+
+    @property
+    def num_entries(self):
+        """
+        :return: The number of entries.
+        :rtype: int
+        """
+        return len(self._entries())
+
+    @property
+    def size(self):
+        """
+        :return: The total size of the entries in bytes.
+        :rtype: int
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    @property
+    def stats(self):
+        """
+        :return: The number of hits, misses, and evictions since the cache
+            was created, along with the number of entries and their total
+            size.
+        :rtype: dict
+        """
+        return {'hits': self._hits, 'misses': self._misses,
+                'evictions': self._evictions,
+                'entries': self.num_entries, 'size': self.size}
+
+    @staticmethod
+    def key(the_mesh, controls):
+        """
+        Build the key for a mesh and its controls. The key hashes the shape
+        to mesh in BREP format and the spec of each control, which includes
+        its type, construction arguments, and setter calls, along with the
+        sub-shape indices it applies to. Shapes in the arguments are hashed
+        by their sub-shape indices and points by their coordinates. Any
+        triangulation of the shape, like one made to display it, is not
+        part of the key.
+
+        :param afem.smesh.entities.Mesh the_mesh: The mesh. It must have a
+            shape to mesh.
+        :param controls: The controls and the shapes they are applied to.
+        :type controls:
+            collections.Sequence(tuple(afem.smesh.hypotheses.Hypothesis,
+            afem.topology.entities.Shape))
+
+        :return: The key.
+        :rtype: str
+        """
+        sha = hashlib.sha256(_KEY_VERSION)
+
+        # Hash a copy without triangulations
+        shape = the_mesh.shape.copy()
+        BRepTools.Clean_(shape.object)
+        with TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, 'shape.brep')
+            write_brep(shape, fn)
+            with open(fn, 'rb') as fin:
+                sha.update(fin.read())
+
+        ds = the_mesh.ds
+        for hyp, shape in controls:
+            cls, args, kwargs, calls = _key_value(hyp.spec, ds)
+            spec = (cls.__module__, cls.__name__, args, kwargs, calls,
+                    _shape_indices(shape, ds))
+            sha.update(repr(spec).encode())
+
+        return sha.hexdigest()
+
+    def restore(self, key, the_mesh):
+        """
+        Restore the mesh from the cache if the key is found. Nodes and
+        elements are bound to the sub-shapes of the mesh shape.
+
+        :param str key: The key.
+        :param afem.smesh.entities.Mesh the_mesh: The mesh. It should be
+            empty and have the same shape used to build the key.
+
+        :return: *True* if restored, *False* if not found.
+        :rtype: bool
+        """
+        fn = self._filename(key)
+        if not os.path.isfile(fn):
+            self._misses += 1
+            return False
+
+        read_snapshot(the_mesh, fn, groups=False)
+        os.utime(fn, None)
+        self._hits += 1
+        logger.info('Restored mesh {} from the cache.'.format(key))
+        return True
+
+    def store(self, key, the_mesh):
+        """
+        Store the mesh in the cache and remove the least recently used
+        entries if the cache is over its size limit.
+
+        :param str key: The key.
+        :param afem.smesh.entities.Mesh the_mesh: The mesh.
+
+        :return: *True* if stored, *False* if not.
+        :rtype: bool
+        """
+        fn = self._filename(key)
+        tmp = fn + '.tmp'
+        if not write_snapshot(the_mesh, tmp):
+            return False
+        os.replace(tmp, fn)
+        self._evict()
+        return os.path.isfile(fn)
+
+    def clear(self):
+        """
+        Remove all entries.
+
+        :return: None.
+        """
+        for fn, _, _ in self._entries():
+            os.remove(fn)
+
+    def _filename(self, key):
+        """
+        Entry filename for the key.
+        """
+        return os.path.join(self._path, key + _EXT)
+
+    def _entries(self):
+        """
+        List the entries as (filename, size, last access time).
+        """
+        entries = []
+        for name in os.listdir(self._path):
+            if not name.endswith(_EXT):
+                continue
+            fn = os.path.join(self._path, name)
+            stat = os.stat(fn)
+            entries.append((fn, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until under the size limit.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for fn, size, _ in entries:
+            if total <= self._max_size:
+                break
+            os.remove(fn)
+            total -= size
+            self._evictions += 1
+
+
+def _shape_indices(shape, ds):
+    """
+    Get the index of a shape in the mesh data structure, or the sorted
+    indices of its faces, edges, and vertices if it is not indexed.
+    """
+    indx = ds.shape_to_index(shape)
+    if indx > 0:
+        return [indx]
+    shapes = shape.faces + shape.edges + shape.vertices
+    return sorted(ds.shape_to_index(s) for s in shapes)
+
+
+def _key_value(value, ds):
+    """
+    Convert a value in a hypothesis spec to one with a stable
+    representation.
+    """
+    if isinstance(value, Shape):
+        return 'Shape', _shape_indices(value, ds)
+    if isinstance(value, gp_Pnt):
+        return value.X(), value.Y(), value.Z()
+    if isinstance(value, (list, tuple)):
+        return type(value)([_key_value(v, ds) for v in value])
+    if isinstance(value, dict):
+        return sorted((k, _key_value(v, ds)) for k, v in value.items())
+    return value
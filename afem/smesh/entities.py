@@ -19,11 +19,15 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from __future__ import division
 
+from array import array as typed_array
+
 from OCCT.SMDSAbs import SMDSAbs_ElementType
 from OCCT.SMESH import SMESH_Gen, SMESH_subMesh
-from numpy import array, cross, linalg
+from numpy import (arange, array, cross, frombuffer, int64, linalg, unique,
+                   zeros)
 
 from afem.geometry.entities import Point
+from afem.smesh.quality import face_metrics
 from afem.topology.entities import Shape
 
 __all__ = ["Node", "Element", "FaceSide",
@@ -302,56 +306,81 @@ class Element(object):
         """
         :return: The minimum element angle in degrees.
         :rtype: float
+
+        :raise ValueError: If the element is not a tri or quad.
         """
-        raise NotImplementedError()
+        return self._quality('min_angle')
 
     @property
     def max_angle(self):
         """
         :return: The maximum element angle in degrees.
         :rtype: float
+
+        :raise ValueError: If the element is not a tri or quad.
         """
-        raise NotImplementedError()
+        return self._quality('max_angle')
 
     @property
     def aspect_ratio(self):
         """
         :return: The element aspect ratio.
         :rtype: float
+
+        :raise ValueError: If the element is not a tri or quad.
         """
-        raise NotImplementedError()
+        return self._quality('aspect_ratio')
 
     @property
     def warp_angle(self):
         """
         :return: The element warping in degrees.
         :rtype: float
+
+        :raise ValueError: If the element is not a tri or quad.
         """
-        raise NotImplementedError()
+        return self._quality('warp_angle')
 
     @property
     def taper_ratio(self):
         """
         :return: The element taper ratio.
         :rtype: float
+
+        :raise ValueError: If the element is not a tri or quad.
         """
-        raise NotImplementedError()
+        return self._quality('taper_ratio')
 
     @property
     def skew_angle(self):
         """
         :return: The element skew angle.
         :rtype: float
+
+        :raise ValueError: If the element is not a tri or quad.
         """
-        raise NotImplementedError()
+        return self._quality('skew_angle')
 
     @property
     def jacobian(self):
         """
-        :return: The element Jacobian.
+        :return: The element Jacobian ratio.
         :rtype: float
+
+        :raise ValueError: If the element is not a tri or quad.
         """
-        raise NotImplementedError()
+        return self._quality('jacobian')
+
+    def _quality(self, name):
+        """
+        Compute a quality metric using the corner nodes of a tri or quad.
+        """
+        num_corners = self.num_corner_nodes
+        if num_corners not in (3, 4):
+            msg = 'Only tri and quad elements are supported.'
+            raise ValueError(msg)
+        xyz = array([n.xyz for n in self.node_iter][:num_corners])
+        return float(face_metrics(xyz[None, :, :])[name][0])
 
     def is_medium_node(self, node):
         """
@@ -1034,6 +1063,52 @@ class MeshDS(object):
         while iter_.more():
             yield Element(iter_.next())
 
+    def node_arrays(self):
+        """
+        Get the nodes of the mesh as arrays.
+
+        :return: The node ID's and an array of shape (n, 3) of their
+            coordinates.
+        :rtype: tuple(numpy.ndarray)
+        """
+        return _node_arrays(self._ds.nodesIterator(True))
+
+    def edge_arrays(self, by_nnodes=False):
+        """
+        Get the edges of the mesh as arrays.
+
+        :param bool by_nnodes: Option to split the elements by their number
+            of nodes, which gives the element type, like triangles and
+            quadrilaterals for faces.
+
+        :return: The element ID's, the padded connectivity array of shape
+            (n, m) where m is the maximum number of nodes, and the number of
+            nodes of each element. Unused columns are zero. If *by_nnodes*
+            is *True*, a dictionary with the number of nodes as keys and the
+            element ID's and connectivity array of shape (n, nnodes) as
+            values.
+        :rtype: tuple(numpy.ndarray) or dict
+        """
+        return _elm_arrays(self._ds.edgesIterator(True), by_nnodes)
+
+    def face_arrays(self, by_nnodes=False):
+        """
+        Get the faces of the mesh as arrays.
+
+        :param bool by_nnodes: Option to split the elements by their number
+            of nodes, which gives the element type, like triangles and
+            quadrilaterals for faces.
+
+        :return: The element ID's, the padded connectivity array of shape
+            (n, m) where m is the maximum number of nodes, and the number of
+            nodes of each element. Unused columns are zero. If *by_nnodes*
+            is *True*, a dictionary with the number of nodes as keys and the
+            element ID's and connectivity array of shape (n, nnodes) as
+            values.
+        :rtype: tuple(numpy.ndarray) or dict
+        """
+        return _elm_arrays(self._ds.facesIterator(True), by_nnodes)
+
     def move_node(self, node, x, y, z):
         """
         Move node to given location.
@@ -1308,6 +1383,34 @@ class SubMeshDS(object):
         while iter_.more():
             yield Element(iter_.next())
 
+    def node_arrays(self):
+        """
+        Get the nodes of the sub-mesh as arrays.
+
+        :return: The node ID's and an array of shape (n, 3) of their
+            coordinates.
+        :rtype: tuple(numpy.ndarray)
+        """
+        return _node_arrays(self._ds.GetNodes())
+
+    def elm_arrays(self, by_nnodes=False):
+        """
+        Get the elements of the sub-mesh as arrays.
+
+        :param bool by_nnodes: Option to split the elements by their number
+            of nodes, which gives the element type, like triangles and
+            quadrilaterals for faces.
+
+        :return: The element ID's, the padded connectivity array of shape
+            (n, m) where m is the maximum number of nodes, and the number of
+            nodes of each element. Unused columns are zero. If *by_nnodes*
+            is *True*, a dictionary with the number of nodes as keys and the
+            element ID's and connectivity array of shape (n, nnodes) as
+            values.
+        :rtype: tuple(numpy.ndarray) or dict
+        """
+        return _elm_arrays(self._ds.GetElements(), by_nnodes)
+
     @classmethod
     def wrap(cls, sub_meshds):
         """
@@ -1512,6 +1615,44 @@ class MeshGroup(object):
         while it.more():
             yield Element(it.next())
 
+    def node_arrays(self):
+        """
+        Get the nodes of the group as arrays.
+
+        :return: The node ID's and an array of shape (n, 3) of their
+            coordinates.
+        :rtype: tuple(numpy.ndarray)
+
+        :raise TypeError: If group is not a node group.
+        """
+        if self.type != Mesh.NODE:
+            raise TypeError('Group is not a node group.')
+
+        return _node_arrays(self._ds.GetElements())
+
+    def elm_arrays(self, by_nnodes=False):
+        """
+        Get the elements of the group as arrays.
+
+        :param bool by_nnodes: Option to split the elements by their number
+            of nodes, which gives the element type, like triangles and
+            quadrilaterals for faces.
+
+        :return: The element ID's, the padded connectivity array of shape
+            (n, m) where m is the maximum number of nodes, and the number of
+            nodes of each element. Unused columns are zero. If *by_nnodes*
+            is *True*, a dictionary with the number of nodes as keys and the
+            element ID's and connectivity array of shape (n, nnodes) as
+            values.
+        :rtype: tuple(numpy.ndarray) or dict
+
+        :raise TypeError: If the group is not an element group.
+        """
+        if self.type == Mesh.NODE:
+            raise TypeError('Group is not an element group.')
+
+        return _elm_arrays(self._ds.GetElements(), by_nnodes)
+
     def set_name(self, name):
         """
         Set the group name.
@@ -1663,3 +1804,43 @@ class MeshGroup(object):
                 new_group._ds.Add(e)
 
         return new_group
+
+
+def _node_arrays(iter_):
+    """
+    Gather node ID's and coordinates from a node iterator in a single pass.
+    """
+    nids, xyz = typed_array('q'), typed_array('d')
+    while iter_.more():
+        node = iter_.next()
+        nids.append(node.GetID())
+        xyz.extend((node.X(), node.Y(), node.Z()))
+    return frombuffer(nids, dtype=int64), frombuffer(xyz).reshape(-1, 3)
+
+
+def _elm_arrays(iter_, by_nnodes=False):
+    """
+    Gather element ID's and padded connectivity from an element iterator in a
+    single pass. Optionally split them by the number of nodes.
+    """
+    eids, nnodes, flat = typed_array('q'), typed_array('q'), typed_array('q')
+    while iter_.more():
+        elm = iter_.next()
+        nn = elm.NbNodes()
+        eids.append(elm.GetID())
+        nnodes.append(nn)
+        flat.extend([elm.GetNode(i).GetID() for i in range(nn)])
+
+    eids = frombuffer(eids, dtype=int64)
+    nnodes = frombuffer(nnodes, dtype=int64)
+    ncols = int(nnodes.max()) if nnodes.size > 0 else 0
+    conn = zeros((nnodes.size, ncols), dtype=int64)
+    conn[arange(ncols) < nnodes[:, None]] = frombuffer(flat, dtype=int64)
+    if not by_nnodes:
+        return eids, conn, nnodes
+
+    arrays = {}
+    for nn in unique(nnodes).tolist():
+        mask = nnodes == nn
+        arrays[nn] = eids[mask], conn[mask, :nn]
+    return arrays
@@ -17,6 +17,8 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from functools import wraps
+
 try:
     from OCCT.BLSURFPlugin import BLSURFPlugin_BLSURF, BLSURFPlugin_Hypothesis
 
@@ -54,6 +56,20 @@ __all__ = ["Hypothesis", "Algorithm", "Regular1D", "CompositeSide1D",
            "MeshGemsAlgo2D", "MeshGemsHypo2D"]
 
 
+def _recorded(method):
+    """
+    Record the calls of a method that changes a hypothesis after it is
+    constructed so that they are part of its spec.
+    """
+
+    @wraps(method)
+    def _method(self, *args, **kwargs):
+        self._calls.append((method.__name__, args, kwargs))
+        return method(self, *args, **kwargs)
+
+    return _method
+
+
 class Hypothesis(object):
     """
     Base class for all hypotheses.
@@ -61,9 +77,48 @@ class Hypothesis(object):
     :param OCCT.SMESH.SMESH_Hypothesis hyp: The SMESH hypothesis.
     """
 
+    def __new__(cls, *args, **kwargs):
+        # Keep the arguments after the mesh generator and the changes made
+        # by the setter methods so the same hypothesis can be built again in
+        # another generator
+        new_hyp = super(Hypothesis, cls).__new__(cls)
+        new_hyp._args = args[1:]
+        new_hyp._kwargs = kwargs
+        new_hyp._calls = []
+        return new_hyp
+
     def __init__(self, hyp):
         self._hyp = hyp
 
+    @property
+    def spec(self):
+        """
+        :return: The hypothesis type, the arguments used to construct it
+            other than the mesh generator, and the method name and arguments
+            of each setter call made after construction in order. Changes
+            made directly to the underlying hypothesis are not included.
+        :rtype: tuple(type, tuple, dict, tuple(tuple(str, tuple, dict)))
+        """
+        return type(self), self._args, self._kwargs, tuple(self._calls)
+
+    @staticmethod
+    def by_spec(gen, spec):
+        """
+        Build a hypothesis from a spec by constructing it and then repeating
+        the setter calls.
+
+        :param afem.smesh.entities.MeshGen gen: A mesh generator.
+        :param tuple spec: The spec. See :attr:`.spec`.
+
+        :return: The new hypothesis.
+        :rtype: afem.smesh.hypotheses.Hypothesis
+        """
+        cls, args, kwargs, calls = spec
+        hyp = cls(gen, *args, **kwargs)
+        for name, call_args, call_kwargs in calls:
+            getattr(hyp, name)(*call_args, **call_kwargs)
+        return hyp
+
     @property
     def object(self):
         """
@@ -440,6 +495,7 @@ class QuadrangleHypo2D(Hypothesis):
 
         self._hyp.SetQuadType(quad_type)
 
+    @_recorded
     def set_enforced_nodes(self, shapes, pnts):
         """
         Set enforced nodes on shapes.
@@ -644,6 +700,7 @@ class MeshGemsHypo2D(Hypothesis):
 
         self._hyp.SetQuadAllowed(allow_quads)
 
+    @_recorded
     def set_physical_size(self, size, is_rel=False):
         """
         Set physical size.
@@ -654,6 +711,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetPhySize(size, is_rel)
 
+    @_recorded
     def set_min_size(self, size, is_rel=False):
         """
         Set minimum size.
@@ -664,6 +722,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetMinSize(size, is_rel)
 
+    @_recorded
     def set_max_size(self, size, is_rel=False):
         """
         Set maximum size.
@@ -674,6 +733,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetMaxSize(size, is_rel)
 
+    @_recorded
     def set_use_gradation(self, val=True):
         """
 
@@ -682,6 +742,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetUseGradation(val)
 
+    @_recorded
     def set_gradation(self, val):
         """
 
@@ -690,6 +751,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetGradation(val)
 
+    @_recorded
     def set_quads_allowed(self, val):
         """
 
@@ -698,6 +760,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetQuadAllowed(val)
 
+    @_recorded
     def set_angle_mesh(self, val):
         """
 
@@ -706,6 +769,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetAngleMesh(val)
 
+    @_recorded
     def set_chordal_error(self, val):
         """
 
@@ -714,6 +778,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetChordalError(val)
 
+    @_recorded
     def set_anisotropic(self, val):
         """
 
@@ -722,6 +787,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetAnisotropic(val)
 
+    @_recorded
     def set_anisotropic_ratio(self, val):
         """
 
@@ -730,6 +796,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetAnisotropicRatio(val)
 
+    @_recorded
     def set_remove_tiny_edges(self, val):
         """
 
@@ -738,6 +805,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetRemoveTinyEdges(val)
 
+    @_recorded
     def set_tiny_edge_length(self, val):
         """
 
@@ -746,6 +814,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetTinyEdgeLength(val)
 
+    @_recorded
     def set_optimize_tiny_edges(self, val):
         """
 
@@ -754,6 +823,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetOptimiseTinyEdges(val)
 
+    @_recorded
     def set_tiny_edge_optimization_length(self, val):
         """
 
@@ -762,6 +832,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetTinyEdgeOptimisationLength(val)
 
+    @_recorded
     def set_correct_surface_intersection(self, val):
         """
 
@@ -770,6 +841,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetCorrectSurfaceIntersection(val)
 
+    @_recorded
     def set_correct_surface_intersection_max_cost(self, val):
         """
 
@@ -778,6 +850,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetCorrectSurfaceIntersectionMaxCost(val)
 
+    @_recorded
     def set_bad_element_removal(self, val):
         """
 
@@ -786,6 +859,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetBadElementRemoval(val)
 
+    @_recorded
     def set_bad_element_aspect_ratio(self, val):
         """
 
@@ -794,6 +868,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetBadElementAspectRatio(val)
 
+    @_recorded
     def set_optimize_mesh(self, val):
         """
 
@@ -802,6 +877,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetOptimizeMesh(val)
 
+    @_recorded
     def set_respect_geometry(self, val):
         """
 
@@ -810,6 +886,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetRespectGeometry(val)
 
+    @_recorded
     def set_max_number_of_threads(self, val):
         """
 
@@ -818,6 +895,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetMaxNumberOfThreads(val)
 
+    @_recorded
     def set_debug(self, val):
         """
 
@@ -826,6 +904,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetDebug(val)
 
+    @_recorded
     def set_required_entities(self, val):
         """
 
@@ -834,6 +913,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetRequiredEntities(val)
 
+    @_recorded
     def set_sewing_tolerance(self, val):
         """
 
@@ -842,6 +922,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetSewingTolerance(val)
 
+    @_recorded
     def set_tags(self, val):
         """
 
@@ -850,6 +931,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.SetTags(val)
 
+    @_recorded
     def add_option(self, name, val):
         """
 
@@ -859,6 +941,7 @@ class MeshGemsHypo2D(Hypothesis):
         """
         self._hyp.AddOption(name, val)
 
+    @_recorded
     def add_hyperpatch(self, patch_ids):
         """
 
@@ -0,0 +1,384 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from __future__ import division
+
+from numpy import (abs as np_abs, arange, arccos, argsort, clip, cross,
+                   degrees, einsum, empty, errstate, full, histogram, int64,
+                   isin, isnan, maximum, minimum, nanmax, nanmin, ones, roll,
+                   sqrt, zeros)
+
+from afem.config import logger
+
+__all__ = ["MeshQuality", "face_metrics"]
+
+# Metric names and whether a larger value is worse
+_METRICS = {'aspect_ratio': True,
+            'warp_angle': True,
+            'skew_angle': True,
+            'taper_ratio': True,
+            'jacobian': False,
+            'min_angle': False,
+            'max_angle': True}
+
+
+def face_metrics(xyz):
+    """
+    Compute quality metrics for a set of tri or quad elements at once.
+
+    * aspect_ratio: For quads, the ratio of the longest to the shortest line
+      joining midpoints of opposite edges. For tris, the longest edge
+      relative to its altitude, scaled so an equilateral triangle is 1.
+    * warp_angle: The largest angle (degrees) between the normals of the two
+      triangles formed by splitting a quad along either diagonal. Zero for
+      tris.
+    * skew_angle: 90 degrees minus the smallest angle between the lines
+      joining opposite edge midpoints (quads) or between each median and the
+      line joining the midpoints of the adjacent edges (tris).
+    * taper_ratio: One minus the ratio of the smallest to the average corner
+      triangle area of a quad. Zero for tris.
+    * jacobian: The ratio of the smallest to the largest signed corner
+      Jacobian of a quad. One for tris.
+    * min_angle and max_angle: The smallest and largest interior angles
+      (degrees).
+
+    :param numpy.ndarray xyz: The corner coordinates as an array of shape
+        (n, 3, 3) for tris or (n, 4, 3) for quads.
+
+    :return: Dictionary where the key is the metric name and the value is an
+        array of length n.
+    :rtype: dict(str, numpy.ndarray)
+
+    :raise ValueError: If the elements are not tris or quads.
+    """
+    nelm, ncorner = xyz.shape[:2]
+    if ncorner not in (3, 4):
+        raise ValueError('Only tri and quad elements are supported.')
+
+    with errstate(divide='ignore', invalid='ignore'):
+        # Interior angles
+        to_next = roll(xyz, -1, axis=1) - xyz
+        to_prev = roll(xyz, 1, axis=1) - xyz
+        angles = _angle(to_next, to_prev)
+        metrics = {'min_angle': angles.min(axis=1),
+                   'max_angle': angles.max(axis=1)}
+
+        # Edge midpoints where edge i joins corner i and i + 1
+        mid = 0.5 * (xyz + roll(xyz, -1, axis=1))
+
+        if ncorner == 3:
+            lengths = _norm(to_next)
+            lmax = lengths.max(axis=1)
+            area = 0.5 * _norm(cross(to_next[:, 0], -to_prev[:, 0]))
+            metrics['aspect_ratio'] = sqrt(3.) * lmax ** 2 / (4. * area)
+
+            # Median from each corner versus the line joining the midpoints
+            # of its adjacent edges
+            median = roll(mid, -1, axis=1) - xyz
+            midline = mid - roll(mid, 1, axis=1)
+            theta = _acute_angle(median, midline).min(axis=1)
+            metrics['skew_angle'] = 90. - theta
+
+            metrics['warp_angle'] = zeros(nelm)
+            metrics['taper_ratio'] = zeros(nelm)
+            metrics['jacobian'] = ones(nelm)
+            return metrics
+
+        # Quads
+        line1 = mid[:, 2] - mid[:, 0]
+        line2 = mid[:, 3] - mid[:, 1]
+        d1, d2 = _norm(line1), _norm(line2)
+        metrics['aspect_ratio'] = maximum(d1, d2) / minimum(d1, d2)
+        metrics['skew_angle'] = 90. - _acute_angle(line1, line2)
+
+        p0, p1, p2, p3 = xyz[:, 0], xyz[:, 1], xyz[:, 2], xyz[:, 3]
+        warp1 = _angle(cross(p1 - p0, p2 - p0), cross(p2 - p0, p3 - p0))
+        warp2 = _angle(cross(p2 - p1, p3 - p1), cross(p3 - p1, p0 - p1))
+        metrics['warp_angle'] = maximum(warp1, warp2)
+
+        # Signed corner areas relative to the element normal
+        normal = cross(p2 - p0, p3 - p1)
+        normal /= _norm(normal)[:, None]
+        corner = einsum('ijk,ik->ij', cross(to_next, to_prev), normal)
+        metrics['jacobian'] = corner.min(axis=1) / corner.max(axis=1)
+        avg = np_abs(corner).mean(axis=1)
+        metrics['taper_ratio'] = 1. - np_abs(corner).min(axis=1) / avg
+
+    return metrics
+
+
+class MeshQuality(object):
+    """
+    Quality report for all the tri and quad elements of a mesh. All the
+    metrics of :func:`face_metrics` are computed in vectorized form. If
+    parts are provided, then their face groups are used to report
+    results by part.
+
+    :param afem.smesh.entities.Mesh the_mesh: The mesh.
+    :param parts: The parts. They should have been initialized for meshing
+        with *the_mesh*.
+    :type parts: collections.Sequence(afem.structure.entities.Part) or None
+    """
+
+    def __init__(self, the_mesh, parts=None):
+        nids, xyz = the_mesh.ds.node_arrays()
+        eids, conn, nnodes = the_mesh.ds.face_arrays()
+
+        # Map node ID's to rows of the coordinate array
+        rows = full(nids.max() + 1 if nids.size > 0 else 0, -1, dtype=int64)
+        rows[nids] = arange(nids.size)
+
+        # Corner nodes come first for quadratic elements
+        is_tri = isin(nnodes, (3, 6, 7))
+        is_quad = isin(nnodes, (4, 8, 9))
+        keep = is_tri | is_quad
+        self._eids = eids[keep]
+        is_tri, is_quad = is_tri[keep], is_quad[keep]
+        conn = conn[keep]
+
+        self._metrics = {}
+        for name in _METRICS:
+            self._metrics[name] = empty(self._eids.size)
+        for mask, ncorner in [(is_tri, 3), (is_quad, 4)]:
+            if not mask.any():
+                continue
+            corners = xyz[rows[conn[mask, :ncorner]]]
+            for name, values in face_metrics(corners).items():
+                self._metrics[name][mask] = values
+
+        # Element indices of each part
+        self._parts = {}
+        if parts is None:
+            return
+        for part in parts:
+            try:
+                group = part.face_group
+            except AttributeError:
+                continue
+            part_eids = group.elm_arrays()[0]
+            self._parts[part.name] = isin(self._eids, part_eids).nonzero()[0]
+
+    @property
+    def metric_names(self):
+        """
+        :return: The names of the metrics.
+        :rtype: list(str)
+        """
+        return list(_METRICS)
+
+    @property
+    def eids(self):
+        """
+        :return: The ID's of the elements in the report.
+        :rtype: numpy.ndarray
+        """
+        return self._eids
+
+    @property
+    def num_elms(self):
+        """
+        :return: The number of elements in the report.
+        :rtype: int
+        """
+        return self._eids.size
+
+    @property
+    def part_names(self):
+        """
+        :return: The names of the parts in the report.
+        :rtype: list(str)
+        """
+        return list(self._parts)
+
+    def values(self, name, part=None):
+        """
+        Get the values of a metric.
+
+        :param str name: The metric name.
+        :param str part: Option to only return values for the elements of a
+            part.
+
+        :return: The metric values in the same order as *eids*.
+        :rtype: numpy.ndarray
+
+        :raise KeyError: If the metric or part is not available.
+        """
+        values = self._metrics[name]
+        if part is None:
+            return values
+        return values[self._parts[part]]
+
+    def worst(self, name, n=10, part=None):
+        """
+        Get the worst elements for a metric.
+
+        :param str name: The metric name.
+        :param int n: The number of elements.
+        :param str part: Option to only consider the elements of a part.
+
+        :return: List of (element ID, value) pairs ordered from worst.
+        :rtype: list(tuple(int, float))
+
+        :raise KeyError: If the metric or part is not available.
+        """
+        values = self._metrics[name]
+        eids = self._eids
+        if part is not None:
+            indx = self._parts[part]
+            values, eids = values[indx], eids[indx]
+
+        # Undefined values of degenerate elements are worst
+        if _METRICS[name]:
+            order = argsort(-_nan_to(values, float('inf')), kind='stable')
+        else:
+            order = argsort(_nan_to(values, -float('inf')), kind='stable')
+        order = order[:n]
+        return list(zip(eids[order].tolist(), values[order].tolist()))
+
+    def violations(self, thresholds=None, part=None):
+        """
+        Count the elements that violate metric thresholds.
+
+        :param dict thresholds: Dictionary where the key is the metric name
+            and the value is the threshold. If not provided then default
+            values are used. Undefined values of degenerate elements are
+            counted as violations.
+        :param str part: Option to only consider the elements of a part.
+
+        :return: Dictionary where the key is the metric name and the value is
+            the number of violations.
+        :rtype: dict(str, int)
+
+        :raise KeyError: If a metric or the part is not available.
+        """
+        if thresholds is None:
+            thresholds = MeshQuality.default_thresholds()
+
+        counts = {}
+        for name, limit in thresholds.items():
+            values = self.values(name, part)
+            with errstate(invalid='ignore'):
+                if _METRICS[name]:
+                    bad = values > limit
+                else:
+                    bad = values < limit
+            counts[name] = int((bad | isnan(values)).sum())
+        return counts
+
+    def histogram(self, name, bins=10, part=None):
+        """
+        Compute a histogram of a metric.
+
+        :param str name: The metric name.
+        :param bins: The number of bins or the bin edges.
+        :type bins: int or collections.Sequence(float)
+        :param str part: Option to only consider the elements of a part.
+
+        :return: The counts and the bin edges.
+        :rtype: tuple(numpy.ndarray)
+
+        :raise KeyError: If the metric or part is not available.
+        """
+        values = self.values(name, part)
+        values = values[~isnan(values)]
+        return histogram(values, bins)
+
+    def part_histograms(self, name, bins=10):
+        """
+        Compute histograms of a metric for each part using common bin edges.
+
+        :param str name: The metric name.
+        :param int bins: The number of bins.
+
+        :return: Dictionary where the key is the part name and the value is
+            the counts, and the common bin edges.
+        :rtype: tuple(dict(str, numpy.ndarray), numpy.ndarray)
+
+        :raise KeyError: If the metric is not available.
+        """
+        _, edges = self.histogram(name, bins)
+        counts = {}
+        for part in self._parts:
+            counts[part] = self.histogram(name, edges, part)[0]
+        return counts, edges
+
+    def log_summary(self, thresholds=None):
+        """
+        Log the range of each metric and the number of threshold violations.
+
+        :param dict thresholds: Dictionary of thresholds. See
+            :meth:`violations`.
+
+        :return: None.
+        """
+        counts = self.violations(thresholds)
+        logger.info('Mesh quality for {} elements:'.format(self.num_elms))
+        for name in self.metric_names:
+            values = self._metrics[name]
+            if values.size == 0 or isnan(values).all():
+                continue
+            msg = '\t{}: min={:.4g}, max={:.4g}, violations={}'
+            logger.info(msg.format(name, nanmin(values), nanmax(values),
+                                   counts.get(name, 0)))
+
+    @staticmethod
+    def default_thresholds():
+        """
+        :return: Default thresholds for each metric.
+        :rtype: dict(str, float)
+        """
+        return {'aspect_ratio': 5.,
+                'warp_angle': 10.,
+                'skew_angle': 45.,
+                'taper_ratio': 0.5,
+                'jacobian': 0.6,
+                'min_angle': 20.,
+                'max_angle': 150.}
+
+
+def _norm(v):
+    """
+    Length of vectors along the last axis.
+    """
+    return sqrt((v * v).sum(axis=-1))
+
+
+def _angle(v1, v2):
+    """
+    Angle between vectors along the last axis in degrees.
+    """
+    cosa = (v1 * v2).sum(axis=-1) / (_norm(v1) * _norm(v2))
+    return degrees(arccos(clip(cosa, -1., 1.)))
+
+
+def _acute_angle(v1, v2):
+    """
+    Acute angle between lines along the last axis in degrees.
+    """
+    cosa = np_abs((v1 * v2).sum(axis=-1)) / (_norm(v1) * _norm(v2))
+    return degrees(arccos(clip(cosa, 0., 1.)))
+
+
+def _nan_to(values, fill):
+    """
+    Replace undefined values.
+    """
+    values = values.copy()
+    values[isnan(values)] = fill
+    return values
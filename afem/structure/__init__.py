@@ -19,9 +19,11 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 from afem.structure.check import *
 from afem.structure.create import *
+from afem.structure.doe import *
 from afem.structure.entities import *
 from afem.structure.explore import *
 from afem.structure.fix import *
+from afem.structure.graph import *
 from afem.structure.group import *
 from afem.structure.join import *
 from afem.structure.mesh import MeshVehicle
@@ -17,7 +17,10 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import os
+from concurrent.futures import ProcessPoolExecutor
 from math import radians, tan
+from tempfile import TemporaryDirectory
 from warnings import warn
 
 from afem.adaptor.entities import WireAdaptorCurve
@@ -29,7 +32,9 @@ from afem.geometry.create import (NurbsCurveByPoints,
                                   PlanesAlongCurveByDistance,
                                   PlaneByOrientation,
                                   PlanesAlongCurveAndSurfaceByDistance)
-from afem.geometry.entities import Curve, Surface
+from afem.exchange.brep import read_brep, write_brep
+from afem.geometry.entities import Curve, Surface, TrimmedCurve
+from afem.oml.entities import Body
 from afem.structure.entities import (Part, CurvePart, Beam1D, SurfacePart,
                                      WingPart, Spar, Rib, FuselagePart,
                                      Bulkhead, Floor, Frame, Skin,
@@ -186,6 +191,66 @@ class PartsBuilder(object):
         """
         return self._next_index
 
+    def _parts_between_shapes(self, name, plns, shape1, shape2, body,
+                              first_index, delimiter, group, type_, nprocs):
+        """
+        Create a part between the shapes for each plane. The geometry of the
+        parts is computed in worker processes if *nprocs* is greater than
+        one and the parts are then created in order.
+        """
+        if nprocs <= 1 or len(plns) < 2 or body.sref is None:
+            for pln in plns:
+                basis_shape = FaceBySurface(pln).face
+                label_indx = delimiter.join([name, str(first_index)])
+                part = SurfacePartBetweenShapes(label_indx, shape1, shape2,
+                                                body, basis_shape, group,
+                                                type_).part
+                first_index += 1
+                self._parts.append(part)
+            return first_index
+
+        faces = [FaceBySurface(pln).face for pln in plns]
+        shapes = [body.shape, FaceBySurface(body.sref).face,
+                  shape_of_entity(shape1), shape_of_entity(shape2)]
+        results = _map_faces(_build_between_shapes, shapes, faces, nprocs,
+                             type_)
+        for face, ((shape, edge), (is_trimmed, u1, u2)) in zip(faces,
+                                                                 results):
+            cref = edge.curve
+            if is_trimmed:
+                cref = TrimmedCurve.by_parameters(cref, u1, u2, True, False)
+            label_indx = delimiter.join([name, str(first_index)])
+            part = type_(label_indx, shape, cref, face.surface, group)
+            first_index += 1
+            self._parts.append(part)
+        return first_index
+
+    def _frames(self, name, plns, body, height, first_index, delimiter,
+                group, nprocs):
+        """
+        Create a frame for each plane. The geometry of the frames is
+        computed in worker processes if *nprocs* is greater than one and the
+        parts are then created in order.
+        """
+        if nprocs <= 1 or len(plns) < 2:
+            for pln in plns:
+                label_indx = delimiter.join([name, str(first_index)])
+                frame = FrameByPlane(label_indx, pln, body, height,
+                                     group).part
+                first_index += 1
+                self._parts.append(frame)
+            return first_index
+
+        faces = [FaceBySurface(pln).face for pln in plns]
+        results = _map_faces(_build_frames, [body.shape], faces, nprocs,
+                             height)
+        for pln, ((shape,), _) in zip(plns, results):
+            label_indx = delimiter.join([name, str(first_index)])
+            frame = Frame(label_indx, shape, None, pln, group)
+            first_index += 1
+            self._parts.append(frame)
+        return first_index
+
 
 # CURVE PART ------------------------------------------------------------------
 
@@ -552,11 +617,13 @@ class SurfacePartsBetweenPlanesByNumber(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, n, shape1, shape2, body, d1=None,
                  d2=None, first_index=1, delimiter=' ', group=None,
-                 type_=SurfacePart):
+                 type_=SurfacePart, nprocs=1):
         super(SurfacePartsBetweenPlanesByNumber, self).__init__()
 
         n = int(n)
@@ -565,14 +632,10 @@ class SurfacePartsBetweenPlanesByNumber(PartsBuilder):
         builder = PlanesBetweenPlanesByNumber(pln1, pln2, n, d1, d2)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._next_index = self._parts_between_shapes(name, builder.planes,
+                                                      shape1, shape2, body,
+                                                      first_index, delimiter,
+                                                      group, type_, nprocs)
 
 
 class SurfacePartsBetweenPlanesByDistance(PartsBuilder):
@@ -606,11 +669,13 @@ class SurfacePartsBetweenPlanesByDistance(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, maxd, shape1, shape2, body, d1=None,
                  d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
-                 type_=SurfacePart):
+                 type_=SurfacePart, nprocs=1):
         super(SurfacePartsBetweenPlanesByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -618,14 +683,10 @@ class SurfacePartsBetweenPlanesByDistance(PartsBuilder):
         builder = PlanesBetweenPlanesByDistance(pln1, pln2, maxd, d1, d2, nmin)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._next_index = self._parts_between_shapes(name, builder.planes,
+                                                      shape1, shape2, body,
+                                                      first_index, delimiter,
+                                                      group, type_, nprocs)
 
 
 class SurfacePartsAlongCurveByNumber(PartsBuilder):
@@ -663,11 +724,14 @@ class SurfacePartsAlongCurveByNumber(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, crv, n, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart):
+                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart,
+                 nprocs=1):
         super(SurfacePartsAlongCurveByNumber, self).__init__()
 
         n = int(n)
@@ -677,14 +741,10 @@ class SurfacePartsAlongCurveByNumber(PartsBuilder):
                                            tol)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._next_index = self._parts_between_shapes(name, builder.planes,
+                                                      shape1, shape2, body,
+                                                      first_index, delimiter,
+                                                      group, type_, nprocs)
 
 
 class SurfacePartsAlongCurveByDistance(PartsBuilder):
@@ -724,11 +784,14 @@ class SurfacePartsAlongCurveByDistance(PartsBuilder):
     :type group: str or afem.structure.group.Group or None
     :param Type[afem.structure.entities.Part] type_: The type of part to
         create.
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, crv, maxd, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, nmin=0, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart):
+                 delimiter=' ', tol=1.0e-7, group=None, type_=SurfacePart,
+                 nprocs=1):
         super(SurfacePartsAlongCurveByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -737,14 +800,10 @@ class SurfacePartsAlongCurveByDistance(PartsBuilder):
                                              d2, nmin, tol)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = SurfacePartBetweenShapes(label_indx, shape1, shape2, body,
-                                            basis_shape, group, type_).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._next_index = self._parts_between_shapes(name, builder.planes,
+                                                      shape1, shape2, body,
+                                                      first_index, delimiter,
+                                                      group, type_, nprocs)
 
 
 # SPAR ------------------------------------------------------------------------
@@ -918,15 +977,17 @@ class SparsBetweenPlanesByNumber(SurfacePartsBetweenPlanesByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, n, shape1, shape2, body, d1=None,
-                 d2=None, first_index=1, delimiter=' ', group=None):
+                 d2=None, first_index=1, delimiter=' ', group=None, nprocs=1):
         super(SparsBetweenPlanesByNumber, self).__init__(name, pln1, pln2, n,
                                                          shape1, shape2, body,
                                                          d1, d2, first_index,
                                                          delimiter, group,
-                                                         Spar)
+                                                         Spar, nprocs)
 
 
 class SparsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
@@ -958,17 +1019,20 @@ class SparsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, maxd, shape1, shape2, body, d1=None,
-                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None):
+                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
+                 nprocs=1):
         super(SparsBetweenPlanesByDistance, self).__init__(name, pln1, pln2,
                                                            maxd, shape1,
                                                            shape2, body, d1,
                                                            d2, nmin,
                                                            first_index,
                                                            delimiter,
-                                                           group, Spar)
+                                                           group, Spar, nprocs)
 
 
 class SparsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
@@ -1004,16 +1068,18 @@ class SparsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, crv, n, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None, nprocs=1):
         super(SparsAlongCurveByNumber, self).__init__(name, crv, n, shape1,
                                                       shape2, body, ref_pln,
                                                       u1, u2, d1, d2,
                                                       first_index, delimiter,
-                                                      tol, group, Spar)
+                                                      tol, group, Spar, nprocs)
 
 
 class SparsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
@@ -1051,17 +1117,19 @@ class SparsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, crv, maxd, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, nmin=0, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None, nprocs=1):
         super(SparsAlongCurveByDistance, self).__init__(name, crv, maxd,
                                                         shape1, shape2, body,
                                                         ref_pln, u1, u2, d1,
                                                         d2, nmin, first_index,
                                                         delimiter, tol, group,
-                                                        Spar)
+                                                        Spar, nprocs)
 
 
 # RIB -------------------------------------------------------------------------
@@ -1259,14 +1327,17 @@ class RibsBetweenPlanesByNumber(SurfacePartsBetweenPlanesByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, n, shape1, shape2, body, d1=None,
-                 d2=None, first_index=1, delimiter=' ', group=None):
+                 d2=None, first_index=1, delimiter=' ', group=None, nprocs=1):
         super(RibsBetweenPlanesByNumber, self).__init__(name, pln1, pln2, n,
                                                         shape1, shape2, body,
                                                         d1, d2, first_index,
-                                                        delimiter, group, Rib)
+                                                        delimiter, group, Rib,
+                                                        nprocs)
 
 
 class RibsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
@@ -1298,17 +1369,20 @@ class RibsBetweenPlanesByDistance(SurfacePartsBetweenPlanesByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, maxd, shape1, shape2, body, d1=None,
-                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None):
+                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
+                 nprocs=1):
         super(RibsBetweenPlanesByDistance, self).__init__(name, pln1, pln2,
                                                           maxd, shape1,
                                                           shape2, body, d1,
                                                           d2, nmin,
                                                           first_index,
                                                           delimiter,
-                                                          group, Rib)
+                                                          group, Rib, nprocs)
 
 
 class RibsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
@@ -1344,16 +1418,18 @@ class RibsAlongCurveByNumber(SurfacePartsAlongCurveByNumber):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, crv, n, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None, nprocs=1):
         super(RibsAlongCurveByNumber, self).__init__(name, crv, n, shape1,
                                                      shape2, body, ref_pln,
                                                      u1, u2, d1, d2,
                                                      first_index, delimiter,
-                                                     tol, group, Rib)
+                                                     tol, group, Rib, nprocs)
 
 
 class RibsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
@@ -1391,17 +1467,19 @@ class RibsAlongCurveByDistance(SurfacePartsAlongCurveByDistance):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, crv, maxd, shape1, shape2, body, ref_pln=None,
                  u1=None, u2=None, d1=None, d2=None, nmin=0, first_index=1,
-                 delimiter=' ', tol=1.0e-7, group=None):
+                 delimiter=' ', tol=1.0e-7, group=None, nprocs=1):
         super(RibsAlongCurveByDistance, self).__init__(name, crv, maxd,
                                                        shape1, shape2, body,
                                                        ref_pln, u1, u2, d1,
                                                        d2, nmin, first_index,
                                                        delimiter, tol, group,
-                                                       Rib)
+                                                       Rib, nprocs)
 
 
 class RibsAlongCurveAndSurfaceByDistance(PartsBuilder):
@@ -1440,11 +1518,14 @@ class RibsAlongCurveAndSurfaceByDistance(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, crv, srf, maxd, shape1, shape2, body,
                  u1=None, u2=None, d1=None, d2=None, rot_x=None, rot_y=None,
-                 nmin=0, first_index=1, delimiter=' ', tol=1.0e-7, group=None):
+                 nmin=0, first_index=1, delimiter=' ', tol=1.0e-7, group=None,
+                 nprocs=1):
         super(RibsAlongCurveAndSurfaceByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -1457,14 +1538,10 @@ class RibsAlongCurveAndSurfaceByDistance(PartsBuilder):
             builder.rotate_y(rot_y)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            basis_shape = FaceBySurface(pln).face
-            label_indx = delimiter.join([name, str(first_index)])
-            part = RibBetweenShapes(label_indx, shape1, shape2, body,
-                                    basis_shape, group).part
-            first_index += 1
-            self._parts.append(part)
-        self._next_index = first_index
+        self._next_index = self._parts_between_shapes(name, builder.planes,
+                                                      shape1, shape2, body,
+                                                      first_index, delimiter,
+                                                      group, Rib, nprocs)
 
 
 # BULKHEAD --------------------------------------------------------------------
@@ -1612,20 +1689,18 @@ class FramesByPlanes(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, plns, body, height, first_index=1,
-                 delimiter=' ', group=None):
+                 delimiter=' ', group=None, nprocs=1):
         super(FramesByPlanes, self).__init__()
 
         first_index = int(first_index)
 
-        for pln in plns:
-            label_indx = delimiter.join([name, str(first_index)])
-            frame = FrameByPlane(label_indx, pln, body, height, group).part
-            first_index += 1
-            self._parts.append(frame)
-        self._next_index = first_index
+        self._next_index = self._frames(name, list(plns), body, height,
+                                        first_index, delimiter, group, nprocs)
 
 
 class FramesBetweenPlanesByNumber(PartsBuilder):
@@ -1650,10 +1725,12 @@ class FramesBetweenPlanesByNumber(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, n, body, height, d1=None,
-                 d2=None, first_index=1, delimiter=' ', group=None):
+                 d2=None, first_index=1, delimiter=' ', group=None, nprocs=1):
         super(FramesBetweenPlanesByNumber, self).__init__()
 
         n = int(n)
@@ -1662,12 +1739,8 @@ class FramesBetweenPlanesByNumber(PartsBuilder):
         builder = PlanesBetweenPlanesByNumber(pln1, pln2, n, d1, d2)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            label_indx = delimiter.join([name, str(first_index)])
-            frame = FrameByPlane(label_indx, pln, body, height, group).part
-            first_index += 1
-            self._parts.append(frame)
-        self._next_index = first_index
+        self._next_index = self._frames(name, builder.planes, body, height,
+                                        first_index, delimiter, group, nprocs)
 
 
 class FramesBetweenPlanesByDistance(PartsBuilder):
@@ -1694,10 +1767,13 @@ class FramesBetweenPlanesByDistance(PartsBuilder):
     :param group: The group to add the part to. If not provided the part will
         be added to the active group.
     :type group: str or afem.structure.group.Group or None
+    :param int nprocs: The number of worker processes used to compute the
+        part geometry.
     """
 
     def __init__(self, name, pln1, pln2, maxd, body, height, d1=None,
-                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None):
+                 d2=None, nmin=0, first_index=1, delimiter=' ', group=None,
+                 nprocs=1):
         super(FramesBetweenPlanesByDistance, self).__init__()
 
         first_index = int(first_index)
@@ -1705,12 +1781,8 @@ class FramesBetweenPlanesByDistance(PartsBuilder):
         builder = PlanesBetweenPlanesByDistance(pln1, pln2, maxd, d1, d2, nmin)
 
         self._ds = builder.spacing
-        for pln in builder.planes:
-            label_indx = delimiter.join([name, str(first_index)])
-            frame = FrameByPlane(label_indx, pln, body, height, group).part
-            first_index += 1
-            self._parts.append(frame)
-        self._next_index = first_index
+        self._next_index = self._frames(name, builder.planes, body, height,
+                                        first_index, delimiter, group, nprocs)
 
 
 # SKIN ------------------------------------------------------------------------
@@ -1903,3 +1975,92 @@ class Beam2DBySweep(PartBuilder):
 
         super(Beam2DBySweep, self).__init__(name, tool.shape, cref, None,
                                             group, Beam2D)
+
+
+def _map_faces(func, shapes, faces, nprocs, *args):
+    """
+    Call a function on chunks of the faces in worker processes. The shapes
+    and the faces are written to a BREP file shared by the workers.
+
+    :return: The result shapes and data of each face in order.
+    :rtype: list(tuple(tuple(afem.topology.entities.Shape), tuple))
+    """
+    n = len(faces)
+    nprocs = min(nprocs, n)
+    bounds = [n * i // nprocs for i in range(nprocs + 1)]
+
+    results = []
+    with TemporaryDirectory() as tmp:
+        fin = os.path.join(tmp, 'input.brep')
+        write_brep(CompoundByShapes(shapes + faces).compound, fin)
+        with ProcessPoolExecutor(nprocs) as pool:
+            futures = []
+            for i in range(nprocs):
+                fout = os.path.join(tmp, 'output{}.brep'.format(i))
+                indices = list(range(bounds[i], bounds[i + 1]))
+                futures.append((fout, pool.submit(func, fin, fout,
+                                                  len(shapes), indices,
+                                                  *args)))
+            for fout, future in futures:
+                data = future.result()
+                if not data:
+                    continue
+                new_shapes = list(read_brep(fout).shape_iter)
+                nshapes = len(new_shapes) // len(data)
+                for j, values in enumerate(data):
+                    k = j * nshapes
+                    results.append((tuple(new_shapes[k:k + nshapes]),
+                                    values))
+    return results
+
+
+def _build_between_shapes(fin, fout, nshapes, indices, type_):
+    """
+    Compute the shape and reference curve of a part between shapes for each
+    face in a worker process. The input shapes are the body solid and
+    reference surface face, the two shapes, and then the faces.
+
+    :return: If the reference curve is trimmed and its parameters for each
+        face. The part shape and reference curve edge are written to the
+        output file.
+    :rtype: list(tuple(bool, float, float))
+    """
+    shapes = list(read_brep(fin).shape_iter)
+    solid, sref_face, shape1, shape2 = shapes[:nshapes]
+    faces = shapes[nshapes:]
+    body = Body(solid)
+    body.set_sref(sref_face.surface)
+
+    new_shapes, data = [], []
+    for i in indices:
+        part = SurfacePartBetweenShapes('part', shape1, shape2, body,
+                                        faces[i], None, type_).part
+        new_shapes += [part.shape, EdgeByCurve(part.cref).edge]
+        is_trimmed = isinstance(part.cref, TrimmedCurve)
+        data.append((is_trimmed, part.cref.u1, part.cref.u2))
+
+    write_brep(CompoundByShapes(new_shapes).compound, fout)
+    return data
+
+
+def _build_frames(fin, fout, nshapes, indices, height):
+    """
+    Compute the shape of a frame for each face in a worker process. The
+    input shapes are the body solid and then the faces.
+
+    :return: Empty data for each face. The frame shapes are written to the
+        output file.
+    :rtype: list(tuple)
+    """
+    shapes = list(read_brep(fin).shape_iter)
+    body = Body(shapes[0])
+    faces = shapes[nshapes:]
+
+    new_shapes, data = [], []
+    for i in indices:
+        part = FrameByPlane('frame', faces[i].surface, body, height).part
+        new_shapes.append(part.shape)
+        data.append(())
+
+    write_brep(CompoundByShapes(new_shapes).compound, fout)
+    return data
@@ -0,0 +1,317 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import csv
+import json
+import os
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import product
+from time import perf_counter
+
+from afem.config import logger
+from afem.structure.entities import SurfacePart
+from afem.structure.group import GroupAPI
+
+__all__ = ["DesignStudy", "model_summary"]
+
+_RESULTS = 'results.jsonl'
+
+
+class DesignStudy(object):
+    """
+    Run a model-building function over a table of parameters in worker
+    processes. Each variant is built in a new process after the structure
+    data is reset with :meth:`.GroupAPI.reset`, so no state is shared
+    between variants and a crashed process only fails its own variant.
+    Results are appended to a progress file as each variant finishes so an
+    interrupted study can be resumed.
+
+    :param func: The function that builds and exports a variant. It is
+        called with a dictionary of the parameters of one row and should
+        return a dictionary of outputs like mesh statistics, file names,
+        and part areas. It must be defined at module level so it can be sent
+        to the worker processes.
+    :param table: The parameters of each variant.
+    :type table: collections.Sequence(dict)
+    :param str path: Optional directory for the progress file. Variants
+        already done with the same parameters are not run again. It is
+        created if needed.
+    :param int nprocs: The number of variants built at the same time.
+    """
+
+    def __init__(self, func, table, path=None, nprocs=1):
+        self._func = func
+        self._table = [dict(row) for row in table]
+        self._path = path
+        self._nprocs = max(1, nprocs)
+        self._results = {}
+
+        if path is not None:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self._load()
+
+    @property
+    def path(self):
+        """
+        :return: The directory of the progress file, if any.
+        :rtype: str or None
+        """
+        return self._path
+
+    @property
+    def table(self):
+        """
+        :return: The parameters of each variant.
+        :rtype: list(dict)
+        """
+        return [dict(row) for row in self._table]
+
+    @property
+    def num_runs(self):
+        """
+        :return: The number of variants.
+        :rtype: int
+        """
+        return len(self._table)
+
+    @property
+    def num_done(self):
+        """
+        :return: The number of variants built successfully.
+        :rtype: int
+        """
+        return sum(1 for result in self._results.values()
+                   if result['status'] == 'ok')
+
+    @property
+    def num_failed(self):
+        """
+        :return: The number of variants that failed.
+        :rtype: int
+        """
+        return sum(1 for result in self._results.values()
+                   if result['status'] != 'ok')
+
+    @property
+    def results(self):
+        """
+        :return: The result of each variant run so far, ordered by run
+            index. Each result has the run index, parameters, outputs,
+            status, wall time in seconds, and error message if it failed.
+        :rtype: list(dict)
+        """
+        return [self._results[i] for i in sorted(self._results)]
+
+    @staticmethod
+    def full_factorial(**levels):
+        """
+        Build a parameter table with every combination of the given levels.
+
+        :param levels: The values of each parameter.
+
+        :return: The parameter table.
+        :rtype: list(dict)
+        """
+        names = list(levels)
+        return [dict(zip(names, values))
+                for values in product(*[levels[name] for name in names])]
+
+    def run(self):
+        """
+        Run the variants that are not done yet. Failed variants are run
+        again.
+
+        :return: *True* if all variants are done, *False* if not.
+        :rtype: bool
+        """
+        todo = []
+        for i in range(self.num_runs):
+            result = self._results.get(i)
+            if result is not None and result['status'] == 'ok':
+                continue
+            todo.append(i)
+
+        if not todo:
+            return True
+
+        logger.info('Running {} of {} variants.'.format(len(todo),
+                                                        self.num_runs))
+        running = {}
+        while todo or running:
+            # Use a single worker pool for each variant so every variant gets
+            # a new process
+            while todo and len(running) < self._nprocs:
+                i = todo.pop(0)
+                pool = ProcessPoolExecutor(1)
+                future = pool.submit(_run_variant, self._func, i,
+                                     self._table[i])
+                running[future] = (i, pool, perf_counter())
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, pool, start = running.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    result = {'run': i, 'params': _to_json(self._table[i]),
+                              'outputs': {}, 'status': 'failed',
+                              'time': perf_counter() - start,
+                              'error': 'Worker process terminated abruptly.'}
+                pool.shutdown()
+
+                self._results[result['run']] = result
+                self._save(result)
+                msg = 'Variant {} finished with status {} in {:.3f} s.'
+                logger.info(msg.format(result['run'], result['status'],
+                                       result['time']))
+
+        return self.num_done == self.num_runs
+
+    def export_csv(self, fn):
+        """
+        Write the results table to a CSV file. Nested outputs are flattened
+        to columns named with their keys joined by a period.
+
+        :param str fn: The filename.
+
+        :return: None.
+        """
+        rows, fields = [], []
+        for result in self.results:
+            row = {'run': result['run'], 'status': result['status'],
+                   'time': result['time'], 'error': result['error']}
+            row.update(_flatten(result['params']))
+            row.update(_flatten(result['outputs']))
+            for key in row:
+                if key not in fields:
+                    fields.append(key)
+            rows.append(row)
+
+        with open(fn, 'w', newline='') as fout:
+            writer = csv.DictWriter(fout, fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def _load(self):
+        """
+        Read the results of a previous run from the progress file. The last
+        result of each variant is kept. Results with a run index outside the
+        table or with parameters that differ from the table are dropped.
+        """
+        fn = os.path.join(self._path, _RESULTS)
+        if not os.path.isfile(fn):
+            return
+        with open(fn) as fin:
+            for line in fin:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # Partial line from an interrupted write
+                    continue
+                run = result.get('run')
+                if (not isinstance(run, int) or
+                        not 0 <= run < self.num_runs or
+                        result.get('params') != _to_json(self._table[run])):
+                    continue
+                self._results[run] = result
+
+    def _save(self, result):
+        """
+        Append a result to the progress file.
+        """
+        if self._path is None:
+            return
+        fn = os.path.join(self._path, _RESULTS)
+        with open(fn, 'a') as fout:
+            fout.write(json.dumps(result, default=str) + '\n')
+            fout.flush()
+            os.fsync(fout.fileno())
+
+
+def model_summary(the_mesh=None):
+    """
+    Gather common outputs of a structural model: the number of parts, the
+    area of each surface part and their total, and the mesh size if a mesh
+    is given.
+
+    :param afem.structure.mesh.MeshVehicle the_mesh: The mesh, if any.
+
+    :return: The outputs.
+    :rtype: dict
+    """
+    parts = GroupAPI.get_master().get_parts(order=True)
+    areas = {part.name: part.area for part in parts
+             if isinstance(part, SurfacePart)}
+    outputs = {'num_parts': len(parts), 'area': sum(areas.values()),
+               'part_areas': areas}
+    if the_mesh is not None:
+        outputs['num_nodes'] = the_mesh.mesh.num_nodes
+        outputs['num_edges'] = the_mesh.mesh.num_edges
+        outputs['num_faces'] = the_mesh.mesh.num_faces
+    return outputs
+
+
+def _run_variant(func, run, params):
+    """
+    Build a variant in a worker process.
+
+    :return: The result.
+    :rtype: dict
+    """
+    GroupAPI.reset()
+    start = perf_counter()
+    try:
+        outputs = func(dict(params)) or {}
+        status, error = 'ok', None
+    except Exception as e:
+        outputs = {}
+        status = 'failed'
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+
+    return {'run': run, 'params': _to_json(params),
+            'outputs': _to_json(outputs),
+            'status': status, 'time': perf_counter() - start,
+            'error': error}
+
+
+def _to_json(values):
+    """
+    Convert values to what is read back from the progress file.
+    """
+    return json.loads(json.dumps(values, default=str))
+
+
+def _flatten(values, prefix=''):
+    """
+    Flatten nested dictionaries into a single level.
+    """
+    flat = {}
+    for key, value in values.items():
+        name = prefix + str(key)
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + '.'))
+        else:
+            flat[name] = value
+    return flat
@@ -17,23 +17,27 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
-from numpy import mean
+from weakref import WeakSet
+
+from OCCT.gp import gp_Ax2
+from numpy import array, full, inf, linalg, mean, zeros
 
 from afem.config import logger
 from afem.core.entities import ShapeHolder
 from afem.geometry.check import CheckGeom
 from afem.geometry.create import (PlaneByNormal, PointsAlongCurveByNumber)
-from afem.geometry.entities import Axis1
+from afem.geometry.entities import Axis1, Point
 from afem.structure.group import GroupAPI
 from afem.structure.utils import shape_of_entity
 from afem.topology.bop import (CutCylindricalHole, CutShapes, FuseShapes,
                                IntersectShapes, LocalSplit, SplitShapes)
 from afem.topology.check import CheckShape, ClassifyPointInSolid
-from afem.topology.create import (CompoundByShapes, HalfspaceBySurface,
-                                  PointAlongShape, WiresByShape, FaceByPlane,
-                                  SolidByDrag)
+from afem.topology.create import (CompoundByShapes, CylinderByAxis,
+                                  HalfspaceBySurface, PointAlongShape,
+                                  WiresByShape, FaceByPlane, SolidByDrag)
 from afem.topology.distance import DistanceShapeToShape
-from afem.topology.entities import Shape, Edge, Wire, Face, Shell, Compound
+from afem.topology.entities import (BBox, Shape, Edge, Wire, Face, Shell,
+                                    Compound)
 from afem.topology.fix import FixShape
 from afem.topology.modify import (RebuildShapeByTool,
                                   RebuildShapeWithShapes, RebuildShapesByTool,
@@ -68,6 +72,10 @@ class Part(ShapeHolder):
             types = (Edge, Wire, Compound)
         elif isinstance(self, SurfacePart):
             types = (Face, Shell, Compound)
+
+        # Groups containing this part
+        self._groups = WeakSet()
+
         super(Part, self).__init__(name, shape, cref, sref, types)
 
         # Unique ID
@@ -94,6 +102,41 @@ class Part(ShapeHolder):
         """
         return self._id
 
+    @property
+    def groups(self):
+        """
+        :return: The groups containing the part.
+        :rtype: list(afem.structure.group.Group)
+        """
+        return list(self._groups)
+
+    def set_shape(self, shape):
+        """
+        Set the shape. The cached shapes of the groups containing this part
+        are cleared.
+
+        :param afem.topology.entities.Shape shape: The shape.
+
+        :return: None.
+        """
+        super(Part, self).set_shape(shape)
+        for group in self._groups:
+            group._invalidate()
+
+    def set_name(self, name):
+        """
+        Set name. The name indexes of the groups containing this part are
+        updated.
+
+        :param str name: The name.
+
+        :return: None.
+        """
+        old_name = self.name
+        super(Part, self).set_name(name)
+        for group in self._groups:
+            group._rename(self, old_name)
+
     @property
     def node_group(self):
         """
@@ -327,7 +370,9 @@ class Part(ShapeHolder):
         Discard shapes of the part using a shape and a distance. If the
         distance between a shape of the part and the given shape is greater
         than *dmax*, then the shape is removed. Edges are checked
-        for curve parts and faces are checked for surface parts.
+        for curve parts and faces are checked for surface parts. The exact
+        distance is only computed if bounding box and vertex distance bounds
+        cannot decide.
 
         :param entity: The shape.
         :type entity: afem.topology.entities.Shape or
@@ -351,10 +396,15 @@ class Part(ShapeHolder):
 
         rebuild = RebuildShapeWithShapes(self._shape)
 
+        # Use the distance bounds and only compute the exact distance if the
+        # bounds cannot decide
+        lower, upper = _distance_bounds(entity, shapes)
         modified = False
-        for part_shape in shapes:
-            dmin = DistanceShapeToShape(entity, part_shape).dmin
-            if dmin > dmax:
+        for part_shape, lo, up in zip(shapes, lower, upper):
+            if up <= dmax:
+                continue
+            if lo > dmax or DistanceShapeToShape(entity,
+                                                 part_shape).dmin > dmax:
                 rebuild.remove(part_shape)
                 modified = True
 
@@ -370,7 +420,9 @@ class Part(ShapeHolder):
         Discard shapes of the part using a shape and a distance. If the
         distance between a shape of the part and the given shape is less
         than *dmin*, then the shape is removed. Edges are checked
-        for curve parts and faces are checked for surface parts.
+        for curve parts and faces are checked for surface parts. The exact
+        distance is only computed if bounding box and vertex distance bounds
+        cannot decide.
 
         :param entity: The shape.
         :type entity: afem.topology.entities.Shape or
@@ -394,10 +446,15 @@ class Part(ShapeHolder):
 
         rebuild = RebuildShapeWithShapes(self._shape)
 
+        # Use the distance bounds and only compute the exact distance if the
+        # bounds cannot decide
+        lower, upper = _distance_bounds(entity, shapes)
         modified = False
-        for part_shape in shapes:
-            dmin_ = DistanceShapeToShape(entity, part_shape).dmin
-            if dmin > dmin_:
+        for part_shape, lo, up in zip(shapes, lower, upper):
+            if lo >= dmin:
+                continue
+            if up < dmin or dmin > DistanceShapeToShape(entity,
+                                                        part_shape).dmin:
                 rebuild.remove(part_shape)
                 modified = True
 
@@ -708,21 +765,9 @@ class SurfacePart(Part):
             *True* if the operation was performed, *False* if not.
         :rtype: bool
         """
-        # Intersect the shape with a plane to use for the hole height location
-        pln = self.plane_from_parameter(ds, u0, is_rel)
-        bop = IntersectShapes(self._shape, pln)
-        wires = WiresByShape(bop.shape).wires
-        los = LengthOfShapes(wires)
-        max_length = los.max_length
-        wire = los.longest_shape
-        if not isinstance(wire, Wire):
+        ax1 = self._hole_axis(ds, u0, is_rel)
+        if ax1 is None:
             return False
-        mid_length = max_length / 2.
-        p = PointAlongShape(wire, mid_length).point
-        u, v = self.sref.invert(p)
-        v = self.sref.norm(u, v)
-        v = CheckGeom.to_direction(v)
-        ax1 = Axis1(p, v)
 
         # Cut the hole
         r = d / 2.
@@ -731,19 +776,100 @@ class SurfacePart(Part):
 
         return bop.is_done
 
-    def cut_holes(self, n, d):
+    def cut_holes(self, n, d, batch=False):
         """
         Cut holes along the reference curve at evenly spaced intervals
         (experimental).
 
         :param int n: The number of holes.
         :param float d: The diameter.
+        :param bool batch: Option to find all the hole locations first and
+            then cut them from the part in a single Boolean operation using
+            cylinders that extend through the part. If *False*, each hole is
+            cut one at a time using :meth:`.cut_hole`.
 
         :return: None.
         """
         pac = PointsAlongCurveByNumber(self.cref, n + 2)
+        if not batch:
+            for u in pac.parameters[1:-1]:
+                self.cut_hole(d, 0., u)
+            return None
+
+        # Cylinders long enough to pass through the whole part from any hole
+        # location, starting one diagonal before it
+        r = d / 2.
+        h = self.bbox().diagonal
+        cylinders = []
         for u in pac.parameters[1:-1]:
-            self.cut_hole(d, 0., u)
+            ax1 = self._hole_axis(0., u, False)
+            if ax1 is None:
+                continue
+            v = ax1.Direction()
+            p = ax1.origin.xyz - h * array([v.X(), v.Y(), v.Z()])
+            cylinder = CylinderByAxis(r, 2. * h, gp_Ax2(Point(*p), v)).solid
+            cylinders.append(cylinder)
+        if not cylinders:
+            return None
+
+        tool = CompoundByShapes(cylinders).compound
+        bop = CutShapes(self._shape, tool)
+        if bop.is_done:
+            self.set_shape(bop.shape)
+
+    def _hole_axis(self, ds, u0, is_rel):
+        """
+        Hole axis at the middle of the longest section of the part with a
+        plane along the reference curve. *None* if not found.
+        """
+        # Intersect the shape with a plane to use for the hole height location
+        pln = self.plane_from_parameter(ds, u0, is_rel)
+        bop = IntersectShapes(self._shape, pln)
+        wires = WiresByShape(bop.shape).wires
+        los = LengthOfShapes(wires)
+        max_length = los.max_length
+        wire = los.longest_shape
+        if not isinstance(wire, Wire):
+            return None
+        mid_length = max_length / 2.
+        p = PointAlongShape(wire, mid_length).point
+        u, v = self.sref.invert(p)
+        v = self.sref.norm(u, v)
+        v = CheckGeom.to_direction(v)
+        return Axis1(p, v)
+
+
+def _distance_bounds(entity, shapes):
+    """
+    Lower and upper bounds of the distance between the entity and each
+    shape. The lower bound is the distance between the bounding boxes and the
+    upper bound is the smallest distance between the vertices. If a bound
+    cannot be found it is zero or infinite.
+    """
+    n = len(shapes)
+    lower, upper = zeros(n), full(n, inf)
+
+    bbox = BBox()
+    bbox.add_shape(entity)
+    if not bbox.is_void:
+        for i, shape in enumerate(shapes):
+            other = BBox()
+            other.add_shape(shape)
+            if not other.is_void:
+                lower[i] = bbox.distance(other)
+
+    pnts = [v.point.xyz for v in entity.vertices]
+    if not pnts:
+        return lower, upper
+    pnts = array(pnts)
+    for i, shape in enumerate(shapes):
+        verts = [v.point.xyz for v in shape.vertices]
+        if verts:
+            dist = linalg.norm(array(verts)[:, None, :] - pnts[None, :, :],
+                               axis=2)
+            upper[i] = dist.min()
+
+    return lower, upper
 
 
 class WingPart(SurfacePart):
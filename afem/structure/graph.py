@@ -0,0 +1,721 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import hashlib
+import os
+from collections import OrderedDict
+from tempfile import TemporaryDirectory
+
+from afem.config import logger
+from afem.exchange.brep import read_brep, write_brep
+from afem.structure.create import PartBuilder, PartsBuilder
+from afem.structure.entities import Part
+from afem.structure.group import Group
+from afem.topology.create import CompoundByShapes
+
+__all__ = ["BuildGraph", "BuildParam", "BuildNode", "BuildRef"]
+
+# Version of the key recipe so old entries are not reused if it changes
+_KEY_VERSION = b'1'
+_EXT = '.brep'
+
+
+class BuildGraph(object):
+    """
+    Build graph that records the structure builders and join operations of a
+    model so it can be rebuilt after a parameter changes. Each operation is
+    a node that calls a function with arguments that may refer to parameters
+    or to the results of earlier nodes. The nodes are executed in the order
+    they are added.
+
+    When rebuilt, a node is executed again only if a parameter it uses has
+    changed, a node it refers to was executed again, or the parts passed to
+    it are not the same as when it last ran. The other nodes are not
+    executed and their recorded part shapes are restored instead. Parts
+    created by a node that is executed again are removed from their groups
+    before the new parts are created.
+
+    :param str path: Optional directory to store the part shapes produced by
+        the operations that do not create new parts, like the joins. These
+        are reused across sessions when the inputs are the same. Nodes that
+        other nodes refer to are always executed since their result is not
+        stored. The directory is created if needed.
+
+    .. note::
+
+        Builders should be given their group explicitly since the active
+        group may be different when a node is executed again.
+    """
+
+    def __init__(self, path=None):
+        if path is not None and not os.path.isdir(path):
+            os.makedirs(path)
+        self._path = path
+        self._params = OrderedDict()
+        self._nodes = OrderedDict()
+        self._executed = []
+        self._restored = []
+
+    @property
+    def path(self):
+        """
+        :return: The directory used to store part shapes, if any.
+        :rtype: str or None
+        """
+        return self._path
+
+    @property
+    def num_nodes(self):
+        """
+        :return: The number of nodes.
+        :rtype: int
+        """
+        return len(self._nodes)
+
+    @property
+    def nodes(self):
+        """
+        :return: The nodes in the order they are executed.
+        :rtype: list(afem.structure.graph.BuildNode)
+        """
+        return list(self._nodes.values())
+
+    @property
+    def params(self):
+        """
+        :return: The parameter names and values.
+        :rtype: dict
+        """
+        return OrderedDict((name, param.value)
+                           for name, param in self._params.items())
+
+    @property
+    def executed(self):
+        """
+        :return: The names of the nodes executed in the last build.
+        :rtype: list(str)
+        """
+        return list(self._executed)
+
+    @property
+    def restored(self):
+        """
+        :return: The names of the nodes whose part shapes were read from
+            disk in the last build.
+        :rtype: list(str)
+        """
+        return list(self._restored)
+
+    def add_param(self, name, value):
+        """
+        Add a parameter.
+
+        :param str name: The name.
+        :param value: The value.
+
+        :return: The parameter.
+        :rtype: afem.structure.graph.BuildParam
+
+        :raise ValueError: If a parameter with the name already exists.
+        """
+        if name in self._params:
+            raise ValueError('Parameter {} already exists.'.format(name))
+        param = BuildParam(name, value)
+        self._params[name] = param
+        return param
+
+    def get_param(self, name):
+        """
+        Get a parameter.
+
+        :param str name: The name.
+
+        :return: The parameter.
+        :rtype: afem.structure.graph.BuildParam
+
+        :raise KeyError: If the parameter is not found.
+        """
+        return self._params[name]
+
+    def set_param(self, name, value):
+        """
+        Set the value of a parameter. The nodes that use it are executed
+        again at the next build.
+
+        :param str name: The name.
+        :param value: The value.
+
+        :return: None.
+
+        :raise KeyError: If the parameter is not found.
+        """
+        self._params[name].set_value(value)
+
+    def add_node(self, name, func, *args, **kwargs):
+        """
+        Add an operation. The arguments may contain parameters, nodes, and
+        references to their results, also inside lists, tuples, and
+        dictionaries. They are replaced by their values when the node is
+        executed.
+
+        :param str name: The name.
+        :param func: The function or builder class to call.
+        :param args: The positional arguments.
+        :param kwargs: The keyword arguments.
+
+        :return: The node.
+        :rtype: afem.structure.graph.BuildNode
+
+        :raise ValueError: If a node with the name already exists or if the
+            arguments refer to a parameter or node not in this graph.
+        """
+        if name in self._nodes:
+            raise ValueError('Node {} already exists.'.format(name))
+
+        params, nodes = set(), set()
+        _references((args, kwargs), params, nodes)
+        for param in params:
+            if self._params.get(param.name) is not param:
+                msg = 'Parameter {} is not in the graph.'.format(param.name)
+                raise ValueError(msg)
+        for node in nodes:
+            if self._nodes.get(node.name) is not node:
+                msg = 'Node {} is not in the graph.'.format(node.name)
+                raise ValueError(msg)
+
+        # A node restored from disk has no result to refer to
+        for node in nodes:
+            node._is_referenced = True
+            if node._is_restored:
+                node.invalidate()
+
+        node = BuildNode(name, func, args, kwargs, params, nodes)
+        self._nodes[name] = node
+        return node
+
+    def get_node(self, name):
+        """
+        Get a node.
+
+        :param str name: The name.
+
+        :return: The node.
+        :rtype: afem.structure.graph.BuildNode
+
+        :raise KeyError: If the node is not found.
+        """
+        return self._nodes[name]
+
+    def get_result(self, name):
+        """
+        Get the result of a node.
+
+        :param str name: The name.
+
+        :return: The value returned by the node function the last time it
+            was executed.
+        """
+        return self._nodes[name].result
+
+    def invalidate(self, name):
+        """
+        Force a node to be executed again at the next build. The nodes that
+        depend on it are also executed again.
+
+        :param str name: The name.
+
+        :return: None.
+
+        :raise KeyError: If the node is not found.
+        """
+        self._nodes[name].invalidate()
+
+    def build(self):
+        """
+        Execute the nodes that are out of date and restore the part shapes
+        of the others.
+
+        :return: The number of nodes executed or restored from disk.
+        :rtype: int
+        """
+        self._executed = []
+        self._restored = []
+        for node in self._nodes.values():
+            args, kwargs = _resolve((node.args, node.kwargs))
+            inputs = _parts_in((args, kwargs), node.is_builder)
+
+            if not node._is_dirty(inputs, self._executed + self._restored):
+                for part, shape in node._after:
+                    part.set_shape(shape)
+                continue
+
+            # Parts created last time are replaced by the new ones
+            for part in node._created:
+                for group in part.groups:
+                    group.discard_part(part)
+
+            before = [(part, part.shape) for part in inputs]
+            # The result is not known if the part shapes are read from disk,
+            # so nodes that other nodes refer to are always executed
+            key = None
+            if not node._is_referenced:
+                key = self._key(node, args, kwargs)
+            if key is not None and self._restore(key, inputs):
+                result = None
+                self._restored.append(node.name)
+            else:
+                result = node.func(*args, **kwargs)
+                self._executed.append(node.name)
+
+            input_ids = {id(part) for part in inputs}
+            created = [part for part in _parts_in(result)
+                       if id(part) not in input_ids]
+            is_new = node.name in self._executed
+            if key is not None and is_new and not created:
+                self._store(key, inputs)
+
+            node._record(result, before, inputs + created, created,
+                         not is_new)
+            logger.info('Executed build node {}.'.format(node.name))
+
+        return len(self._executed) + len(self._restored)
+
+    def _key(self, node, args, kwargs):
+        """
+        Key of a node for storing its part shapes on disk, or *None* if the
+        arguments cannot be hashed.
+        """
+        if self._path is None:
+            return None
+
+        shapes = []
+        try:
+            token = _token((args, kwargs), shapes)
+        except TypeError:
+            return None
+
+        func = node.func
+        sha = hashlib.sha256(_KEY_VERSION)
+        sha.update(repr((func.__module__, func.__qualname__, token)).encode())
+        if shapes:
+            with TemporaryDirectory() as tmp:
+                fn = os.path.join(tmp, 'shape.brep')
+                write_brep(CompoundByShapes(shapes).compound, fn)
+                with open(fn, 'rb') as fin:
+                    sha.update(fin.read())
+        return sha.hexdigest()
+
+    def _restore(self, key, parts):
+        """
+        Set the part shapes from disk if the key is found.
+        """
+        fn = os.path.join(self._path, key + _EXT)
+        if not os.path.isfile(fn):
+            return False
+        shapes = list(read_brep(fn).shape_iter)
+        if len(shapes) != len(parts):
+            return False
+        for part, shape in zip(parts, shapes):
+            part.set_shape(shape)
+        return True
+
+    def _store(self, key, parts):
+        """
+        Write the part shapes to disk.
+        """
+        if not parts:
+            return
+        fn = os.path.join(self._path, key + _EXT)
+        shapes = [part.shape for part in parts]
+        write_brep(CompoundByShapes(shapes).compound, fn + '.tmp')
+        os.replace(fn + '.tmp', fn)
+
+
+class BuildParam(object):
+    """
+    Parameter of a build graph.
+
+    :param str name: The name.
+    :param value: The value.
+    """
+
+    def __init__(self, name, value):
+        self._name = name
+        self._value = value
+
+    @property
+    def name(self):
+        """
+        :return: The name.
+        :rtype: str
+        """
+        return self._name
+
+    @property
+    def value(self):
+        """
+        :return: The value.
+        """
+        return self._value
+
+    def set_value(self, value):
+        """
+        Set the value.
+
+        :param value: The value.
+
+        :return: None.
+        """
+        self._value = value
+
+
+class BuildNode(object):
+    """
+    Operation of a build graph.
+
+    :param str name: The name.
+    :param func: The function or builder class to call.
+    :param tuple args: The positional arguments.
+    :param dict kwargs: The keyword arguments.
+    :param params: The parameters used in the arguments.
+    :type params: collections.Iterable(afem.structure.graph.BuildParam)
+    :param nodes: The nodes referred to in the arguments.
+    :type nodes: collections.Iterable(afem.structure.graph.BuildNode)
+    """
+
+    def __init__(self, name, func, args, kwargs, params, nodes):
+        self._name = name
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._params = list(params)
+        self._nodes = list(nodes)
+
+        self._is_built = False
+        self._num_runs = 0
+        self._result = None
+        self._values = {}
+        self._before = []
+        self._after = []
+        self._created = []
+        self._is_referenced = False
+        self._is_restored = False
+
+    @property
+    def name(self):
+        """
+        :return: The name.
+        :rtype: str
+        """
+        return self._name
+
+    @property
+    def func(self):
+        """
+        :return: The function or builder class.
+        """
+        return self._func
+
+    @property
+    def args(self):
+        """
+        :return: The positional arguments.
+        :rtype: tuple
+        """
+        return self._args
+
+    @property
+    def kwargs(self):
+        """
+        :return: The keyword arguments.
+        :rtype: dict
+        """
+        return self._kwargs
+
+    @property
+    def is_builder(self):
+        """
+        :return: *True* if the function is a part builder class, *False* if
+            not. A group passed to a builder is where the new parts go, so
+            its parts are not treated as inputs.
+        :rtype: bool
+        """
+        return (isinstance(self._func, type) and
+                issubclass(self._func, (PartBuilder, PartsBuilder)))
+
+    @property
+    def is_built(self):
+        """
+        :return: *True* if the node has been executed and is up to date,
+            *False* if not.
+        :rtype: bool
+        """
+        return self._is_built
+
+    @property
+    def num_runs(self):
+        """
+        :return: The number of times the node has been executed.
+        :rtype: int
+        """
+        return self._num_runs
+
+    @property
+    def result(self):
+        """
+        :return: The value returned by the function the last time it was
+            executed. This is *None* if the part shapes were read from disk,
+            which is only done for nodes that no other node refers to.
+        """
+        return self._result
+
+    @property
+    def created_parts(self):
+        """
+        :return: The parts created by the node.
+        :rtype: list(afem.structure.entities.Part)
+        """
+        return list(self._created)
+
+    def attr(self, name):
+        """
+        Refer to an attribute of the result, like the *part* of a builder.
+
+        :param str name: The attribute name.
+
+        :return: The reference.
+        :rtype: afem.structure.graph.BuildRef
+        """
+        return BuildRef(self).attr(name)
+
+    def item(self, key):
+        """
+        Refer to an item of the result.
+
+        :param key: The index or key.
+
+        :return: The reference.
+        :rtype: afem.structure.graph.BuildRef
+        """
+        return BuildRef(self).item(key)
+
+    def invalidate(self):
+        """
+        Force the node to be executed again at the next build.
+
+        :return: None.
+        """
+        self._is_built = False
+
+    def _is_dirty(self, inputs, executed):
+        """
+        Check if the node needs to be executed given its current input parts
+        and the names of the nodes already executed in this build.
+        """
+        if not self._is_built:
+            return True
+        for node in self._nodes:
+            if node.name in executed:
+                return True
+        for param in self._params:
+            if _differs(param.value, self._values[param.name]):
+                return True
+        if len(inputs) != len(self._before):
+            return True
+        for part, (old_part, shape) in zip(inputs, self._before):
+            if part is not old_part or not _same_shape(part.shape, shape):
+                return True
+        return False
+
+    def _record(self, result, before, parts, created, restored=False):
+        """
+        Record the state after the node is executed or its part shapes are
+        restored from disk.
+        """
+        self._is_built = True
+        self._num_runs += 1
+        self._result = result
+        self._values = {param.name: param.value for param in self._params}
+        self._before = before
+        self._after = [(part, part.shape) for part in parts]
+        self._created = created
+        self._is_restored = restored
+
+
+class BuildRef(object):
+    """
+    Reference to an attribute or item of the result of a build node.
+
+    :param afem.structure.graph.BuildNode node: The node.
+    :param tuple path: The attribute names and item keys to follow as
+        (kind, name) pairs where kind is 'attr' or 'item'.
+    """
+
+    def __init__(self, node, path=()):
+        self._node = node
+        self._path = tuple(path)
+
+    @property
+    def node(self):
+        """
+        :return: The node.
+        :rtype: afem.structure.graph.BuildNode
+        """
+        return self._node
+
+    @property
+    def value(self):
+        """
+        :return: The value at the end of the path.
+        """
+        value = self._node.result
+        for kind, name in self._path:
+            if kind == 'attr':
+                value = getattr(value, name)
+            else:
+                value = value[name]
+        return value
+
+    def attr(self, name):
+        """
+        Refer to an attribute of this value.
+
+        :param str name: The attribute name.
+
+        :return: The reference.
+        :rtype: afem.structure.graph.BuildRef
+        """
+        return BuildRef(self._node, self._path + (('attr', name),))
+
+    def item(self, key):
+        """
+        Refer to an item of this value.
+
+        :param key: The index or key.
+
+        :return: The reference.
+        :rtype: afem.structure.graph.BuildRef
+        """
+        return BuildRef(self._node, self._path + (('item', key),))
+
+
+def _references(obj, params, nodes):
+    """
+    Gather the parameters and nodes referred to in the arguments.
+    """
+    if isinstance(obj, BuildParam):
+        params.add(obj)
+    elif isinstance(obj, BuildNode):
+        nodes.add(obj)
+    elif isinstance(obj, BuildRef):
+        nodes.add(obj.node)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            _references(item, params, nodes)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            _references(item, params, nodes)
+
+
+def _resolve(obj):
+    """
+    Replace the parameters and nodes in the arguments by their values.
+    """
+    if isinstance(obj, BuildParam):
+        return obj.value
+    if isinstance(obj, BuildNode):
+        return obj.result
+    if isinstance(obj, BuildRef):
+        return obj.value
+    if isinstance(obj, (list, tuple, set)):
+        return type(obj)(_resolve(item) for item in obj)
+    if isinstance(obj, dict):
+        return type(obj)((key, _resolve(item)) for key, item in obj.items())
+    return obj
+
+
+def _parts_in(obj, skip_groups=False, parts=None, seen=None):
+    """
+    Gather the parts in a value without duplicates, in a stable order.
+    """
+    if parts is None:
+        parts, seen = [], set()
+
+    if isinstance(obj, Part):
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            parts.append(obj)
+    elif isinstance(obj, Group):
+        if not skip_groups:
+            _parts_in(obj.get_parts(order=True), skip_groups, parts, seen)
+    elif isinstance(obj, PartBuilder):
+        _parts_in(obj.part, skip_groups, parts, seen)
+    elif isinstance(obj, PartsBuilder):
+        _parts_in(obj.parts, skip_groups, parts, seen)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _parts_in(item, skip_groups, parts, seen)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            _parts_in(item, skip_groups, parts, seen)
+
+    return parts
+
+
+def _token(obj, shapes):
+    """
+    Text form of the arguments for hashing. The part shapes are gathered
+    separately.
+
+    :raise TypeError: If a value cannot be hashed reliably.
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return repr(obj)
+    if isinstance(obj, Part):
+        shapes.append(obj.shape)
+        return 'Part({})'.format(obj.name)
+    if isinstance(obj, Group):
+        parts = [_token(part, shapes) for part in obj.get_parts(order=True)]
+        return 'Group({}, [{}])'.format(obj.name, ', '.join(parts))
+    if isinstance(obj, (list, tuple)):
+        return '[{}]'.format(', '.join(_token(item, shapes) for item in obj))
+    if isinstance(obj, dict):
+        items = ['{!r}: {}'.format(key, _token(obj[key], shapes))
+                 for key in sorted(obj)]
+        return '{{{}}}'.format(', '.join(items))
+    raise TypeError('Cannot hash value of type {}.'.format(type(obj)))
+
+
+def _differs(value1, value2):
+    """
+    Check if two parameter values differ.
+    """
+    try:
+        return bool(value1 != value2)
+    except (TypeError, ValueError):
+        return value1 is not value2
+
+
+def _same_shape(shape1, shape2):
+    """
+    Check if two part shapes are the same.
+    """
+    if shape1 is None or shape2 is None:
+        return shape1 is shape2
+    return shape1.is_same(shape2)
@@ -17,10 +17,13 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+from bisect import bisect_left, insort
+from heapq import merge
+
 from afem.base.entities import NamedItem
 from afem.exchange.xde import XdeDocument
-from afem.structure.utils import order_parts_by_id
 from afem.topology.create import CompoundByShapes, EdgeByCurve, FaceBySurface
+from afem.topology.tree import BBoxTree
 
 __all__ = ["Group", "GroupAPI"]
 
@@ -39,8 +42,16 @@ class Group(NamedItem):
         self._parent = parent
         self._children = set()
         self._parts = set()
+        self._cache = {}
+
+        # Part indexes by name, type, and sorted ID
+        self._names = {}
+        self._types = {}
+        self._ids = []
+        self._id_to_part = {}
         if isinstance(self._parent, Group):
             self._parent._children.add(self)
+            self._parent._invalidate()
 
     @property
     def parent(self):
@@ -74,23 +85,38 @@ class Group(NamedItem):
 
         :return: None.
         """
-        part_set = set(parts)
-        self._parts.update(part_set)
+        for part in parts:
+            if part in self._parts:
+                continue
+            self._parts.add(part)
+            self._index(part)
+            part._groups.add(self)
+        self._invalidate()
 
-    def get_part(self, name):
+    def get_part(self, name, include_subgroup=False):
         """
         Get a part in the group by name.
 
         :param str name: Part name.
+        :param bool include_subgroup: Option to recursively search any
+            subgroups if the part is not in this group.
 
         :return: The part.
         :rtype: afem.structure.entities.Part
 
         :raise KeyError: If the part is not found.
         """
-        for part in self.parts:
-            if part.name == name:
-                return part
+        parts = self._names.get(name)
+        if parts:
+            return parts[0]
+
+        if include_subgroup:
+            for group in self._children:
+                try:
+                    return group.get_part(name, True)
+                except KeyError:
+                    continue
+
         raise KeyError('Part with given name could not be found in the '
                        'group.')
 
@@ -108,21 +134,34 @@ class Group(NamedItem):
         :return: List of parts.
         :rtype: list(afem.structure.entities.Part)
         """
-        parts = []
-        for part in self.parts:
-            if rtype is None:
-                parts.append(part)
-            else:
-                if isinstance(part, rtype):
-                    parts.append(part)
+        key = ('parts', include_subgroup, rtype, order)
+        if key in self._cache:
+            return list(self._cache[key])
+
+        # Use the type and ID indexes
+        if order:
+            parts = [self._id_to_part[i] for i in self._ids]
+            if rtype is not None:
+                parts = [part for part in parts if isinstance(part, rtype)]
+        elif rtype is None:
+            parts = list(self._parts)
+        else:
+            parts = []
+            for type_, type_parts in self._types.items():
+                if issubclass(type_, rtype):
+                    parts += type_parts
 
         if include_subgroup:
-            for group in self._children:
-                parts += group.get_parts(True, rtype)
+            sub_parts = [group.get_parts(True, rtype, order)
+                         for group in self._children]
+            if order:
+                parts = list(merge(parts, *sub_parts, key=_part_id))
+            else:
+                for group_parts in sub_parts:
+                    parts += group_parts
 
-        if not order:
-            return parts
-        return order_parts_by_id(parts)
+        self._cache[key] = parts
+        return list(parts)
 
     def remove_part(self, name):
         """
@@ -133,13 +172,31 @@ class Group(NamedItem):
         :return: None.
         """
         part = self.get_part(name)
+        self.discard_part(part)
+
+    def discard_part(self, part):
+        """
+        Remove a part from the group if present. Unlike
+        :meth:`.remove_part` this removes the given part even if other
+        parts have the same name.
+
+        :param afem.structure.entities.Part part: The part.
+
+        :return: None.
+        """
+        if part not in self._parts:
+            return
         self._parts.discard(part)
+        self._unindex(part, part.name)
+        part._groups.discard(self)
+        self._invalidate()
 
     def get_shape(self, include_subgroup=True):
         """
         Get a shape derived from all parts in the group. This puts all the
         parts into a single compound which could be used as the master shape
-        for the meshing process.
+        for the meshing process. The compound is kept until a part is added
+        to or removed from the group or a part shape is changed.
 
         :param bool include_subgroup: Option to recursively include parts
             from any subgroups.
@@ -147,9 +204,29 @@ class Group(NamedItem):
         :return: The part shapes as a compound.
         :rtype: afem.topology.entities.Compound
         """
-        parts = self.get_parts(include_subgroup)
-        shapes = [part.shape for part in parts]
-        return CompoundByShapes(shapes).compound
+        key = ('shape', include_subgroup)
+        if key not in self._cache:
+            parts = self.get_parts(include_subgroup)
+            shapes = [part.shape for part in parts]
+            self._cache[key] = CompoundByShapes(shapes).compound
+        return self._cache[key]
+
+    def get_tree(self, include_subgroup=True, rtype=None, tol=None):
+        """
+        Build a bounding box tree of the parts in the group. Keep the tree to
+        answer repeated spatial queries and update it when a part shape is
+        rebuilt.
+
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to index only parts of a certain type.
+        :param float tol: Option to enlarge the bounding box of each part.
+
+        :return: The tree.
+        :rtype: afem.topology.tree.BBoxTree
+        """
+        parts = self.get_parts(include_subgroup, rtype, True)
+        return BBoxTree(parts, tol)
 
     def create_subgroup(self, name, active=True):
         """
@@ -163,6 +240,48 @@ class Group(NamedItem):
         """
         return GroupAPI.create_group(name, self, active)
 
+    def _index(self, part):
+        """
+        Add the part to the indexes.
+        """
+        self._names.setdefault(part.name, []).append(part)
+        self._types.setdefault(type(part), set()).add(part)
+        self._id_to_part[part.id] = part
+        insort(self._ids, part.id)
+
+    def _unindex(self, part, name):
+        """
+        Remove the part from the indexes using the name it was indexed with.
+        """
+        parts = self._names[name]
+        parts.remove(part)
+        if not parts:
+            del self._names[name]
+
+        parts = self._types[type(part)]
+        parts.discard(part)
+        if not parts:
+            del self._types[type(part)]
+
+        del self._id_to_part[part.id]
+        del self._ids[bisect_left(self._ids, part.id)]
+
+    def _rename(self, part, old_name):
+        """
+        Update the name index after a part is renamed.
+        """
+        self._unindex(part, old_name)
+        self._index(part)
+
+    def _invalidate(self):
+        """
+        Clear the cached parts and shapes of this group and its parents.
+        """
+        group = self
+        while isinstance(group, Group):
+            group._cache.clear()
+            group = group._parent
+
     @staticmethod
     def parts_to_compound(parts):
         """
@@ -312,7 +431,7 @@ class GroupAPI(object):
         group.add_parts(*parts)
 
     @classmethod
-    def get_part(cls, name, group=None):
+    def get_part(cls, name, group=None, include_subgroup=False):
         """
         Get a part from the group using its name.
         
@@ -320,6 +439,8 @@ class GroupAPI(object):
         :param group: The group. If ``None`` then the active group is
             used.
         :type group: str or afem.structure.group.Group or None
+        :param bool include_subgroup: Option to recursively search any
+            subgroups if the part is not in the group.
          
         :return: The part.
         :rtype: afem.structure.entities.Part
@@ -327,7 +448,7 @@ class GroupAPI(object):
         :raise KeyError: If the part is not found.
         """
         group = cls.get_group(group)
-        return group.get_part(name)
+        return group.get_part(name, include_subgroup)
 
     @classmethod
     def get_parts(cls, group=None, include_subgroup=True, rtype=None,
@@ -385,6 +506,27 @@ class GroupAPI(object):
         group = cls.get_group(group)
         return group.get_shape(include_subgroup)
 
+    @classmethod
+    def get_tree(cls, group='_master', include_subgroup=True, rtype=None,
+                 tol=None):
+        """
+        Build a bounding box tree of the parts in the group. By default the
+        whole model is indexed.
+
+        :param group: The group. If ``None`` then the active group is
+            used. By default the master model is used.
+        :type group: str or afem.structure.group.Group or None
+        :param bool include_subgroup: Option to recursively include parts
+            from any subgroups.
+        :param rtype: Option to index only parts of a certain type.
+        :param float tol: Option to enlarge the bounding box of each part.
+
+        :return: The tree.
+        :rtype: afem.topology.tree.BBoxTree
+        """
+        group = cls.get_group(group)
+        return group.get_tree(include_subgroup, rtype, tol)
+
     @classmethod
     def save_model(cls, fn, binary=True):
         """
@@ -497,3 +639,10 @@ class GroupAPI(object):
                 part.set_color(r, g, b)
 
         return True
+
+
+def _part_id(part):
+    """
+    Key to merge parts ordered by ID.
+    """
+    return part.id
@@ -17,13 +17,22 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
-from numpy import mean
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+from time import perf_counter
 
+from numpy import (argmax, argsort, array, array_split, mean, nonzero,
+                   zeros)
+
+from afem.exchange.brep import read_brep, write_brep
 from afem.structure.entities import SurfacePart
-from afem.topology.bop import FuseShapes, IntersectShapes, SplitShapes
+from afem.topology.bop import (BopAlgo, FuseShapes, IntersectShapes,
+                               SplitShapes)
 from afem.topology.create import CompoundByShapes, EdgeByCurve
-from afem.topology.entities import Shape
+from afem.topology.entities import BBox, Shape
 from afem.topology.modify import RebuildShapesByTool, SewShape
+from afem.topology.tree import BBoxTree
 from afem.config import logger
 
 __all__ = ["FuseSurfaceParts", "FuseSurfacePartsByCref", "CutParts",
@@ -81,18 +90,23 @@ class FuseSurfacePartsByCref(object):
     """
     Attempt to automatically fuse together adjacent parts based on the
     possible intersection of their reference curve. The part shapes are
-    rebuilt in place.
+    rebuilt in place. Only pairs of parts whose reference curve bounding
+    boxes overlap are tested for intersection. These are found with a
+    bounding box tree and tested in worker processes if *nprocs* is greater
+    than one.
 
     :param parts: The surface parts.
     :type parts: collections.Sequence(afem.structure.entities.SurfacePart)
     :param float tol: The tolerance to use for checking possible
         intersections of the reference curves. Default is the maximum
         tolerance of the part shape.
+    :param int nprocs: The number of worker processes used to test the
+        reference curves for intersection.
 
     :raises TypeError: If a given part is not a surface part.
     """
 
-    def __init__(self, parts, tol=None):
+    def __init__(self, parts, tol=None, nprocs=1):
         self._is_done = False
 
         for part in parts:
@@ -100,36 +114,50 @@ class FuseSurfacePartsByCref(object):
                 msg = 'Part is not a surface part.'
                 raise TypeError(msg)
 
-        # Test all combinations of parts for intersection of reference curve
-        join_parts = []
-        main_parts = []
+        # Build each reference curve edge once
         nparts = len(parts)
+        edges, tols = [None] * nparts, zeros(nparts)
+        for i, part in enumerate(parts):
+            if not part.has_cref:
+                continue
+            edges[i] = EdgeByCurve(part.cref).edge
+            tols[i] = part.shape.tol_max if tol is None else tol
+
+        # Only pairs with overlapping boxes can intersect. The tree boxes
+        # use the largest tolerance so no candidate pair is missed.
+        indx = {edge: i for i, edge in enumerate(edges) if edge is not None}
+        tree = BBoxTree(list(indx), tols.max() if nparts else None)
+        pairs = []
         for i in range(0, nparts - 1):
-            main = parts[i]
-            other_parts = []
-            for j in range(i + 1, nparts):
-                other = parts[j]
-                if not main.has_cref or not other.has_cref:
-                    continue
-                if tol is None:
-                    tol1 = main.shape.tol_max
-                    tol2 = other.shape.tol_max
-                    _tol = max(tol1, tol2)
-                else:
-                    _tol = tol
-                e1 = EdgeByCurve(main.cref).edge
-                e2 = EdgeByCurve(other.cref).edge
-                bop = IntersectShapes(e1, e2, fuzzy_val=_tol)
-                if not bop.vertices:
-                    continue
-                # Store potential join
-                msg = 'Found joint between {} and {}.'.format(main.name,
-                                                              other.name)
-                logger.info(msg)
-                other_parts.append(other)
-            if other_parts:
+            if edges[i] is None:
+                continue
+            bbox = BBox()
+            bbox.add_shape(edges[i])
+            bbox.enlarge(tols[i])
+            candidates = sorted(indx[edge] for edge in tree.box_overlap(bbox))
+            pairs += [(i, j) for j in candidates if j > i]
+
+        # Test the candidate pairs for intersection of reference curve
+        pair_tols = [max(tols[i], tols[j]) for i, j in pairs]
+        if nprocs > 1 and len(pairs) > 1:
+            found = _map_pairs(edges, pairs, pair_tols, nprocs)
+        else:
+            found = _intersect_pairs(edges, pairs, pair_tols)
+
+        join_parts = []
+        main_parts = []
+        for (i, j), is_found in zip(pairs, found):
+            if not is_found:
+                continue
+            main, other = parts[i], parts[j]
+            # Store potential join
+            msg = 'Found joint between {} and {}.'.format(main.name,
+                                                          other.name)
+            logger.info(msg)
+            if not main_parts or main_parts[-1] is not main:
                 main_parts.append(main)
-                join_parts.append(other_parts)
+                join_parts.append([])
+            join_parts[-1].append(other)
 
         # Join the parts
         for main, other_parts in zip(main_parts, join_parts):
@@ -279,32 +307,65 @@ class FuseGroups(object):
     Fuse groups and rebuild the part shapes. This tool puts all the part
     shapes into compounds before the Boolean operation.
 
+    If more than one cluster is requested, the parts are split into
+    clusters along the longest axis of their overall bounding box. Each
+    cluster is fused on its own, in worker processes if *nprocs* is greater
+    than one, and then the parts near the cluster interfaces are fused once
+    more to stitch the clusters together. A part that is in more than one
+    group is only fused with its first group in this mode.
+
     :param groups: The groups.
     :type groups: collections.Sequence(afem.structure.group.Group)
     :param float fuzzy_val: Fuzzy tolerance value.
     :param bool include_subgroup: Option to recursively include parts
             from all subgroups.
+    :param int nclusters: The number of clusters.
+    :param int nprocs: The number of worker processes used to fuse the
+        clusters.
 
     :raise ValueError: If less than two groups are provided.
     """
 
-    def __init__(self, groups, fuzzy_val=None, include_subgroup=True):
+    def __init__(self, groups, fuzzy_val=None, include_subgroup=True,
+                 nclusters=1, nprocs=1):
         if len(groups) < 2:
             raise ValueError('Not enough groups to fuse. Need at least '
                              'two.')
 
+        self._parallel_mode = FuseShapes.get_parallel_mode()
+        self._cluster_times = []
+        self._cluster_modes = []
+        self._stitch_time = 0.
+        self._nstitched = 0
+
+        group_parts = [group.get_parts(include_subgroup) for group in groups]
+
+        if nclusters > 1:
+            # Each part can only be in one cluster, so keep each part in its
+            # first group only
+            used = set()
+            for i, parts in enumerate(group_parts):
+                group_parts[i] = [part for part in parts if part not in used]
+                used.update(group_parts[i])
+            self._bop = None
+            self._is_done = self._fuse_clusters(group_parts, fuzzy_val,
+                                                nclusters, nprocs)
+            all_parts = [part for parts in group_parts for part in parts]
+            shapes = [part.shape for part in all_parts]
+            self._shape = CompoundByShapes(shapes).compound
+            return
+
+        start = perf_counter()
         bop = FuseShapes(fuzzy_val=fuzzy_val)
 
-        groups = list(groups)
-        parts1 = groups[0].get_parts(include_subgroup)
+        parts1 = group_parts[0]
         shapes1 = [part.shape for part in parts1]
         shape1 = CompoundByShapes(shapes1).compound
         bop.set_args([shape1])
 
         tools = []
         other_parts = []
-        for group in groups[1:]:
-            parts = group.get_parts(include_subgroup)
+        for parts in group_parts[1:]:
             other_parts += parts
             shapes = [part.shape for part in parts]
             shape = CompoundByShapes(shapes).compound
@@ -321,6 +382,10 @@ class FuseGroups(object):
             part.set_shape(new_shape)
 
         self._bop = bop
+        self._is_done = bop.is_done
+        self._shape = bop.shape
+        self._cluster_times.append(perf_counter() - start)
+        self._cluster_modes.append(self._parallel_mode)
 
     @property
     def is_done(self):
@@ -328,7 +393,7 @@ class FuseGroups(object):
         :return: *True* if operation is done, *False* if not.
         :rtype: bool
         """
-        return self._bop.is_done
+        return self._is_done
 
     @property
     def shape(self):
@@ -336,4 +401,270 @@ class FuseGroups(object):
         :return: The fused shape.
         :rtype: afem.topology.entities.Shape
         """
-        return self._bop.shape
+        return self._shape
+
+    @property
+    def parallel_mode(self):
+        """
+        :return: *True* if the Boolean operations ran with their parallel
+            mode on, *False* if not. This is the global option when the tool
+            was created and it is also applied in the worker processes.
+        :rtype: bool
+        """
+        return self._parallel_mode
+
+    @property
+    def cluster_parallel_modes(self):
+        """
+        :return: The parallel mode of the Boolean operation of each cluster
+            as it was set in the process that fused it.
+        :rtype: list(bool)
+        """
+        return list(self._cluster_modes)
+
+    @property
+    def num_clusters(self):
+        """
+        :return: The number of clusters fused.
+        :rtype: int
+        """
+        return len(self._cluster_times)
+
+    @property
+    def cluster_times(self):
+        """
+        :return: The wall time in seconds to fuse each cluster.
+        :rtype: list(float)
+        """
+        return list(self._cluster_times)
+
+    @property
+    def stitch_time(self):
+        """
+        :return: The wall time in seconds to stitch the clusters together.
+        :rtype: float
+        """
+        return self._stitch_time
+
+    @property
+    def num_stitched(self):
+        """
+        :return: The number of parts fused again to stitch the clusters.
+        :rtype: int
+        """
+        return self._nstitched
+
+    def _fuse_clusters(self, group_parts, fuzzy_val, nclusters, nprocs):
+        """
+        Fuse the parts by clusters and stitch the clusters together.
+
+        :return: *True* if all the Boolean operations are done, *False* if
+            not.
+        :rtype: bool
+        """
+        all_parts, gids = [], []
+        for i, parts in enumerate(group_parts):
+            all_parts += parts
+            gids += [i] * len(parts)
+        gids = array(gids)
+        nparts = len(all_parts)
+
+        # Bounding box of each part enlarged so touching parts overlap
+        lo, hi = zeros((nparts, 3)), zeros((nparts, 3))
+        tols = zeros(nparts)
+        for i, part in enumerate(all_parts):
+            bbox = BBox()
+            bbox.add_shape(part.shape)
+            tols[i] = part.shape.tol_max
+            if fuzzy_val is not None:
+                tols[i] = max(tols[i], fuzzy_val)
+            bbox.enlarge(tols[i])
+            lo[i] = bbox.pmin.xyz
+            hi[i] = bbox.pmax.xyz
+
+        # Split the parts evenly along the longest axis using box centers
+        axis = argmax(hi.max(axis=0) - lo.min(axis=0))
+        center = 0.5 * (lo[:, axis] + hi[:, axis])
+        cids = zeros(nparts, dtype=int)
+        for i, indx in enumerate(array_split(argsort(center, kind='stable'),
+                                             nclusters)):
+            cids[indx] = i
+
+        # Overlapping parts found with a tree using the largest tolerance
+        # and then checked with their own boxes
+        indx = {id(part): i for i, part in enumerate(all_parts)}
+        tree = BBoxTree(all_parts, tols.max() if nparts else None)
+        neighbors = []
+        for i in range(nparts):
+            bbox = BBox()
+            bbox.add_shape(all_parts[i].shape)
+            bbox.enlarge(tols[i])
+            found = array(sorted(indx[id(part)] for part in
+                                 tree.box_overlap(bbox)), dtype=int)
+            found = found[((lo[found] <= hi[i]) &
+                           (lo[i] <= hi[found])).all(axis=1)]
+            neighbors.append(found[found != i])
+
+        # Fuse each cluster
+        clusters = [nonzero(cids == i)[0] for i in range(nclusters)]
+        clusters = [indx for indx in clusters if indx.size > 0]
+        status = True
+        with TemporaryDirectory() as tmp:
+            jobs = []
+            for i, indx in enumerate(clusters):
+                fin = os.path.join(tmp, 'cluster{}.brep'.format(i))
+                fout = os.path.join(tmp, 'fused{}.brep'.format(i))
+                sizes = [int((gids[indx] == j).sum())
+                         for j in range(len(group_parts))]
+                shapes = [all_parts[j].shape for j in indx]
+                write_brep(CompoundByShapes(shapes).compound, fin)
+                jobs.append((fin, fout, sizes, fuzzy_val,
+                             self._parallel_mode))
+
+            if nprocs > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(nprocs) as pool:
+                    futures = [pool.submit(_fuse_cluster, *job)
+                               for job in jobs]
+                    results = [future.result() for future in futures]
+            else:
+                results = [_fuse_cluster(*job) for job in jobs]
+
+            for i, (indx, job, result) in enumerate(zip(clusters, jobs,
+                                                        results)):
+                is_done, elapsed, mode = result
+                self._cluster_times.append(elapsed)
+                self._cluster_modes.append(mode)
+                msg = 'Fused cluster {} with {} parts in {:.3f} s.'
+                logger.info(msg.format(i, indx.size, elapsed))
+                if not is_done:
+                    status = False
+                    continue
+                new_shapes = list(read_brep(job[1]).shape_iter)
+                for j, new_shape in zip(indx, new_shapes):
+                    all_parts[j].set_shape(new_shape)
+
+        # Parts near another cluster and the parts touching those in their
+        # own cluster are fused again so the shared edges stay conformal
+        interface = array([(cids[j] != cids[i]).any()
+                           for i, j in enumerate(neighbors)], dtype=bool)
+        near = array([((cids[j] == cids[i]) & interface[j]).any()
+                      for i, j in enumerate(neighbors)], dtype=bool)
+        stitch = nonzero(interface | near)[0]
+        if len(set(gids[stitch])) < 2:
+            return status
+
+        start = perf_counter()
+        bop = FuseShapes(fuzzy_val=fuzzy_val)
+        compounds, stitch_parts = [], []
+        for j in range(len(group_parts)):
+            parts = [all_parts[i] for i in stitch if gids[i] == j]
+            if not parts:
+                continue
+            stitch_parts += parts
+            shapes = [part.shape for part in parts]
+            compounds.append(CompoundByShapes(shapes).compound)
+        bop.set_args(compounds[:1])
+        bop.set_tools(compounds[1:])
+        bop.build()
+
+        shapes = [part.shape for part in stitch_parts]
+        rebuild = RebuildShapesByTool(shapes, bop)
+        for part in stitch_parts:
+            new_shape = rebuild.new_shape(part.shape)
+            part.set_shape(new_shape)
+
+        self._stitch_time = perf_counter() - start
+        self._nstitched = len(stitch_parts)
+        msg = 'Stitched {} clusters using {} parts in {:.3f} s.'
+        logger.info(msg.format(len(clusters), self._nstitched,
+                               self._stitch_time))
+        return status and bop.is_done
+
+
+def _map_pairs(edges, pairs, tols, nprocs):
+    """
+    Test pairs of edges for intersection in worker processes. The edges are
+    written to a BREP file shared by the workers.
+
+    :return: *True* for each pair that intersects, *False* if not.
+    :rtype: list(bool)
+    """
+    # Only the edges used by the pairs are sent
+    used = sorted({i for pair in pairs for i in pair})
+    local = {i: k for k, i in enumerate(used)}
+    local_pairs = [(local[i], local[j]) for i, j in pairs]
+
+    n = len(pairs)
+    nprocs = min(nprocs, n)
+    bounds = [n * i // nprocs for i in range(nprocs + 1)]
+    with TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, 'edges.brep')
+        write_brep(CompoundByShapes([edges[i] for i in used]).compound, fn)
+        with ProcessPoolExecutor(nprocs) as pool:
+            futures = [pool.submit(_intersect_pairs, fn,
+                                   local_pairs[i1:i2], tols[i1:i2])
+                       for i1, i2 in zip(bounds[:-1], bounds[1:])]
+            return [found for future in futures for found in future.result()]
+
+
+def _intersect_pairs(edges, pairs, tols):
+    """
+    Test pairs of edges for intersection, possibly in a worker process.
+
+    :param edges: The edges or the name of a BREP file holding them.
+    :type edges: collections.Sequence(afem.topology.entities.Edge) or str
+
+    :return: *True* for each pair that intersects, *False* if not.
+    :rtype: list(bool)
+    """
+    if isinstance(edges, str):
+        edges = list(read_brep(edges).shape_iter)
+
+    found = []
+    for (i, j), tol in zip(pairs, tols):
+        bop = IntersectShapes(edges[i], edges[j], fuzzy_val=tol,
+                              nondestructive=True)
+        found.append(bool(bop.vertices))
+    return found
+
+
+def _fuse_cluster(fin, fout, sizes, fuzzy_val, parallel):
+    """
+    Fuse a cluster of part shapes, possibly in a worker process. The input
+    BREP file holds the part shapes ordered by group and *sizes* is the
+    number of parts in each group. The rebuilt part shapes are written to
+    the output BREP file in the same order. The parallel mode of the
+    Boolean operations is set first since a worker process starts with the
+    default.
+
+    :return: *True* if the Boolean operation is done, *False* if not, the
+        wall time in seconds, and the parallel mode used.
+    :rtype: tuple(bool, float, bool)
+    """
+    start = perf_counter()
+    BopAlgo.set_parallel_mode(parallel)
+    parallel = BopAlgo.get_parallel_mode()
+    shapes = list(read_brep(fin).shape_iter)
+
+    compounds, i = [], 0
+    for size in sizes:
+        if size > 0:
+            compounds.append(CompoundByShapes(shapes[i:i + size]).compound)
+        i += size
+
+    # Nothing to fuse if the cluster holds a single group
+    if len(compounds) < 2:
+        write_brep(CompoundByShapes(shapes).compound, fout)
+        return True, perf_counter() - start, parallel
+
+    bop = FuseShapes(fuzzy_val=fuzzy_val)
+    bop.set_args(compounds[:1])
+    bop.set_tools(compounds[1:])
+    bop.build()
+    if not bop.is_done:
+        return False, perf_counter() - start, parallel
+
+    rebuild = RebuildShapesByTool(shapes, bop)
+    new_shapes = [rebuild.new_shape(shape) for shape in shapes]
+    write_brep(CompoundByShapes(new_shapes).compound, fout)
+    return True, perf_counter() - start, parallel
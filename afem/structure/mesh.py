@@ -17,16 +17,35 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
-from afem.exchange import nastran
+import os
+import pickle
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+
+from OCCT.SMESH import SMESH_MesherHelper, SMESH_subMesh
+from OCCT.gp import gp_Pnt
+from numpy import (arange, argmin, empty, int64, linalg, nonzero, unique,
+                   zeros, zeros_like)
+
+from afem.config import logger
+from afem.exchange import nastran, snapshot
+from afem.exchange.brep import read_brep, write_brep
 from afem.smesh.entities import MeshGen, MeshGroup, Mesh
-from afem.smesh.hypotheses import (Regular1D, NetgenAlgo2D,
+from afem.smesh.hypotheses import (Hypothesis, Regular1D, NetgenAlgo2D,
                                    NetgenSimple2D, LocalLength1D,
                                    NumberOfSegments1D, MaxLength1D,
                                    QuadrangleAlgo2D, QuadrangleHypo2D)
+from afem.smesh.quality import MeshQuality
 from afem.structure.group import GroupAPI
+from afem.topology.create import CompoundByShapes
+from afem.topology.entities import Shape
 
 __all__ = ["MeshVehicle"]
 
+# Reference to a shape in the BREP file sent to the worker processes
+_ShapeRef = namedtuple('_ShapeRef', ['index'])
+
 
 class MeshVehicle(object):
     """
@@ -45,6 +64,9 @@ class MeshVehicle(object):
         self._shape = group.get_shape()
         self._gen = MeshGen()
         self._mesh = self._gen.create_mesh(self._shape)
+        self._quality = None
+        self._controls = []
+        self._previous = None
 
         # Initialize each part for meshing
         for part in group.get_parts():
@@ -81,6 +103,18 @@ class MeshVehicle(object):
         """
         return self._mesh
 
+    @property
+    def quality(self):
+        """
+        :return: The quality report of the face elements by part. It is
+            computed when first requested after each mesh computation.
+        :rtype: afem.smesh.quality.MeshQuality
+        """
+        if self._quality is None:
+            parts = GroupAPI.get_master().get_parts(order=True)
+            self._quality = MeshQuality(self._mesh, parts)
+        return self._quality
+
     def add_control(self, control, shape=None):
         """
         Add a mesh control.
@@ -97,6 +131,7 @@ class MeshVehicle(object):
         if shape is None:
             shape = self.shape
 
+        self._controls.append((control, shape))
         return self._mesh.add_hypothesis(control, shape)
 
     def add_controls(self, controls, shape=None):
@@ -177,14 +212,262 @@ class MeshVehicle(object):
             if alg.is_applicable(face):
                 self.add_controls([alg, hyp], face)
 
-    def compute(self):
+    def compute(self, check_quality=False, nprocs=1, cache=None):
         """
         Compute the mesh.
 
+        If :meth:`.update` was called, the mesh of the unchanged faces is
+        copied from the previous mesh and only the rest are computed.
+
+        :param bool check_quality: Option to compute the quality report of
+            the face elements and log a summary after meshing.
+        :param int nprocs: Number of worker processes. If greater than one,
+            the edges are meshed first and then the faces are meshed in
+            parallel by part and merged into the mesh. Since the edge
+            discretization is fixed before the faces are meshed, the merged
+            mesh stays conformal.
+        :param afem.smesh.cache.MeshCache cache: Option to restore the mesh
+            from the cache if the shape and controls have not changed, or to
+            store it in the cache after computing it.
+
         :return: *True* if successful, *False* if not.
         :rtype: bool
         """
-        return self._gen.compute(self._mesh, self._shape)
+        key = None
+        if cache is not None and self._mesh.num_nodes == 0:
+            key = cache.key(self._mesh, self._controls)
+
+        if key is not None and cache.restore(key, self._mesh):
+            shapes = self._shape.vertices + self._shape.edges
+            _set_computed(self._mesh, shapes + self._shape.faces)
+            status, key = True, None
+        else:
+            status, fids = True, None
+            if self._previous is not None:
+                status, fids = self._reuse_faces(self._previous)
+
+            if nprocs > 1:
+                status = self._compute_parallel(nprocs, fids) and status
+            else:
+                status = self._gen.compute(self._mesh, self._shape) and status
+
+        if self._previous is not None:
+            self._previous.clear()
+            self._previous = None
+
+        if key is not None and status:
+            cache.store(key, self._mesh)
+
+        self._quality = None
+        if check_quality:
+            self.quality.log_summary()
+        return status
+
+    def update(self):
+        """
+        Update the mesh after the parts have changed. A new mesh is created
+        for the current shape of the "master" group and the parts and
+        controls are moved to it. Controls applied to sub-shapes that are no
+        longer in the master shape are dropped. The next call to
+        :meth:`.compute` keeps the mesh of each face that is the same shape
+        as before along with its edges and vertices, including their node and
+        element ID's, and recomputes the changed faces and the faces next to
+        them.
+
+        :return: None.
+        """
+        # Keep the last computed mesh if updated more than once
+        if self._previous is None:
+            self._previous = self._mesh
+        group = GroupAPI.get_master()
+        old_shape = self._shape
+        self._shape = group.get_shape()
+        self._mesh = self._gen.create_mesh(self._shape)
+        self._quality = None
+
+        for part in group.get_parts():
+            part.init_meshing(self._mesh)
+
+        controls, self._controls = self._controls, []
+        ds = self._mesh.ds
+        for hyp, shape in controls:
+            if shape.is_same(old_shape):
+                shape = self._shape
+            elif not _has_sub_shapes(ds, shape):
+                msg = ('Dropping mesh control {} since its shape is no longer '
+                       'in the master shape.'.format(hyp.name))
+                logger.warning(msg)
+                continue
+            self.add_control(hyp, shape)
+
+    def _reuse_faces(self, old_mesh):
+        """
+        Copy the mesh of the unchanged faces and their edges and vertices
+        from the previous mesh keeping the node and element ID's, and then
+        mesh the rest of the edges.
+
+        :return: Status and the indices of the faces that still need to be
+            meshed.
+        :rtype: tuple(bool, list(int))
+        """
+        # A face is changed if it or any of its boundary is new
+        faces = self._shape.faces
+        old_ds = old_mesh.ds
+        changed, edge_faces = set(), {}
+        for i, face in enumerate(faces):
+            for edge in face.edges:
+                edge_faces.setdefault(edge, []).append(i)
+            if not (_has_sub_shapes(old_ds, face) and
+                    old_ds.has_elements(face)):
+                changed.add(i)
+
+        # Include faces sharing an edge with a changed face
+        nearby = set()
+        for i in changed:
+            for edge in faces[i].edges:
+                nearby.update(edge_faces[edge])
+        changed.update(nearby)
+
+        # Vertices and edges are copied before the faces they bound and only
+        # once. Faces with quadratic elements are recomputed.
+        helper = SMESH_MesherHelper(old_mesh.object)
+        copied, kept = set(), []
+        for i, face in enumerate(faces):
+            if i in changed:
+                continue
+            if old_mesh.get_submesh(face).ds.elm_arrays()[1].shape[1] > 4:
+                changed.add(i)
+                continue
+            for shape in face.vertices + face.edges + [face]:
+                if shape not in copied:
+                    _copy_submesh(old_mesh, self._mesh, shape, helper)
+                    copied.add(shape)
+            kept.append(face)
+        _set_computed(self._mesh, copied)
+
+        status = True
+        for edge in self._shape.edges:
+            status = self._gen.compute(self._mesh, edge) and status
+
+        logger.info('Keeping the mesh of {} of {} faces.'.format(len(kept),
+                                                                 len(faces)))
+        return status, sorted(changed)
+
+    def _compute_parallel(self, nprocs, fids=None):
+        """
+        Mesh the edges of the master shape and then mesh its faces in worker
+        processes. Only the faces with the given indices are meshed if
+        provided.
+        """
+        # Each worker rebuilds the controls from their construction arguments
+        # and setter calls. Shapes in the arguments are sent with the rest.
+        specs, shapes, controls = [], [self._shape], []
+        hyp_indx = {}
+        for hyp, shape in self._controls:
+            if id(hyp) not in hyp_indx:
+                hyp_indx[id(hyp)] = len(specs)
+                specs.append(_pack(hyp.spec, shapes))
+            if shape in shapes:
+                j = shapes.index(shape)
+            else:
+                j = len(shapes)
+                shapes.append(shape)
+            controls.append((hyp_indx[id(hyp)], j))
+
+        try:
+            pickle.dumps(specs)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            logger.warning('Mesh controls cannot be sent to worker '
+                           'processes. Computing the mesh serially.')
+            return self._gen.compute(self._mesh, self._shape)
+
+        # Fix the edge discretization first so shared edges stay conformal
+        status = True
+        for edge in self._shape.edges:
+            status = self._gen.compute(self._mesh, edge) and status
+
+        # Group the faces by part and balance the groups over the workers
+        faces = self._shape.faces
+        face_indx = {face: i for i, face in enumerate(faces)}
+        if fids is None:
+            fids = range(len(faces))
+        groups, used = [], set(range(len(faces))).difference(fids)
+        for part in GroupAPI.get_master().get_parts(order=True):
+            group = []
+            for face in part.shape.faces:
+                i = face_indx.get(face)
+                if i is not None and i not in used:
+                    group.append(i)
+                    used.add(i)
+            if group:
+                groups.append(group)
+        groups += [[i] for i in fids if i not in used]
+
+        with TemporaryDirectory() as tmp:
+            # The master shape and control shapes are written together so
+            # the workers see the same sub-shape indices
+            fn = os.path.join(tmp, 'master.brep')
+            write_brep(CompoundByShapes(shapes).compound, fn)
+            with ProcessPoolExecutor(nprocs) as pool:
+                futures = [pool.submit(_mesh_faces, fn, specs, controls, fids)
+                           for fids in _balance(groups, nprocs)]
+                results = [r for future in futures for r in future.result()]
+
+        cache = {}
+        for i, fid, xyz, uv, sids, conn, nnodes in results:
+            face = faces[i]
+            if xyz is None or not self._merge_face(face, fid, xyz, uv, sids,
+                                                   conn, nnodes, cache):
+                logger.warning('Face {} could not be merged from a worker '
+                               'process. Computing it serially.'.format(i))
+                status = self._gen.compute(self._mesh, face) and status
+
+        _set_computed(self._mesh, [faces[i] for i in fids])
+        return status
+
+    def _merge_face(self, face, fid, xyz, uv, sids, conn, nnodes, cache):
+        """
+        Add the nodes and elements of a face meshed in a worker process. The
+        boundary nodes are matched to the existing nodes on the edges and
+        vertices. The interior nodes are set on the face with their
+        parameters. Nothing is added if a boundary node cannot be matched.
+        """
+        ds = self._mesh.ds
+        if fid != ds.shape_to_index(face):
+            return False
+
+        # Match boundary nodes to existing nodes by location
+        nids = empty(sids.size, dtype=int64)
+        interior = sids == fid
+        for sid in unique(sids[~interior]):
+            if sid not in cache:
+                sub_shape = ds.index_to_shape(int(sid))
+                sub_ds = self._mesh.get_submesh(sub_shape).ds
+                cache[sid] = sub_ds.node_arrays() + (sub_shape.tol_max,)
+            ids, pnts, tol = cache[sid]
+            if ids.size == 0:
+                return False
+            mask = sids == sid
+            dist = linalg.norm(xyz[mask][:, None, :] - pnts[None, :, :],
+                               axis=2)
+            j = argmin(dist, axis=1)
+            if dist[arange(j.size), j].max() > tol:
+                return False
+            nids[mask] = ids[j]
+
+        ds = ds.object
+        nodes = [None] * sids.size
+        for k in nonzero(~interior)[0]:
+            nodes[k] = ds.FindNode(int(nids[k]))
+        for k in nonzero(interior)[0]:
+            nodes[k] = ds.AddNode(*xyz[k])
+            ds.SetNodeOnFace(nodes[k], fid, *uv[k])
+
+        for row, nn in zip(conn, nnodes):
+            elm = ds.AddFace(*[nodes[k] for k in row[:nn]])
+            ds.SetMeshElementOnShape(elm, fid)
+
+        return True
 
     def create_node_group(self, shape, name='node_group'):
         """
@@ -222,12 +505,199 @@ class MeshVehicle(object):
         """
         return MeshGroup(self.mesh, name, Mesh.FACE, shape)
 
-    def export_nastran(self, fn):
+    def export_nastran(self, fn, fmt='small', by_part=False):
         """
         Export the mesh to a Nastran bulk data file.
 
         :param str fn: The filename.
+        :param str fmt: The field format ('small', 'large', or 'free').
+        :param bool by_part: Option to write the elements part by part from
+            the part mesh groups, each with its own material and property
+            using the part ID.
 
         :return: None.
         """
-        nastran.export_bdf(self.mesh, fn)
+        parts = None
+        if by_part:
+            parts = GroupAPI.get_master().get_parts(order=True)
+        nastran.export_bdf(self.mesh, fn, fmt, parts=parts)
+
+    def save_snapshot(self, fn):
+        """
+        Save a binary snapshot of the mesh and its groups. The mesh can be
+        restored later with :func:`afem.exchange.snapshot.read_snapshot`
+        without remeshing.
+
+        :param str fn: The filename.
+
+        :return: *True* if done, *False* if not.
+        :rtype: bool
+        """
+        return snapshot.write_snapshot(self.mesh, fn)
+
+
+def _balance(groups, n):
+    """
+    Distribute groups of face indices over n bins using the number of faces.
+    """
+    bins = [[] for _ in range(n)]
+    for group in sorted(groups, key=len, reverse=True):
+        min(bins, key=len).extend(group)
+    return [fids for fids in bins if fids]
+
+
+def _mesh_faces(fn, specs, controls, fids):
+    """
+    Mesh faces of the master shape in a worker process. The first shape in
+    the BREP file is the master shape and the rest are the shapes the
+    controls apply to or use in their arguments.
+
+    :return: The face index, its shape index, and the node coordinates, node
+        parameters on the face, node shape indices, local connectivity, and
+        number of nodes of each element. The arrays are *None* if the face
+        could not be meshed.
+    :rtype: list(tuple)
+    """
+    shapes = list(read_brep(fn).shape_iter)
+    gen = MeshGen()
+    the_mesh = gen.create_mesh(shapes[0])
+    hyps = [Hypothesis.by_spec(gen, _unpack(spec, shapes)) for spec in specs]
+    for i, j in controls:
+        the_mesh.add_hypothesis(hyps[i], shapes[j])
+
+    faces = shapes[0].faces
+    results = []
+    for i in fids:
+        face = faces[i]
+        arrays = None
+        if gen.compute(the_mesh, face):
+            arrays = _face_arrays(the_mesh, face)
+        if arrays is None:
+            fid = the_mesh.ds.shape_to_index(face)
+            results.append((i, fid, None, None, None, None, None))
+        else:
+            results.append((i,) + arrays)
+
+    return results
+
+
+def _pack(value, shapes):
+    """
+    Replace the shapes in a hypothesis spec by references to the shapes sent
+    to the worker processes and the points by their coordinates.
+    """
+    if isinstance(value, Shape):
+        if value not in shapes:
+            shapes.append(value)
+        return _ShapeRef(shapes.index(value))
+    if isinstance(value, gp_Pnt):
+        return value.X(), value.Y(), value.Z()
+    if isinstance(value, (list, tuple)):
+        return type(value)([_pack(v, shapes) for v in value])
+    if isinstance(value, dict):
+        return {k: _pack(v, shapes) for k, v in value.items()}
+    return value
+
+
+def _unpack(value, shapes):
+    """
+    Replace the shape references in a hypothesis spec by the shapes read in a
+    worker process.
+    """
+    if isinstance(value, _ShapeRef):
+        return shapes[value.index]
+    if isinstance(value, (list, tuple)):
+        return type(value)([_unpack(v, shapes) for v in value])
+    if isinstance(value, dict):
+        return {k: _unpack(v, shapes) for k, v in value.items()}
+    return value
+
+
+def _face_arrays(the_mesh, face):
+    """
+    Gather the mesh of a face as arrays that do not depend on the node ID's.
+
+    :return: The shape index of the face, and the node coordinates, node
+        parameters, node shape indices, local connectivity, and number of
+        nodes of each element. Only the nodes inside the face get their
+        parameters and the rest are zero. *None* is returned if the face has
+        quadratic elements.
+    :rtype: tuple or None
+    """
+    ds = the_mesh.ds
+    fid = ds.shape_to_index(face)
+    _, conn, nnodes = the_mesh.get_submesh(face).ds.elm_arrays()
+    if conn.shape[1] > 4:
+        return None
+
+    mask = arange(conn.shape[1]) < nnodes[:, None]
+    nids, inv = unique(conn[mask], return_inverse=True)
+    local = zeros_like(conn)
+    local[mask] = inv
+    xyz = empty((nids.size, 3))
+    uv = zeros((nids.size, 2))
+    sids = empty(nids.size, dtype=int64)
+    helper = SMESH_MesherHelper(the_mesh.object)
+    for k, nid in enumerate(nids):
+        node = ds.object.FindNode(int(nid))
+        xyz[k] = node.X(), node.Y(), node.Z()
+        sids[k] = node.getshapeId()
+        if sids[k] == fid:
+            p = helper.GetNodeUV(face.object, node)
+            uv[k] = p.X(), p.Y()
+    return fid, xyz, uv, sids, local, nnodes
+
+
+def _copy_submesh(old_mesh, new_mesh, shape, helper):
+    """
+    Copy the nodes and elements of a sub-shape from the previous mesh
+    keeping their ID's. The nodes on the boundary of the sub-shape should
+    have been copied already.
+    """
+    old_ds = old_mesh.ds.object
+    ds = new_mesh.ds.object
+    indx = new_mesh.ds.shape_to_index(shape)
+    sub_ds = old_mesh.get_submesh(shape).ds
+
+    nids, xyz = sub_ds.node_arrays()
+    for nid, (x, y, z) in zip(nids.tolist(), xyz.tolist()):
+        node = ds.AddNodeWithID(x, y, z, nid)
+        if shape.is_vertex:
+            ds.SetNodeOnVertex(node, indx)
+        elif shape.is_edge:
+            u = helper.GetNodeU(shape.object, old_ds.FindNode(nid))
+            ds.SetNodeOnEdge(node, indx, u)
+        else:
+            uv = helper.GetNodeUV(shape.object, old_ds.FindNode(nid))
+            ds.SetNodeOnFace(node, indx, uv.X(), uv.Y())
+
+    if shape.is_vertex:
+        return
+    eids, conn, nnodes = sub_ds.elm_arrays()
+    for eid, row, nn in zip(eids.tolist(), conn.tolist(), nnodes.tolist()):
+        if shape.is_edge:
+            elm = ds.AddEdgeWithID(*(row[:nn] + [eid]))
+        else:
+            elm = ds.AddFaceWithID(*(row[:nn] + [eid]))
+        ds.SetMeshElementOnShape(elm, indx)
+
+
+def _has_sub_shapes(ds, shape):
+    """
+    Check that the shape and its faces, edges, and vertices are indexed in
+    the mesh data structure. Compounds are only checked by their sub-shapes.
+    """
+    shapes = shape.faces + shape.edges + shape.vertices
+    if not shape.is_compound:
+        shapes.append(shape)
+    return all(ds.shape_to_index(s) > 0 for s in shapes)
+
+
+def _set_computed(the_mesh, shapes):
+    """
+    Mark the sub-meshes of shapes filled outside of the generator as
+    computed.
+    """
+    for shape in shapes:
+        sub_mesh = the_mesh.get_submesh(shape)
+        sub_mesh.object.ComputeStateEngine(SMESH_subMesh.CHECK_COMPUTE)
@@ -27,3 +27,4 @@ from afem.topology.fix import *
 from afem.topology.modify import *
 from afem.topology.offset import *
 from afem.topology.props import *
+from afem.topology.tree import *
@@ -170,6 +170,16 @@ class BopAlgo(BopCore):
         """
         BOPAlgo_Options.SetParallelMode_(flag)
 
+    @staticmethod
+    def get_parallel_mode():
+        """
+        Global option for parallel execution of the Boolean operations.
+
+        :return: *True* if parallel execution is on, *False* if not.
+        :rtype: bool
+        """
+        return BOPAlgo_Options.GetParallelMode_()
+
     def debug(self, path='.'):
         """
         Export files for debugging Boolean operations.
@@ -1141,16 +1141,16 @@ class CylinderByAxis(object):
 
     :param float radius: The radius.
     :param float height: The height.
-    :param axis2: Not yet implemented. Solid will be constructed in xy-plane.
-
-    :raise NotImplementedError: If an axis is provided.
+    :param OCCT.gp.gp_Ax2 axis2: The coordinate system of the cylinder. The
+        cylinder starts at its origin and extends along its main direction.
+        If not provided the solid will be constructed in xy-plane.
     """
 
     def __init__(self, radius, height, axis2=None):
         if axis2 is None:
             self._builder = BRepPrimAPI_MakeCylinder(radius, height)
         else:
-            raise NotImplementedError('Providing Axis2 not yet implemented.')
+            self._builder = BRepPrimAPI_MakeCylinder(axis2, radius, height)
 
     @property
     def face(self):
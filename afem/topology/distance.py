@@ -20,15 +20,16 @@
 from OCCT.BRepExtrema import (BRepExtrema_DistShapeShape, BRepExtrema_IsVertex,
                               BRepExtrema_IsOnEdge, BRepExtrema_IsInFace)
 from OCCT.Extrema import Extrema_ExtFlag_MIN
+from numpy import argsort, array
 
 from afem.adaptor.entities import FaceAdaptorSurface
 from afem.config import logger
 from afem.geometry.check import CheckGeom
 from afem.geometry.entities import Point, Direction
-from afem.topology.entities import Shape, Vertex
+from afem.topology.entities import BBox, Shape, Vertex
 
 __all__ = ["DistanceShapeToShape", "DistanceShapeToShapes",
-           "DistancePointToShapes"]
+           "DistancePointToShapes", "NearestShapes"]
 
 
 class DistanceShapeToShape(object):
@@ -400,3 +401,131 @@ class DistancePointToShapes(DistanceShapeToShapes):
 
         v = Vertex.by_point(pnt)
         super(DistancePointToShapes, self).__init__(v, other_shapes)
+
+
+class NearestShapes(object):
+    """
+    Find the nearest shapes to a shape or point. The other shapes are visited
+    in order of the distance between their bounding boxes and the bounding box
+    of the main shape, which is a lower bound of the exact distance. Once this
+    lower bound is larger than the distance of the k-th nearest shape found
+    so far, or larger than the search radius, the remaining shapes are
+    skipped without computing their exact distance.
+
+    :param shape: The main shape or point.
+    :type shape: afem.topology.entities.Shape or point_like
+    :param list(afem.topology.entities.Shape) other_shapes: The other shapes.
+    :param int k: The number of nearest shapes to find. If *None* then all
+        shapes within the radius are found.
+    :param float radius: Option to only find shapes within this distance.
+
+    :raise ValueError: If both *k* and *radius* are *None*.
+    """
+
+    def __init__(self, shape, other_shapes, k=1, radius=None):
+        if k is None and radius is None:
+            raise ValueError('Either k or radius must be provided.')
+
+        if not isinstance(shape, Shape):
+            pnt = CheckGeom.to_point(shape)
+            if not pnt:
+                raise TypeError('Invalid shape or point type provided.')
+            shape = Vertex.by_point(pnt)
+
+        other_shapes = list(other_shapes)
+        bbox = BBox()
+        bbox.add_shape(shape)
+        lower = []
+        for shape2 in other_shapes:
+            bbox2 = BBox()
+            bbox2.add_shape(shape2)
+            if bbox.is_void or bbox2.is_void:
+                lower.append(0.)
+            else:
+                lower.append(bbox.distance(bbox2))
+        lower = array(lower)
+
+        # Branch and bound over the shapes sorted by their lower bound
+        results = []
+        nevals = 0
+        for i in argsort(lower, kind='stable'):
+            if radius is not None and lower[i] > radius:
+                break
+            if (k is not None and len(results) == k and
+                    lower[i] > results[-1][0]):
+                break
+            nevals += 1
+            dist = DistanceShapeToShape(shape, other_shapes[i])
+            if dist.nsol == 0:
+                logger.warning("Could not calculate distance to a shape in "
+                               "NearestShapes tool. Continuing...")
+                continue
+            d = dist.dmin
+            if radius is not None and d > radius:
+                continue
+            results.append((d, i))
+            results.sort()
+            if k is not None:
+                results = results[:k]
+
+        self._distances = [data[0] for data in results]
+        self._shapes = [other_shapes[data[1]] for data in results]
+        self._nevals = nevals
+        self._nskipped = len(other_shapes) - nevals
+
+    @property
+    def is_done(self):
+        """
+        :return: *True* if at least one shape was found, *False* if not.
+        :rtype: bool
+        """
+        return len(self._shapes) > 0
+
+    @property
+    def dmin(self):
+        """
+        :return: The distance to the nearest shape.
+        :rtype: float
+        """
+        return self._distances[0]
+
+    @property
+    def nearest_shape(self):
+        """
+        :return: The nearest shape.
+        :rtype: afem.topology.entities.Shape
+        """
+        return self._shapes[0]
+
+    @property
+    def sorted_distances(self):
+        """
+        :return: List of sorted distances of the shapes found.
+        :rtype: list(float)
+        """
+        return self._distances
+
+    @property
+    def sorted_shapes(self):
+        """
+        :return: List of the shapes found sorted by distance.
+        :rtype: list(afem.topology.entities.Shape)
+        """
+        return self._shapes
+
+    @property
+    def num_evaluated(self):
+        """
+        :return: The number of exact distance calculations.
+        :rtype: int
+        """
+        return self._nevals
+
+    @property
+    def num_skipped(self):
+        """
+        :return: The number of shapes skipped without an exact distance
+            calculation.
+        :rtype: int
+        """
+        return self._nskipped
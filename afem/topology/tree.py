@@ -0,0 +1,469 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import heapq
+
+from numpy import (abs as np_abs, arange, argmax, argsort, array, empty,
+                   inf, int64, maximum, minimum, sqrt, vstack, where, zeros)
+
+from afem.geometry.check import CheckGeom
+from afem.topology.entities import BBox, Shape
+
+__all__ = ["BBoxTree"]
+
+
+class BBoxTree(object):
+    """
+    Bounding volume hierarchy of axis-aligned bounding boxes. Items can be
+    shapes or any object with a *shape* attribute like a part. The tree
+    answers box, point, line, ray, and plane queries and nearest box queries
+    without testing every item. Items can be inserted and removed after the
+    tree is built, for example when a part is rebuilt. New items are checked
+    directly until enough changes have been made that the tree is rebuilt.
+
+    :param items: The items.
+    :type items: collections.Sequence(afem.topology.entities.Shape or
+        afem.structure.entities.Part)
+    :param float tol: Option to enlarge each box by this tolerance.
+    :param int leaf_size: The maximum number of items in a leaf of the tree.
+
+    :raise TypeError: If an item is not a shape and has no shape.
+    """
+
+    def __init__(self, items=(), tol=None, leaf_size=4):
+        self._tol = tol
+        self._leaf_size = max(int(leaf_size), 1)
+
+        # Boxes of each item by slot
+        self._items = []
+        self._slot = {}
+        self._lo = empty((0, 3))
+        self._hi = empty((0, 3))
+
+        # Tree nodes
+        self._nlo = empty((0, 3))
+        self._nhi = empty((0, 3))
+        self._left = empty(0, dtype=int64)
+        self._right = empty(0, dtype=int64)
+        self._start = empty(0, dtype=int64)
+        self._count = empty(0, dtype=int64)
+        self._order = empty(0, dtype=int64)
+
+        # Changes since last build
+        self._pending = []
+        self._nremoved = 0
+
+        boxes = [self._box(item) for item in items]
+        for item, (lo, hi) in zip(items, boxes):
+            self._slot[item] = len(self._items)
+            self._items.append(item)
+        if boxes:
+            self._lo = array([lo for lo, _ in boxes], dtype=float)
+            self._hi = array([hi for _, hi in boxes], dtype=float)
+        self.rebuild()
+
+    @property
+    def size(self):
+        """
+        :return: The number of items.
+        :rtype: int
+        """
+        return len(self._slot)
+
+    @property
+    def items(self):
+        """
+        :return: The items.
+        :rtype: list
+        """
+        return [item for item in self._items if item is not None]
+
+    @property
+    def num_nodes(self):
+        """
+        :return: The number of nodes in the tree.
+        :rtype: int
+        """
+        return self._left.size
+
+    def rebuild(self):
+        """
+        Rebuild the tree with the current items.
+
+        :return: None.
+        """
+        # Drop removed items
+        if self._nremoved > 0:
+            keep = [i for i, item in enumerate(self._items)
+                    if item is not None]
+            self._items = [self._items[i] for i in keep]
+            self._lo = self._lo[keep]
+            self._hi = self._hi[keep]
+            self._slot = {item: i for i, item in enumerate(self._items)}
+        self._pending = []
+        self._nremoved = 0
+
+        n = len(self._items)
+        self._order = arange(n)
+        nlo, nhi, left, right, start, count = [], [], [], [], [], []
+        if n == 0:
+            stack = []
+        else:
+            stack = [(0, n, -1, False)]
+        centers = (self._lo + self._hi) / 2.
+
+        # Split the items at the median of the longest axis of the centers
+        while stack:
+            i1, i2, parent, is_right = stack.pop()
+            indx = len(nlo)
+            if parent >= 0:
+                if is_right:
+                    right[parent] = indx
+                else:
+                    left[parent] = indx
+
+            slots = self._order[i1:i2]
+            nlo.append(self._lo[slots].min(axis=0))
+            nhi.append(self._hi[slots].max(axis=0))
+            left.append(-1)
+            right.append(-1)
+            start.append(i1)
+            count.append(i2 - i1)
+            if i2 - i1 <= self._leaf_size:
+                continue
+
+            pnts = centers[slots]
+            axis = argmax(pnts.max(axis=0) - pnts.min(axis=0))
+            self._order[i1:i2] = slots[argsort(pnts[:, axis], kind='stable')]
+            mid = (i1 + i2) // 2
+            stack.append((mid, i2, indx, True))
+            stack.append((i1, mid, indx, False))
+
+        self._nlo = array(nlo, dtype=float).reshape(-1, 3)
+        self._nhi = array(nhi, dtype=float).reshape(-1, 3)
+        self._left = array(left, dtype=int64)
+        self._right = array(right, dtype=int64)
+        self._start = array(start, dtype=int64)
+        self._count = array(count, dtype=int64)
+
+    def insert(self, item):
+        """
+        Insert an item. If the item is already in the tree its box is
+        updated.
+
+        :param item: The item.
+        :type item: afem.topology.entities.Shape or
+            afem.structure.entities.Part
+
+        :return: None.
+
+        :raise TypeError: If the item is not a shape and has no shape.
+        """
+        if item in self._slot:
+            self.remove(item)
+
+        lo, hi = self._box(item)
+        self._slot[item] = len(self._items)
+        self._pending.append(len(self._items))
+        self._items.append(item)
+        self._lo = vstack([self._lo, lo])
+        self._hi = vstack([self._hi, hi])
+        self._check_rebuild()
+
+    def remove(self, item):
+        """
+        Remove an item if present.
+
+        :param item: The item.
+        :type item: afem.topology.entities.Shape or
+            afem.structure.entities.Part
+
+        :return: *True* if removed, *False* if not found.
+        :rtype: bool
+        """
+        slot = self._slot.pop(item, None)
+        if slot is None:
+            return False
+        self._items[slot] = None
+        self._nremoved += 1
+        self._check_rebuild()
+        return True
+
+    def update(self, item):
+        """
+        Update the box of an item after its shape has changed.
+
+        :param item: The item.
+        :type item: afem.topology.entities.Shape or
+            afem.structure.entities.Part
+
+        :return: None.
+        """
+        self.insert(item)
+
+    def box_overlap(self, bbox):
+        """
+        Find the items whose boxes overlap the given box.
+
+        :param bbox: The box or a shape to build the box from.
+        :type bbox: afem.topology.entities.BBox or
+            afem.topology.entities.Shape
+
+        :return: The items.
+        :rtype: list
+        """
+        qlo, qhi = self._box(bbox)
+
+        def _test(lo, hi):
+            return ((lo <= qhi) & (qlo <= hi)).all(axis=1)
+
+        return self._search(_test)
+
+    def point_inside(self, pnt):
+        """
+        Find the items whose boxes contain the point.
+
+        :param point_like pnt: The point.
+
+        :return: The items.
+        :rtype: list
+
+        :raise TypeError: If *pnt* cannot be converted to a point.
+        """
+        p = self._to_xyz(pnt)
+
+        def _test(lo, hi):
+            return ((lo <= p) & (p <= hi)).all(axis=1)
+
+        return self._search(_test)
+
+    def line_crossing(self, line):
+        """
+        Find the items whose boxes are crossed by the line.
+
+        :param afem.geometry.entities.Line line: The line.
+
+        :return: The items.
+        :rtype: list
+
+        :raise TypeError: If *line* is not a line.
+        """
+        if not CheckGeom.is_line(line):
+            msg = 'Methods requires a Line instance.'
+            raise TypeError(msg)
+
+        ax1 = line.object.Position()
+        p = ax1.Location()
+        return self._crossing((p.X(), p.Y(), p.Z()), ax1.Direction(), -inf)
+
+    def ray_crossing(self, pnt, d):
+        """
+        Find the items whose boxes are crossed by the ray.
+
+        :param point_like pnt: The origin of the ray.
+        :param vector_like d: The direction of the ray.
+
+        :return: The items.
+        :rtype: list
+
+        :raise TypeError: If *pnt* cannot be converted to a point or *d* to
+            a direction.
+        """
+        d = CheckGeom.to_direction(d)
+        if not d:
+            raise TypeError('Invalid direction type provided.')
+        return self._crossing(pnt, d, 0.)
+
+    def plane_crossing(self, pln):
+        """
+        Find the items whose boxes are crossed by the plane.
+
+        :param afem.geometry.entities.Plane pln: The plane.
+
+        :return: The items.
+        :rtype: list
+
+        :raise TypeError: If *pln* is not a plane.
+        """
+        if not CheckGeom.is_plane(pln):
+            msg = 'Methods requires a Plane instance.'
+            raise TypeError(msg)
+
+        ax1 = pln.axis
+        p0 = self._to_xyz(ax1.origin)
+        d = ax1.Direction()
+        n = array([d.X(), d.Y(), d.Z()])
+
+        def _test(lo, hi):
+            c = (lo + hi) / 2.
+            r = ((hi - lo) / 2.).dot(np_abs(n))
+            return np_abs((c - p0).dot(n)) <= r
+
+        return self._search(_test)
+
+    def nearest(self, entity, k=1):
+        """
+        Find the items whose boxes are nearest to a point or box. The
+        distance to a box is zero if the point is inside it or the boxes
+        overlap, so this is a lower bound of the distance to the item.
+
+        :param entity: The point, box, or shape to build the box from.
+        :type entity: point_like or afem.topology.entities.BBox or
+            afem.topology.entities.Shape
+        :param int k: The number of items.
+
+        :return: List of the box distance and the item sorted by distance.
+        :rtype: list(tuple(float, object))
+        """
+        if isinstance(entity, (BBox, Shape)) or hasattr(entity, 'shape'):
+            qlo, qhi = self._box(entity)
+        else:
+            qlo = qhi = self._to_xyz(entity)
+
+        def _dist(lo, hi):
+            gap = maximum(maximum(qlo - hi, lo - qhi), 0.)
+            return sqrt((gap * gap).sum(axis=1))
+
+        # Keep the k best as a max-heap using negative distances
+        best = []
+
+        def _add(slots):
+            for slot, d in zip(slots, _dist(self._lo[slots],
+                                            self._hi[slots])):
+                if self._items[slot] is None:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-d, slot))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, slot))
+
+        # Items not yet in the tree
+        if self._pending:
+            _add(array(self._pending))
+
+        # Best-first search of the tree
+        heap = []
+        if self.num_nodes > 0:
+            d = _dist(self._nlo[:1], self._nhi[:1])[0]
+            heap.append((d, 0))
+        while heap:
+            d, i = heapq.heappop(heap)
+            if len(best) == k and d > -best[0][0]:
+                break
+            if self._left[i] < 0:
+                _add(self._leaf_slots(i))
+            else:
+                for j in (self._left[i], self._right[i]):
+                    dj = _dist(self._nlo[j:j + 1], self._nhi[j:j + 1])[0]
+                    heapq.heappush(heap, (dj, j))
+
+        results = sorted((-d, slot) for d, slot in best)
+        return [(d, self._items[slot]) for d, slot in results]
+
+    def _check_rebuild(self):
+        """
+        Rebuild the tree if there have been many changes since it was built.
+        """
+        nchanges = len(self._pending) + self._nremoved
+        if nchanges > max(16, len(self._items) // 4):
+            self.rebuild()
+
+    def _leaf_slots(self, i):
+        """
+        Item slots in a leaf.
+        """
+        return self._order[self._start[i]:self._start[i] + self._count[i]]
+
+    def _search(self, test):
+        """
+        Find the items whose boxes pass the test. The test takes arrays of
+        lower and upper box corners and returns a boolean array.
+        """
+        found = []
+        stack = [0] if self.num_nodes > 0 else []
+        while stack:
+            i = stack.pop()
+            if not test(self._nlo[i:i + 1], self._nhi[i:i + 1])[0]:
+                continue
+            if self._left[i] < 0:
+                slots = self._leaf_slots(i)
+                found.extend(slots[test(self._lo[slots], self._hi[slots])])
+            else:
+                stack.append(self._right[i])
+                stack.append(self._left[i])
+
+        if self._pending:
+            slots = array(self._pending)
+            found.extend(slots[test(self._lo[slots], self._hi[slots])])
+
+        items = [self._items[slot] for slot in sorted(found)]
+        return [item for item in items if item is not None]
+
+    def _crossing(self, pnt, d, tmin):
+        """
+        Find the items whose boxes are crossed by the line through the point
+        in the direction for parameters greater than *tmin*.
+        """
+        o = self._to_xyz(pnt)
+        d = array([d.X(), d.Y(), d.Z()])
+        parallel = d == 0.
+        d = where(parallel, 1., d)
+
+        def _test(lo, hi):
+            # Slab test with axes parallel to the line handled separately
+            t1 = (lo - o) / d
+            t2 = (hi - o) / d
+            inside = (lo <= o) & (o <= hi)
+            t_lo = where(parallel, where(inside, -inf, inf), minimum(t1, t2))
+            t_hi = where(parallel, where(inside, inf, -inf), maximum(t1, t2))
+            t_lo = maximum(t_lo.max(axis=1), tmin)
+            return t_lo <= t_hi.min(axis=1)
+
+        return self._search(_test)
+
+    def _box(self, item):
+        """
+        Lower and upper corners of the item box.
+        """
+        if isinstance(item, BBox):
+            bbox = item
+        else:
+            shape = item if isinstance(item, Shape) else getattr(item,
+                                                                 'shape',
+                                                                 None)
+            if not isinstance(shape, Shape):
+                raise TypeError('Item is not a shape and has no shape.')
+            bbox = BBox()
+            bbox.add_shape(shape)
+            if self._tol is not None:
+                bbox.enlarge(self._tol)
+
+        if bbox.is_void:
+            return zeros(3) + inf, zeros(3) - inf
+        return bbox.pmin.xyz, bbox.pmax.xyz
+
+    @staticmethod
+    def _to_xyz(pnt):
+        """
+        Convert a point to an array.
+        """
+        pnt = CheckGeom.to_point(pnt)
+        if not pnt:
+            raise TypeError('Invalid point type provided.')
+        return pnt.xyz
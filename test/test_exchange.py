@@ -17,11 +17,23 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import os
+import tempfile
 import unittest
 
+from numpy.testing import assert_allclose, assert_array_equal
+
 from afem.config import Settings
 from afem.exchange import ImportVSP
+from afem.exchange.nastran import (_format_column, _format_field,
+                                   _parse_float, export_bdf, import_bdf)
+from afem.exchange.snapshot import (MeshSnapshot, read_snapshot,
+                                    write_snapshot)
+from afem.geometry import PlaneByAxes
 from afem.graphics import Viewer
+from afem.smesh import MeshGen, NetgenAlgo2D, NetgenSimple2D
+from afem.structure import Beam1D, GroupAPI, MeshVehicle, SurfacePart
+from afem.topology import BoxBySize, EdgeByPoints, FaceByPlane
 
 Settings.log_to_console()
 
@@ -64,5 +76,194 @@ class TestImportVSP(unittest.TestCase):
         self.assertEqual(vsp_import.num_bodies, 1)
 
 
+class TestNastran(unittest.TestCase):
+    """
+    Test cases for afem.exchange.nastran.
+    """
+
+    def test_bdf_round_trip(self):
+        box = BoxBySize(10, 10, 10).solid
+        gen = MeshGen()
+        mesh = gen.create_mesh(box)
+        mesh.add_hypotheses([NetgenAlgo2D(gen), NetgenSimple2D(gen, 1.)])
+        self.assertTrue(gen.compute(mesh))
+
+        fd, fn = tempfile.mkstemp(suffix='.bdf')
+        os.close(fd)
+        try:
+            for fmt in ['small', 'large', 'free']:
+                self.assertTrue(export_bdf(mesh, fn, fmt))
+                new_gen = MeshGen()
+                new_mesh = new_gen.create_mesh()
+                import_bdf(new_mesh, fn)
+                self.assertEqual(new_mesh.num_nodes, mesh.num_nodes)
+                self.assertEqual(new_mesh.num_tris, mesh.num_tris)
+                self.assertEqual(new_mesh.num_quads, mesh.num_quads)
+        finally:
+            os.remove(fn)
+
+    def test_bdf_parts(self):
+        pln1 = PlaneByAxes((0., 0., 0.), 'xy').plane
+        pln2 = PlaneByAxes((0., 0., 5.), 'xy').plane
+        f1 = FaceByPlane(pln1, 0., 10., 0., 10.).face
+        f2 = FaceByPlane(pln2, 0., 10., 0., 5.).face
+        part1 = SurfacePart('plate1', f1)
+        part2 = SurfacePart('plate2', f2)
+        e = EdgeByPoints((0., 0., 10.), (10., 0., 10.)).edge
+        part3 = Beam1D('beam', e)
+        parts = [part1, part2, part3]
+        the_mesh = MeshVehicle(2.)
+        self.assertTrue(the_mesh.compute())
+
+        fd, fn = tempfile.mkstemp(suffix='.bdf')
+        os.close(fd)
+        try:
+            self.assertTrue(export_bdf(the_mesh.mesh, fn, parts=parts))
+            ranges, cards = {}, {}
+            with open(fn, 'r') as fin:
+                for line in fin:
+                    if line.startswith('$ PART'):
+                        data = line.split()
+                        ranges[data[5]] = tuple(int(d) for d in data[2:5])
+                    elif line[:1] != '$':
+                        name = line[:8].strip()
+                        fields = [line[i:i + 8].strip() for i in (8, 16)]
+                        cards.setdefault(name, []).append(fields)
+        finally:
+            os.remove(fn)
+            GroupAPI.reset()
+
+        pids = [p.id for p in parts]
+        self.assertEqual(len(set(pids)), 3)
+        self.assertEqual([int(c[0]) for c in cards['MAT1']], pids)
+        self.assertEqual([int(c[0]) for c in cards['PSHELL']], pids[:2])
+        self.assertEqual([int(c[0]) for c in cards['PBAR']], pids[2:])
+
+        # Each part has its own contiguous range of element ID's
+        sizes = [part1.face_group.size, part2.face_group.size,
+                 part3.edge_group.size]
+        eid = 1
+        for part, size in zip(parts, sizes):
+            self.assertGreater(size, 0)
+            pid, eid1, eid2 = ranges[part.name]
+            self.assertEqual(pid, part.id)
+            self.assertEqual((eid1, eid2), (eid, eid + size - 1))
+            eid += size
+
+        # Each element references the property of its part
+        elms = (cards.get('CTRIA3', []) + cards.get('CQUAD4', []) +
+                cards['CBAR'])
+        self.assertEqual(len(elms), sum(sizes))
+        for eid, pid in elms:
+            eid, pid = int(eid), int(pid)
+            part = [p for p in parts if
+                    ranges[p.name][1] <= eid <= ranges[p.name][2]]
+            self.assertEqual(len(part), 1)
+            self.assertEqual(pid, part[0].id)
+
+    def test_small_field_unchanged(self):
+        # Fields written by the original per-field small field writer
+        expected = [
+            (0.0, '     0.0'), (-1.0, '    -1.0'), (-0.5, '    -0.5'),
+            (123.456, ' 123.456'), (-123.456, '-123.456'),
+            (1.0e7, '   1.0+7'), (12345678.9, '1.2345+7'),
+            (-0.000123456, '-0.00012'), (1.234e-5, '1.234-05'),
+            (-1.234e-10, '-1.23-10'), (1.0e20, '   1++20'),
+            (3.14159265358979, '3.141592'), (-2.718281828, '-2.71828'),
+            (0.1234567891, '.1234567'), (1.0e-300, '   1-300'),
+            (7, '       7'), (-42, '     -42'), (None, '        '),
+            ('ab', '      ab')]
+        for value, field in expected:
+            self.assertEqual(_format_field(value, 'small'), field)
+            if value is not None and not isinstance(value, str):
+                self.assertEqual(_format_column([value], 'small'), [field])
+
+    def test_large_free_field_float(self):
+        values = [-0.5, -0.000123456, -1.234e-10, 1.234e-5, 1.0e20,
+                  -3.14159265358979e25, 12345678901234567.0,
+                  0.1234567891234567, -0.1234567891234567]
+        for value in values:
+            large = _format_field(value, 'large')
+            free = _format_field(value, 'free')
+            self.assertEqual(len(large), 16)
+            self.assertEqual(large.strip(), free)
+            self.assertEqual(_format_column([value], 'large'), [large])
+            self.assertEqual(_format_column([value], 'free'), [free])
+            self.assertAlmostEqual(_parse_float(free) / value, 1., 8)
+
+        self.assertEqual(_format_field(-0.5, 'large'), '            -0.5')
+        self.assertEqual(_format_field(-1.234e-10, 'large'),
+                         '-1.234000000E-10')
+        self.assertEqual(_format_field(1.0e20, 'free'), '1.000000000E+20')
+        self.assertEqual(_format_field(-0.1234567891234567, 'free'),
+                         '-1.234567891E-01')
+
+
+class TestSnapshot(unittest.TestCase):
+    """
+    Test cases for afem.exchange.snapshot.
+    """
+
+    def test_snapshot_round_trip(self):
+        box = BoxBySize(10, 10, 10).solid
+        gen = MeshGen()
+        mesh = gen.create_mesh(box)
+        mesh.add_hypotheses([NetgenAlgo2D(gen), NetgenSimple2D(gen, 2.)])
+        self.assertTrue(gen.compute(mesh))
+        face = box.faces[0]
+        face_group = mesh.create_group('face', mesh.FACE, face)
+        node_group = mesh.create_group('nodes', mesh.NODE, face)
+
+        fd, fn1 = tempfile.mkstemp(suffix='.snap')
+        os.close(fd)
+        fd, fn2 = tempfile.mkstemp(suffix='.snap')
+        os.close(fd)
+        try:
+            self.assertTrue(write_snapshot(mesh, fn1))
+            new_mesh = MeshGen().create_mesh(box)
+            groups = read_snapshot(new_mesh, fn1)
+
+            # Nodes, element types, and connectivity
+            nids1, xyz1 = mesh.ds.node_arrays()
+            nids2, xyz2 = new_mesh.ds.node_arrays()
+            assert_array_equal(nids2, nids1)
+            assert_allclose(xyz2, xyz1)
+            for arrays in ['edge_arrays', 'face_arrays']:
+                for a1, a2 in zip(getattr(mesh.ds, arrays)(),
+                                  getattr(new_mesh.ds, arrays)()):
+                    assert_array_equal(a2, a1)
+
+            # Sub-meshes by shape index
+            for shape in box.faces + box.edges:
+                eids1 = mesh.get_submesh(shape).ds.elm_arrays()[0]
+                eids2 = new_mesh.get_submesh(shape).ds.elm_arrays()[0]
+                self.assertGreater(eids1.size, 0)
+                assert_array_equal(eids2, eids1)
+
+            # Node shape indices and parameters
+            self.assertTrue(write_snapshot(new_mesh, fn2))
+            snap1, snap2 = MeshSnapshot(fn1), MeshSnapshot(fn2)
+            assert_array_equal(snap2.node_shapes, snap1.node_shapes)
+            assert_array_equal(snap2.elm_shapes, snap1.elm_shapes)
+            assert_array_equal(snap2.types, snap1.types)
+            assert_allclose(snap2.node_params, snap1.node_params)
+            self.assertTrue(snap1.node_params.any())
+            del snap1, snap2
+
+            # Group membership
+            self.assertEqual(set(groups), {'face', 'nodes'})
+            eids1 = face_group.elm_arrays()[0]
+            self.assertGreater(eids1.size, 0)
+            assert_array_equal(sorted(groups['face'].elm_arrays()[0]),
+                               sorted(eids1))
+            nids1 = node_group.node_arrays()[0]
+            self.assertGreater(nids1.size, 0)
+            assert_array_equal(sorted(groups['nodes'].node_arrays()[0]),
+                               sorted(nids1))
+        finally:
+            os.remove(fn1)
+            os.remove(fn2)
+
+
 if __name__ == '__main__':
     unittest.main()
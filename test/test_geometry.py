@@ -19,6 +19,7 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
 import unittest
 
+from afem.adaptor import GeomAdaptorCurve
 from afem.geometry import *
 
 
@@ -363,6 +364,126 @@ class TestGeometryCreate(unittest.TestCase):
         self.assertAlmostEqual(p.z, 5.)
 
 
+class TestGeometryEntities(unittest.TestCase):
+    """
+    Test cases for afem.geometry.entities.
+    """
+
+    def test_curve_eval_array(self):
+        qp = [(0, 0, 0), (5, 5, 0), (10, 0, 0)]
+        c = NurbsCurveByInterp(qp).curve
+        u = [0., 2.5, 5., 14.]
+        pnts = c.eval_array(u)
+        derivs = c.deriv_array(u, 2)
+        self.assertEqual(pnts.shape, (4, 3))
+        for ui, p, d in zip(u, pnts, derivs):
+            for x1, x2 in zip(c.eval(ui).xyz, p):
+                self.assertAlmostEqual(x1, x2)
+            for x1, x2 in zip(c.deriv(ui, 2).xyz, d):
+                self.assertAlmostEqual(x1, x2)
+
+    def test_surface_eval_array(self):
+        c1 = NurbsCurveByPoints([(0., 0., 0.), (10., 0., 0.)]).curve
+        c2 = NurbsCurveByPoints([(0., 5., 5.), (10., 5., 5.)]).curve
+        c3 = NurbsCurveByPoints([(0., 10., 0.), (10., 10., 0.)]).curve
+        s = NurbsSurfaceByInterp([c1, c2, c3], 2).surface
+        u, v = [0., 0.5, 1.], [0.25, 0.75]
+        pnts = s.eval_array(u, v, grid=True)
+        derivs = s.deriv_array(u, v, 0, 2, grid=True)
+        normals = s.norm_array(u[:2], v)
+        self.assertEqual(pnts.shape, (3, 2, 3))
+        self.assertEqual(normals.shape, (2, 3))
+        for i, ui in enumerate(u):
+            for j, vj in enumerate(v):
+                for x1, x2 in zip(s.eval(ui, vj).xyz, pnts[i, j]):
+                    self.assertAlmostEqual(x1, x2)
+                for x1, x2 in zip(s.deriv(ui, vj, 0, 2).xyz, derivs[i, j]):
+                    self.assertAlmostEqual(x1, x2)
+        for ui, vi, n in zip(u, v, normals):
+            vn = s.norm(ui, vi)
+            vn.normalize()
+            for x1, x2 in zip(vn.xyz, n):
+                self.assertAlmostEqual(x1, x2)
+
+    def test_curve_arc_length_table(self):
+        pnts = [(0., 0., 0.), (5., 5., 1.), (10., 0., 2.), (15., -5., 0.),
+                (20., 0., 1.)]
+        c = NurbsCurveByInterp(pnts).curve
+        adp_crv = GeomAdaptorCurve.by_curve(c)
+        table = c.arc_length_table()
+        self.assertIs(table, c.arc_length_table())
+        self.assertAlmostEqual(table.length, adp_crv.length)
+
+        u = [c.local_to_global_u(x) for x in (0., 0.2, 0.45, 0.8, 1.)]
+        s = table.distance(u)
+        for ui, si in zip(u, s):
+            self.assertAlmostEqual(si, adp_crv.arc_length(c.u1, ui))
+        for u1, u2 in zip(u, table.parameter(s)):
+            self.assertAlmostEqual(u1, u2, places=5)
+
+        builder = PointsAlongCurveByNumber(c, 5)
+        prms = builder.parameters
+        for u1, u2 in zip(prms[:-1], prms[1:]):
+            ds = adp_crv.arc_length(u1, u2)
+            self.assertAlmostEqual(ds, table.length / 4.)
+
+        c.segment(u[1], u[3])
+        self.assertIsNot(table, c.arc_length_table())
+        self.assertAlmostEqual(c.length, s[3] - s[1])
+
+
+class TestGeometryNurbs(unittest.TestCase):
+    """
+    Test cases for afem.geometry.nurbs.
+    """
+
+    def test_curve_kernel(self):
+        pnts = [(0., 0., 0.), (5., 5., 1.), (10., 0., 2.), (15., -5., 0.),
+                (20., 0., 1.)]
+        c = NurbsCurveByInterp(pnts).curve
+        c.set_cp(3, Point(*c.cp[2]), 2.)
+        kernel = NurbsCurveKernel.by_curve(c)
+        u = [c.u1, 0.25 * c.u2, 0.5 * c.u2, c.u2]
+        pnts = kernel.eval(u)
+        derivs = kernel.deriv(u, 2)
+        for ui, p, d in zip(u, pnts, derivs):
+            for x1, x2 in zip(c.eval(ui).xyz, p):
+                self.assertAlmostEqual(x1, x2)
+            for x1, x2 in zip(c.deriv(ui, 2).xyz, d):
+                self.assertAlmostEqual(x1, x2)
+
+        k2 = kernel.insert_knot(0.3 * c.u2, 2).elevate_degree(1)
+        self.assertEqual(k2.p, c.p + 1)
+        for x1, x2 in zip(pnts.ravel(), k2.eval(u).ravel()):
+            self.assertAlmostEqual(x1, x2)
+        c2 = k2.to_curve()
+        for ui, p in zip(u, pnts):
+            for x1, x2 in zip(c2.eval(ui).xyz, p):
+                self.assertAlmostEqual(x1, x2)
+
+    def test_surface_kernel(self):
+        c1 = NurbsCurveByPoints([(0., 0., 0.), (10., 0., 0.)]).curve
+        c2 = NurbsCurveByPoints([(0., 5., 5.), (10., 5., 5.)]).curve
+        c3 = NurbsCurveByPoints([(0., 10., 0.), (10., 10., 0.)]).curve
+        s = NurbsSurfaceByInterp([c1, c2, c3], 2).surface
+        kernel = NurbsSurfaceKernel.by_surface(s)
+        u, v = [0., 0.5, 1.], [0.25, 0.75]
+        pnts = kernel.eval(u, v, grid=True)
+        derivs = kernel.deriv(u, v, 0, 2, grid=True)
+        self.assertEqual(pnts.shape, (3, 2, 3))
+        for i, ui in enumerate(u):
+            for j, vj in enumerate(v):
+                for x1, x2 in zip(s.eval(ui, vj).xyz, pnts[i, j]):
+                    self.assertAlmostEqual(x1, x2)
+                for x1, x2 in zip(s.deriv(ui, vj, 0, 2).xyz, derivs[i, j]):
+                    self.assertAlmostEqual(x1, x2)
+
+        k2 = kernel.insert_vknot(0.5).elevate_degree(1, 1)
+        self.assertEqual((k2.p, k2.q), (kernel.p + 1, kernel.q + 1))
+        for x1, x2 in zip(pnts.ravel(), k2.eval(u, v, True).ravel()):
+            self.assertAlmostEqual(x1, x2)
+
+
 class TestGeometryDistance(unittest.TestCase):
     """
     Test cases for afem.geometry.distance.
@@ -465,6 +586,43 @@ class TestGeometryProject(unittest.TestCase):
         self.assertAlmostEqual(proj.nearest_param[1], 1.)
         self.assertAlmostEqual(proj.dmin, 1.)
 
+    def test_points_to_curve_projector(self):
+        pnts = [(0., 0., 0.), (5., 5., 1.), (10., 0., 2.), (15., -5., 0.),
+                (20., 0., 1.)]
+        c = NurbsCurveByInterp(pnts).curve
+        u = [c.local_to_global_u(x) for x in (0.1, 0.15, 0.5, 0.55, 0.9)]
+        pnts = [c.eval(ui).xyz + [0., 0., 0.5] for ui in u]
+        projector = PointsToCurveProjector(c)
+        params, points, dists = projector.project(pnts)
+        for p, ui, pi, di in zip(pnts, params, points, dists):
+            proj = ProjectPointToCurve(p, c)
+            self.assertAlmostEqual(ui, proj.nearest_param, places=5)
+            self.assertAlmostEqual(di, proj.dmin)
+            for x1, x2 in zip(proj.nearest_point.xyz, pi):
+                self.assertAlmostEqual(x1, x2, places=5)
+        params2, _, _ = projector.project(pnts, False)
+        self.assertEqual(projector.num_global, len(pnts))
+        for u1, u2 in zip(params, params2):
+            self.assertAlmostEqual(u1, u2, places=5)
+
+    def test_points_to_surface_projector(self):
+        c1 = NurbsCurveByPoints([(0., 0., 0.), (10., 0., 0.)]).curve
+        c2 = NurbsCurveByPoints([(0., 5., 5.), (10., 5., 5.)]).curve
+        c3 = NurbsCurveByPoints([(0., 10., 0.), (10., 10., 0.)]).curve
+        s = NurbsSurfaceByInterp([c1, c2, c3], 2).surface
+        pnts = [(2., 1., 3.), (2.5, 1.5, 3.), (8., 9., 1.), (11., 5., 7.)]
+        projector = PointsToSurfaceProjector(s)
+        params, points, dists = projector.project(pnts)
+        self.assertEqual(params.shape, (4, 2))
+        for p, uv, pi, di in zip(pnts, params, points, dists):
+            proj = ProjectPointToSurface(p, s)
+            if proj.success:
+                self.assertAlmostEqual(di, proj.dmin)
+            for x1, x2 in zip(s.eval(*uv).xyz, pi):
+                self.assertAlmostEqual(x1, x2)
+        # Nearest point of the last point is on the boundary
+        self.assertAlmostEqual(points[3][0], 10.)
+
     def test_project_curve_to_plane(self):
         qp = [Point(), Point(5., 5., 1.), Point(10., 5., 1.)]
         c = NurbsCurveByInterp(qp).curve
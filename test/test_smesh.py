@@ -0,0 +1,307 @@
+# This file is part of AFEM which provides an engineering toolkit for airframe
+# finite element modeling during conceptual design.
+#
+# Copyright (C) 2016-2018 Laughlin Research, LLC
+# Copyright (C) 2019-2020 Trevor Laughlin
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import os
+import time
+import unittest
+from collections import namedtuple
+from tempfile import TemporaryDirectory
+
+from OCCT.BRepMesh import BRepMesh_IncrementalMesh
+from numpy import array, sqrt
+from numpy.testing import assert_allclose, assert_array_equal
+
+from afem.geometry import PlaneByAxes
+from afem.smesh import *
+from afem.topology import FaceByPlane
+
+# Minimal stand-in for a part that has been initialized for meshing
+MeshedPart = namedtuple('MeshedPart', ['name', 'face_group'])
+
+
+def mixed_mesh():
+    """
+    Build a mesh of one quad and two tris on a 2 x 1 face in the xy-plane
+    along with a single edge element.
+    """
+    face = FaceByPlane(PlaneByAxes(axes='xy').plane, 0., 2., 0., 1.).face
+    gen = MeshGen()
+    the_mesh = gen.create_mesh(face)
+    ds = the_mesh.ds.object
+    fid = the_mesh.ds.shape_to_index(face)
+
+    nodes = []
+    for x, y in [(0., 0.), (1., 0.), (2., 0.), (0., 1.), (1., 1.), (2., 1.)]:
+        node = ds.AddNode(x, y, 0.)
+        ds.SetNodeOnFace(node, fid)
+        nodes.append(node)
+    for indx in [(0, 1, 4, 3), (1, 2, 5), (1, 5, 4)]:
+        elm = ds.AddFace(*[nodes[i] for i in indx])
+        ds.SetMeshElementOnShape(elm, fid)
+    ds.AddEdge(nodes[0], nodes[1])
+    return the_mesh, face
+
+
+class TestMeshArrays(unittest.TestCase):
+    """
+    Test cases for the array accessors in afem.smesh.entities.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.mesh, cls.face = mixed_mesh()
+
+    def check_nodes(self, arrays, nodes):
+        nids, xyz = arrays
+        nodes = list(nodes)
+        self.assertEqual(xyz.shape, (len(nodes), 3))
+        assert_array_equal(nids, [n.id for n in nodes])
+        assert_allclose(xyz, [[n.x, n.y, n.z] for n in nodes])
+
+    def check_elms(self, arrays, elms):
+        eids, conn, nnodes = arrays
+        elms = list(elms)
+        assert_array_equal(eids, [e.id for e in elms])
+        assert_array_equal(nnodes, [e.num_nodes for e in elms])
+        self.assertEqual(conn.shape, (len(elms), max(nnodes)))
+        for row, nn, elm in zip(conn, nnodes, elms):
+            assert_array_equal(row[:nn], elm.nids)
+            self.assertFalse(row[nn:].any())
+
+    def test_mesh_ds_arrays(self):
+        ds = self.mesh.ds
+        self.check_nodes(ds.node_arrays(), ds.node_iter)
+        self.check_elms(ds.edge_arrays(), ds.edge_iter)
+        self.check_elms(ds.face_arrays(), ds.faces_iter)
+
+        _, conn, nnodes = ds.face_arrays()
+        self.assertEqual(conn.shape, (3, 4))
+        assert_array_equal(nnodes, [4, 3, 3])
+        self.assertEqual(conn[1, 3], 0)
+        self.assertEqual(ds.edge_arrays()[1].shape, (1, 2))
+
+        # Split by element type
+        eids, conn, _ = ds.face_arrays()
+        arrays = ds.face_arrays(by_nnodes=True)
+        self.assertEqual(sorted(arrays), [3, 4])
+        assert_array_equal(arrays[4][0], eids[:1])
+        assert_array_equal(arrays[4][1], conn[:1])
+        assert_array_equal(arrays[3][0], eids[1:])
+        assert_array_equal(arrays[3][1], conn[1:, :3])
+        self.assertEqual(sorted(ds.edge_arrays(True)), [2])
+
+    def test_submesh_ds_arrays(self):
+        ds = self.mesh.get_submesh(self.face).ds
+        self.assertEqual(ds.num_nodes, 6)
+        self.assertEqual(ds.num_elms, 3)
+        self.check_nodes(ds.node_arrays(), ds.node_iter)
+        self.check_elms(ds.elm_arrays(), ds.elm_iter)
+
+    def test_mesh_group_arrays(self):
+        face_group = self.mesh.create_group('faces', Mesh.FACE, self.face)
+        node_group = self.mesh.create_group('nodes', Mesh.NODE, self.face)
+        self.assertEqual(face_group.size, 3)
+        self.assertEqual(node_group.size, 6)
+        self.check_elms(face_group.elm_arrays(), face_group.face_iter)
+        self.assertEqual(sorted(face_group.elm_arrays(True)), [3, 4])
+        self.check_nodes(node_group.node_arrays(), node_group.node_iter)
+        self.assertRaises(TypeError, node_group.elm_arrays)
+        self.assertRaises(TypeError, face_group.node_arrays)
+
+
+class TestHypotheses(unittest.TestCase):
+    """
+    Test cases for afem.smesh.hypotheses.
+    """
+
+    def test_spec(self):
+        face = FaceByPlane(PlaneByAxes(axes='xy').plane, 0., 1., 0., 1.).face
+        gen = MeshGen()
+        hyp = QuadrangleHypo2D(gen)
+        cls, args, kwargs, calls = hyp.spec
+        self.assertIs(cls, QuadrangleHypo2D)
+        self.assertEqual(calls, ())
+
+        hyp.set_enforced_nodes([face], [(0.5, 0.5, 0.)])
+        calls = hyp.spec[3]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][0], 'set_enforced_nodes')
+
+        new_hyp = Hypothesis.by_spec(MeshGen(), hyp.spec)
+        self.assertIsInstance(new_hyp, QuadrangleHypo2D)
+        self.assertEqual(new_hyp.spec[1:], hyp.spec[1:])
+
+        hyp = LocalLength1D(gen, 2.)
+        new_hyp = Hypothesis.by_spec(gen, hyp.spec)
+        self.assertAlmostEqual(new_hyp.local_length, 2.)
+
+
+class TestMeshQuality(unittest.TestCase):
+    """
+    Test cases for afem.smesh.quality.
+    """
+
+    def test_face_metrics_square(self):
+        xyz = array([[[0., 0., 0.], [1., 0., 0.], [1., 1., 0.], [0., 1., 0.]]])
+        metrics = face_metrics(xyz)
+        self.assertAlmostEqual(metrics['aspect_ratio'][0], 1.)
+        self.assertAlmostEqual(metrics['skew_angle'][0], 0.)
+        self.assertAlmostEqual(metrics['warp_angle'][0], 0.)
+        self.assertAlmostEqual(metrics['taper_ratio'][0], 0.)
+        self.assertAlmostEqual(metrics['jacobian'][0], 1.)
+        self.assertAlmostEqual(metrics['min_angle'][0], 90.)
+        self.assertAlmostEqual(metrics['max_angle'][0], 90.)
+
+    def test_face_metrics_tri(self):
+        xyz = array([[[0., 0., 0.], [1., 0., 0.], [0.5, sqrt(3.) / 2., 0.]],
+                     [[0., 0., 0.], [1., 0., 0.], [1., 1., 0.]]])
+        metrics = face_metrics(xyz)
+        self.assertAlmostEqual(metrics['aspect_ratio'][0], 1.)
+        self.assertAlmostEqual(metrics['skew_angle'][0], 0.)
+        self.assertAlmostEqual(metrics['min_angle'][0], 60.)
+        self.assertAlmostEqual(metrics['max_angle'][0], 60.)
+        self.assertAlmostEqual(metrics['aspect_ratio'][1], sqrt(3.))
+        self.assertAlmostEqual(metrics['min_angle'][1], 45.)
+        self.assertAlmostEqual(metrics['max_angle'][1], 90.)
+
+    def test_face_metrics_invalid(self):
+        self.assertRaises(ValueError, face_metrics, array([[[0., 0., 0.],
+                                                            [1., 0., 0.]]]))
+
+    def test_element_quality(self):
+        the_mesh, _ = mixed_mesh()
+        quad, tri, _ = the_mesh.ds.faces_iter
+        self.assertAlmostEqual(quad.aspect_ratio, 1.)
+        self.assertAlmostEqual(quad.skew_angle, 0.)
+        self.assertAlmostEqual(tri.aspect_ratio, sqrt(3.))
+        edge = next(the_mesh.ds.edge_iter)
+        self.assertRaises(ValueError, getattr, edge, 'aspect_ratio')
+
+    def test_mesh_quality(self):
+        the_mesh, face = mixed_mesh()
+        quad_eid, tri_eid1, tri_eid2 = the_mesh.ds.face_arrays()[0].tolist()
+        all_group = the_mesh.create_group('all', Mesh.FACE, face)
+        quad_group = the_mesh.create_group('quad', Mesh.FACE)
+        quad_group.object.GetGroupDS().Add(quad_eid)
+        parts = [MeshedPart('all', all_group), MeshedPart('quad', quad_group)]
+
+        quality = MeshQuality(the_mesh, parts)
+        self.assertEqual(quality.num_elms, 3)
+        self.assertEqual(quality.part_names, ['all', 'quad'])
+        assert_allclose(quality.values('min_angle', 'quad'), [90.])
+
+        # The tris are worse than the quad
+        worst = quality.worst('aspect_ratio', 2)
+        self.assertEqual({eid for eid, _ in worst}, {tri_eid1, tri_eid2})
+        self.assertAlmostEqual(worst[0][1], sqrt(3.))
+        worst = quality.worst('min_angle', 3)
+        self.assertEqual(worst[-1][0], quad_eid)
+        self.assertEqual(quality.worst('aspect_ratio', part='quad'),
+                         [(quad_eid, 1.)])
+
+        counts = quality.violations({'aspect_ratio': 1.5,
+                                     'min_angle': 50.})
+        self.assertEqual(counts, {'aspect_ratio': 2, 'min_angle': 2})
+        counts = quality.violations({'aspect_ratio': 1.5}, part='quad')
+        self.assertEqual(counts, {'aspect_ratio': 0})
+        counts = quality.violations()
+        self.assertEqual(set(counts), set(quality.metric_names))
+
+        counts, edges = quality.histogram('min_angle', [0., 50., 100.])
+        assert_array_equal(counts, [2, 1])
+        counts, edges = quality.part_histograms('min_angle', 2)
+        assert_allclose(edges, [45., 67.5, 90.])
+        assert_array_equal(counts['all'], [2, 1])
+        assert_array_equal(counts['quad'], [0, 1])
+
+
+class TestMeshCache(unittest.TestCase):
+    """
+    Test cases for afem.smesh.cache.
+    """
+
+    def test_key(self):
+        the_mesh, face = mixed_mesh()
+        gen = MeshGen()
+        hyp1 = QuadrangleHypo2D(gen)
+        hyp2 = QuadrangleHypo2D(gen)
+        key1 = MeshCache.key(the_mesh, [(hyp1, face)])
+        self.assertEqual(MeshCache.key(the_mesh, [(hyp2, face)]), key1)
+
+        # A triangulation of the shape is not part of the key
+        BRepMesh_IncrementalMesh(face.object, 0.1)
+        self.assertEqual(MeshCache.key(the_mesh, [(hyp1, face)]), key1)
+
+        # Changes made by setters are part of the key
+        hyp1.set_enforced_nodes([face], [(0.5, 0.5, 0.)])
+        key2 = MeshCache.key(the_mesh, [(hyp1, face)])
+        self.assertNotEqual(key2, key1)
+        hyp2.set_enforced_nodes([face], [(0.5, 0.5, 0.)])
+        self.assertEqual(MeshCache.key(the_mesh, [(hyp2, face)]), key2)
+        hyp2.set_enforced_nodes([face], [(0.25, 0.5, 0.)])
+        self.assertNotEqual(MeshCache.key(the_mesh, [(hyp2, face)]), key2)
+
+    def test_restore(self):
+        the_mesh, face = mixed_mesh()
+        with TemporaryDirectory() as tmp:
+            cache = MeshCache(tmp)
+            new_mesh = MeshGen().create_mesh(face)
+            self.assertFalse(cache.restore('key', new_mesh))
+            self.assertTrue(cache.store('key', the_mesh))
+            self.assertTrue(cache.restore('key', new_mesh))
+            self.assertEqual(new_mesh.num_nodes, the_mesh.num_nodes)
+            self.assertEqual(new_mesh.num_faces, the_mesh.num_faces)
+            sub_ds = new_mesh.get_submesh(face).ds
+            self.assertEqual(sub_ds.num_elms, 3)
+
+            stats = cache.stats
+            self.assertEqual(stats['hits'], 1)
+            self.assertEqual(stats['misses'], 1)
+            self.assertEqual(stats['evictions'], 0)
+            self.assertEqual(stats['entries'], 1)
+            self.assertGreater(stats['size'], 0)
+
+            cache.clear()
+            self.assertEqual(cache.num_entries, 0)
+
+    def test_eviction(self):
+        the_mesh, face = mixed_mesh()
+        with TemporaryDirectory() as tmp:
+            cache = MeshCache(tmp)
+            self.assertTrue(cache.store('a', the_mesh))
+            size = cache.size
+
+            # Room for two entries. Restoring an entry makes it the most
+            # recently used.
+            cache = MeshCache(tmp, 2 * size)
+            time.sleep(0.1)
+            self.assertTrue(cache.store('b', the_mesh))
+            time.sleep(0.1)
+            self.assertTrue(cache.restore('a', MeshGen().create_mesh(face)))
+            time.sleep(0.1)
+            self.assertTrue(cache.store('c', the_mesh))
+
+            names = sorted(os.listdir(tmp))
+            self.assertEqual(names, ['a.afm', 'c.afm'])
+            self.assertEqual(cache.stats['evictions'], 1)
+            self.assertEqual(cache.size, 2 * size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,12 +17,19 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+import os
 import unittest
+from tempfile import TemporaryDirectory
+
+from numpy import lexsort
+from numpy.testing import assert_allclose, assert_array_equal
 
 from afem.exchange import brep
+from afem.exchange.snapshot import MeshSnapshot, write_snapshot
 from afem.geometry import *
 from afem.oml import *
 from afem.structure import *
+from afem.structure.entities import _distance_bounds
 from afem.topology import *
 
 
@@ -117,6 +124,485 @@ class TestStructureEntities(unittest.TestCase):
             self.assertIsInstance(f, Face)
         self.assertIsInstance(self.fspar.face_compound, Compound)
 
+    def test_part_cut_holes_batch(self):
+        rib1 = RibByParameters('rib1', 0.15, 0.3, 0.65, 0.3, self.wing).part
+        rib2 = RibByParameters('rib2', 0.15, 0.3, 0.65, 0.3, self.wing).part
+        rib1.cut_holes(3, 1.)
+        rib2.cut_holes(3, 1., batch=True)
+        self.assertAlmostEqual(rib1.area, rib2.area, places=3)
+
+    def test_part_discard_by_distance(self):
+        spar = SparByParameters('spar', 0.15, 0.1, 0.15, 0.6, self.wing).part
+        for v in (0.2, 0.4):
+            rib = RibByParameters('rib', 0.1, v, 0.7, v, self.wing).part
+            spar.split(rib, False)
+        shape = spar.shape
+        faces = shape.faces
+        self.assertEqual(len(faces), 3)
+
+        # Compare to the exact distance at thresholds the bounds decide and
+        # at thresholds between the bounds where only the exact distance can
+        vertex = Vertex.by_point(self.wing.sref.eval(0.05, 0.05))
+        lower, upper = _distance_bounds(vertex, faces)
+        exact = [DistanceShapeToShape(vertex, f).dmin for f in faces]
+        values = [0., 1.e6]
+        undecided = 0
+        for lo, d, up in zip(lower, exact, upper):
+            self.assertLessEqual(lo, d + 1.e-7)
+            self.assertLessEqual(d, up + 1.e-7)
+            for t in ((lo + d) / 2., (d + up) / 2.):
+                values.append(t)
+                if lo <= t < up:
+                    undecided += 1
+        self.assertGreater(undecided, 0)
+
+        for t in values:
+            for method, keep in [(spar.discard_by_dmax, lambda x: x <= t),
+                                 (spar.discard_by_dmin, lambda x: x >= t)]:
+                spar.set_shape(shape)
+                expected = [f for f, d in zip(faces, exact) if keep(d)]
+                modified = method(vertex, t)
+                self.assertEqual(modified, len(expected) < len(faces))
+                kept = spar.shape.faces
+                self.assertEqual(len(kept), len(expected))
+                for f in expected:
+                    self.assertTrue(any(f.is_same(k) for k in kept))
+
+    def wing_box(self, suffix):
+        # Spars crossed by two ribs, a rib between the spars, and a rib aft
+        # of the rear spar
+        params = [('fspar', 0.15, 0.1, 0.15, 0.6),
+                  ('rspar', 0.65, 0.1, 0.65, 0.6),
+                  ('rib1', 0.1, 0.2, 0.7, 0.2),
+                  ('rib2', 0.1, 0.4, 0.7, 0.4),
+                  ('rib3', 0.25, 0.3, 0.55, 0.3),
+                  ('rib4', 0.75, 0.5, 0.95, 0.5)]
+        parts = []
+        for name, u1, v1, u2, v2 in params:
+            if name.endswith('spar'):
+                builder = SparByParameters
+            else:
+                builder = RibByParameters
+            part = builder(name + suffix, u1, v1, u2, v2, self.wing).part
+            parts.append(part)
+        return parts
+
+    def test_fuse_by_cref(self):
+        # Reference result testing all pairs of reference curves
+        ref = self.wing_box('_ref')
+        pairs = []
+        for i in range(len(ref) - 1):
+            others = []
+            for j in range(i + 1, len(ref)):
+                e1 = EdgeByCurve(ref[i].cref).edge
+                e2 = EdgeByCurve(ref[j].cref).edge
+                tol = max(ref[i].shape.tol_max, ref[j].shape.tol_max)
+                if IntersectShapes(e1, e2, fuzzy_val=tol).vertices:
+                    pairs.append((i, j))
+                    others.append(ref[j])
+            if others:
+                ref[i].fuse(*others)
+        self.assertEqual(pairs, [(0, 2), (0, 3), (1, 2), (1, 3)])
+
+        parts = self.wing_box('')
+        with self.assertLogs('afem', 'INFO') as logs:
+            self.assertTrue(FuseSurfacePartsByCref(parts).is_done)
+        found = [r.getMessage() for r in logs.records if
+                 r.getMessage().startswith('Found joint')]
+        expected = ['Found joint between {} and {}.'.format(parts[i].name,
+                                                            parts[j].name)
+                    for i, j in pairs]
+        self.assertEqual(found, expected)
+
+        for part, ref_part in zip(parts, ref):
+            self.assertEqual(part.shape.num_faces, ref_part.shape.num_faces)
+            self.assertEqual(part.shape.num_edges, ref_part.shape.num_edges)
+            self.assertAlmostEqual(part.area, ref_part.area, places=6)
+
+        # Same joints with the intersections tested in worker processes
+        parts = self.wing_box('_par')
+        with self.assertLogs('afem', 'INFO') as logs:
+            self.assertTrue(FuseSurfacePartsByCref(parts, nprocs=2).is_done)
+        found = [r.getMessage() for r in logs.records if
+                 r.getMessage().startswith('Found joint')]
+        expected = ['Found joint between {} and {}.'.format(parts[i].name,
+                                                            parts[j].name)
+                    for i, j in pairs]
+        self.assertEqual(found, expected)
+        for part, ref_part in zip(parts, ref):
+            self.assertEqual(part.shape.num_faces, ref_part.shape.num_faces)
+            self.assertAlmostEqual(part.area, ref_part.area, places=6)
+
+
+class TestStructureGroup(unittest.TestCase):
+    """
+    Test cases for afem.structure.group.
+    """
+
+    def tearDown(self):
+        GroupAPI.reset()
+
+    def test_get_shape_cache(self):
+        e1 = EdgeByPoints((0., 0., 0.), (10., 0., 0.)).edge
+        e2 = EdgeByPoints((0., 1., 0.), (10., 1., 0.)).edge
+        part1 = CurvePartByShape('part1', e1).part
+        shape = GroupAPI.get_shape()
+        self.assertIs(GroupAPI.get_shape(), shape)
+        self.assertEqual(shape.num_edges, 1)
+
+        part2 = CurvePartByShape('part2', e2).part
+        shape = GroupAPI.get_shape()
+        self.assertEqual(shape.num_edges, 2)
+
+        part1.set_shape(WireByEdges(e1).wire)
+        self.assertIsNot(GroupAPI.get_shape(), shape)
+
+        GroupAPI.remove_part(part2.name)
+        self.assertEqual(GroupAPI.get_shape().num_edges, 1)
+
+    def test_get_part_index(self):
+        GroupAPI.create_group('sub')
+        e = EdgeByPoints((0., 0., 0.), (10., 0., 0.)).edge
+        part1 = CurvePartByShape('part1', e, group='_master').part
+        part2 = CurvePartByShape('part2', e, group='sub').part
+        part3 = Beam1DByShape('part3', e, group='_master').part
+
+        master = GroupAPI.get_master()
+        self.assertIs(master.get_part('part1'), part1)
+        self.assertRaises(KeyError, master.get_part, 'part2')
+        self.assertIs(master.get_part('part2', True), part2)
+
+        parts = master.get_parts(order=True)
+        self.assertEqual([p.id for p in parts],
+                         [part1.id, part2.id, part3.id])
+        self.assertEqual(master.get_parts(rtype=Beam1D), [part3])
+
+        part1.set_name('renamed')
+        self.assertIs(master.get_part('renamed'), part1)
+
+    def test_fuse_groups_clusters(self):
+        group1 = GroupAPI.create_group('group1')
+        for i, x in enumerate([0., 10., 20., 30.]):
+            e = EdgeByPoints((x, -1., 0.), (x, 1., 0.)).edge
+            CurvePartByShape('part{}'.format(i), e, group=group1)
+        group2 = GroupAPI.create_group('group2')
+        e = EdgeByPoints((-5., 0., 0.), (35., 0., 0.)).edge
+        CurvePartByShape('long', e, group=group2)
+
+        bop = FuseGroups([group1, group2], nclusters=2)
+        self.assertTrue(bop.is_done)
+        self.assertEqual(bop.num_clusters, 2)
+        self.assertEqual(bop.shape.num_edges, 13)
+
+    def test_fuse_groups_parallel_mode(self):
+        group1 = GroupAPI.create_group('group1')
+        for i, x in enumerate([0., 10., 20., 30.]):
+            e = EdgeByPoints((x, -1., 0.), (x, 1., 0.)).edge
+            CurvePartByShape('part{}'.format(i), e, group=group1)
+        group2 = GroupAPI.create_group('group2')
+        e = EdgeByPoints((-5., 0., 0.), (35., 0., 0.)).edge
+        CurvePartByShape('long', e, group=group2)
+
+        # The option is applied in the worker processes
+        BopAlgo.set_parallel_mode(False)
+        try:
+            bop = FuseGroups([group1, group2], nclusters=2, nprocs=2)
+        finally:
+            BopAlgo.set_parallel_mode(True)
+        self.assertTrue(bop.is_done)
+        self.assertFalse(bop.parallel_mode)
+        self.assertEqual(bop.cluster_parallel_modes, [False, False])
+
+    def test_fuse_groups_shared_part(self):
+        # A part in both groups is still fused with the other group
+        group1 = GroupAPI.create_group('group1')
+        for i, x in enumerate([0., 10., 20., 30.]):
+            e = EdgeByPoints((x, -1., 0.), (x, 1., 0.)).edge
+            CurvePartByShape('part{}'.format(i), e, group=group1)
+        group2 = GroupAPI.create_group('group2')
+        e = EdgeByPoints((-5., 0., 0.), (35., 0., 0.)).edge
+        part = CurvePartByShape('long', e, group=group2).part
+        group1.add_parts(part)
+
+        bop = FuseGroups([group1, group2])
+        self.assertTrue(bop.is_done)
+        self.assertEqual(part.shape.num_edges, 5)
+        for other in group1.get_parts():
+            if other is not part:
+                self.assertEqual(other.shape.num_edges, 2)
+
+
+def _build_variant(params):
+    e = EdgeByPoints((0., 0., 0.), (params['x'], 0., 0.)).edge
+    part = CurvePartByShape('part', e).part
+    outputs = model_summary()
+    outputs['length'] = part.length
+    _VARIANTS.append(params)
+    outputs['num_variants'] = len(_VARIANTS)
+    return outputs
+
+
+def _crash_variant(params):
+    if params['x'] < 0.:
+        os._exit(1)
+    return _build_variant(params)
+
+
+_VARIANTS = []
+
+
+class TestStructureDoe(unittest.TestCase):
+    """
+    Test cases for afem.structure.doe.
+    """
+
+    def test_design_study(self):
+        table = DesignStudy.full_factorial(x=[1., 2.])
+        with TemporaryDirectory() as tmp:
+            study = DesignStudy(_build_variant, table, tmp)
+            self.assertTrue(study.run())
+            self.assertEqual(study.num_done, 2)
+            lengths = [r['outputs']['length'] for r in study.results]
+            self.assertAlmostEqual(lengths[1], 2.)
+
+            study = DesignStudy(_build_variant, table, tmp)
+            self.assertEqual(study.num_done, 2)
+            self.assertTrue(study.run())
+
+            # Results of other parameters or runs are not loaded
+            table = DesignStudy.full_factorial(x=[1., 3.])
+            study = DesignStudy(_build_variant, table[:1], tmp)
+            self.assertEqual([r['run'] for r in study.results], [0])
+            study = DesignStudy(_build_variant, table, tmp)
+            self.assertEqual(study.num_done, 1)
+
+    def test_design_study_processes(self):
+        # Each variant is built in a new process and a crashed process only
+        # fails its own variant
+        table = DesignStudy.full_factorial(x=[1., -1., 2.])
+        study = DesignStudy(_crash_variant, table, nprocs=2)
+        self.assertFalse(study.run())
+        self.assertEqual(study.num_done, 2)
+        self.assertEqual(study.num_failed, 1)
+        results = study.results
+        self.assertEqual(results[1]['status'], 'failed')
+        self.assertIsNotNone(results[1]['error'])
+        self.assertEqual(results[0]['outputs']['num_variants'], 1)
+        self.assertEqual(results[2]['outputs']['num_variants'], 1)
+
+
+class TestStructureGraph(unittest.TestCase):
+    """
+    Test cases for afem.structure.graph.
+    """
+
+    def tearDown(self):
+        GroupAPI.reset()
+
+    def test_build_graph(self):
+        GroupAPI.create_group('group1')
+        GroupAPI.create_group('group2')
+
+        def edge_at(x):
+            return EdgeByPoints((x, -1., 0.), (x, 1., 0.)).edge
+
+        graph = BuildGraph()
+        x = graph.add_param('x', 0.)
+        edge = graph.add_node('edge', edge_at, x)
+        part1 = graph.add_node('part1', CurvePartByShape, 'part1', edge,
+                               group='group1')
+        e2 = EdgeByPoints((-5., 0., 0.), (5., 0., 0.)).edge
+        part2 = graph.add_node('part2', CurvePartByShape, 'part2', e2,
+                               group='group2')
+        graph.add_node('fuse', FuseSurfaceParts, [part1.attr('part')],
+                       [part2.attr('part')])
+        self.assertEqual(graph.build(), 4)
+        self.assertEqual(graph.build(), 0)
+
+        graph.set_param('x', 1.)
+        graph.build()
+        self.assertEqual(graph.executed, ['edge', 'part1', 'fuse'])
+        self.assertEqual(GroupAPI.get_part('part2').shape.num_edges, 2)
+        self.assertEqual(len(GroupAPI.get_master().get_parts()), 2)
+
+    @staticmethod
+    def fuse_graph(path):
+        GroupAPI.create_group('group1')
+        GroupAPI.create_group('group2')
+        e1 = EdgeByPoints((0., -1., 0.), (0., 1., 0.)).edge
+        e2 = EdgeByPoints((-5., 0., 0.), (5., 0., 0.)).edge
+
+        graph = BuildGraph(path)
+        part1 = graph.add_node('part1', CurvePartByShape, 'part1', e1,
+                               group='group1')
+        part2 = graph.add_node('part2', CurvePartByShape, 'part2', e2,
+                               group='group2')
+        fuse = graph.add_node('fuse', FuseSurfaceParts,
+                              [part1.attr('part')], [part2.attr('part')])
+        return graph, fuse
+
+    def test_build_graph_path(self):
+        with TemporaryDirectory() as tmp:
+            graph, _ = self.fuse_graph(tmp)
+            self.assertEqual(graph.build(), 3)
+            self.assertEqual(graph.restored, [])
+
+            # The join is read from disk in a new graph
+            GroupAPI.reset()
+            graph, _ = self.fuse_graph(tmp)
+            self.assertEqual(graph.build(), 3)
+            self.assertEqual(graph.executed, ['part1', 'part2'])
+            self.assertEqual(graph.restored, ['fuse'])
+            self.assertIsNone(graph.get_result('fuse'))
+            for name in ('part1', 'part2'):
+                part = GroupAPI.get_part(name, '_master', True)
+                self.assertEqual(part.shape.num_edges, 2)
+
+            # A node referred to by another node is executed so its result
+            # can be used
+            graph.add_node('is_done', getattr, graph.get_node('fuse'),
+                           'is_done')
+            graph.build()
+            self.assertEqual(graph.executed, ['fuse', 'is_done'])
+            self.assertTrue(graph.get_result('is_done'))
+
+            GroupAPI.reset()
+            graph, fuse = self.fuse_graph(tmp)
+            graph.add_node('is_done', getattr, fuse, 'is_done')
+            graph.build()
+            self.assertEqual(graph.restored, [])
+            self.assertTrue(graph.get_result('is_done'))
+
+    def test_build_graph_duplicate_names(self):
+        e = EdgeByPoints((0., 0., 0.), (1., 0., 0.)).edge
+        other = CurvePartByShape('part', e, group='_master').part
+
+        graph = BuildGraph()
+        node = graph.add_node('part', CurvePartByShape, 'part', e,
+                              group='_master')
+        graph.build()
+        node.invalidate()
+        graph.build()
+
+        # Only the part created by the node is replaced
+        parts = GroupAPI.get_master().get_parts()
+        self.assertEqual(len(parts), 2)
+        self.assertIn(other, parts)
+        self.assertIn(node.result.part, parts)
+        self.assertEqual(other.groups, [GroupAPI.get_master()])
+
+
+def _elm_set(group):
+    eids, conn, nnodes = group.elm_arrays()
+    return {(eid, tuple(row[:nn])) for eid, row, nn in
+            zip(eids.tolist(), conn.tolist(), nnodes.tolist())}
+
+
+class TestStructureMesh(unittest.TestCase):
+    """
+    Test cases for afem.structure.mesh.
+    """
+
+    def setUp(self):
+        pln1 = PlaneByAxes((0., 0., 0.), 'xy').plane
+        pln2 = PlaneByAxes((0., 5., 0.), 'xz').plane
+        f1 = FaceByPlane(pln1, 0., 10., 0., 10.).face
+        f2 = FaceByPlane(pln2, 0., 10., -5., 5.).face
+        self.part1 = SurfacePart('plate1', f1)
+        self.part2 = SurfacePart('plate2', f2)
+        FuseSurfaceParts([self.part1], [self.part2])
+
+    def tearDown(self):
+        GroupAPI.reset()
+
+    def test_compute_check_quality(self):
+        the_mesh = MeshVehicle(1.)
+        self.assertTrue(the_mesh.compute(check_quality=True))
+        quality = the_mesh.quality
+        self.assertIs(the_mesh.quality, quality)
+        self.assertEqual(quality.num_elms, the_mesh.mesh.num_faces)
+        self.assertEqual(quality.part_names, ['plate1', 'plate2'])
+        values = quality.values('aspect_ratio', 'plate1')
+        self.assertEqual(values.size, self.part1.face_group.size)
+        self.assertGreaterEqual(values.min(), 1.)
+
+    def check_conformal(self, the_mesh):
+        # Both plates use the nodes on their shared edges
+        edges = self.part1.shared_edges(self.part2)
+        self.assertGreater(len(edges), 0)
+        for part in [self.part1, self.part2]:
+            conn = part.face_group.elm_arrays()[1]
+            used = set(conn[conn > 0].tolist())
+            for edge in edges:
+                nids = the_mesh.mesh.get_submesh(edge).ds.node_arrays()[0]
+                self.assertGreater(nids.size, 0)
+                self.assertTrue(used.issuperset(nids.tolist()))
+
+    def test_compute_parallel(self):
+        serial = MeshVehicle(1.)
+        self.assertTrue(serial.compute())
+        sizes = [self.part1.face_group.size, self.part2.face_group.size,
+                 self.part1.node_group.size, self.part2.node_group.size]
+        self.check_conformal(serial)
+
+        parallel = MeshVehicle(1.)
+        self.assertTrue(parallel.compute(nprocs=2))
+        self.assertEqual(parallel.mesh.num_nodes, serial.mesh.num_nodes)
+        self.assertEqual(parallel.mesh.num_tris, serial.mesh.num_tris)
+        self.assertEqual(parallel.mesh.num_quads, serial.mesh.num_quads)
+        self.assertEqual([self.part1.face_group.size,
+                          self.part2.face_group.size,
+                          self.part1.node_group.size,
+                          self.part2.node_group.size], sizes)
+        self.check_conformal(parallel)
+
+        # Merged nodes keep their parameters on the face
+        shapes1, params1 = self.node_params(serial)
+        shapes2, params2 = self.node_params(parallel)
+        assert_array_equal(shapes1, shapes2)
+        assert_allclose(params1, params2, atol=1.e-7)
+
+    @staticmethod
+    def node_params(the_mesh):
+        # Node shapes and parameters ordered by node location
+        with TemporaryDirectory() as tmp:
+            fn = os.path.join(tmp, 'mesh.snap')
+            write_snapshot(the_mesh.mesh, fn)
+            snap = MeshSnapshot(fn)
+            order = lexsort(snap.xyz.round(6).T[::-1])
+            shapes = snap.node_shapes[order]
+            params = snap.node_params[order]
+            del snap
+        return shapes, params
+
+    def test_update(self):
+        pln = PlaneByAxes((0., 0., 20.), 'xy').plane
+        f3 = FaceByPlane(pln, 0., 10., 0., 10.).face
+        part3 = SurfacePart('plate3', f3)
+        the_mesh = MeshVehicle(1.)
+        self.assertTrue(the_mesh.compute())
+        nids3 = part3.node_group.node_arrays()[0]
+        elms3 = _elm_set(part3.face_group)
+        elms1 = _elm_set(self.part1.face_group)
+
+        # Cut a hole in the upper face of the second plate. Its neighbours
+        # are the faces sharing the intersection edges.
+        box = BoxBy2Points((4., 4., 2.), (6., 6., 3.)).solid
+        self.assertTrue(self.part2.cut(box))
+        the_mesh.update()
+        self.assertTrue(the_mesh.compute())
+
+        # The separate plate keeps its node and element ID's
+        new_nids3 = part3.node_group.node_arrays()[0]
+        assert_array_equal(sorted(new_nids3), sorted(nids3))
+        self.assertEqual(_elm_set(part3.face_group), elms3)
+
+        # The neighbouring faces are remeshed and stay conformal
+        new_elms1 = _elm_set(self.part1.face_group)
+        self.assertGreater(len(new_elms1), 0)
+        self.assertNotEqual(new_elms1, elms1)
+        self.check_conformal(the_mesh)
+
 
 class TestStructureCreate(unittest.TestCase):
     """
@@ -324,6 +810,26 @@ class TestStructureCreate(unittest.TestCase):
         for rib in builder.parts:
             self.assertIsInstance(rib, Rib)
 
+    def test_ribs_between_planes_by_number_nprocs(self):
+        builder = SparByParameters('fspar', 0.15, 0.15, 0.15, 0.5, self.wing)
+        fspar = builder.part
+        builder = SparByParameters('rspar', 0.65, 0.15, 0.65, 0.5, self.wing)
+        rspar = builder.part
+        pln1 = PlaneByAxes(fspar.cref.p1, 'xz').plane
+        pln2 = PlaneByAxes(fspar.cref.p2, 'xz').plane
+        serial = RibsBetweenPlanesByNumber('rib', pln1, pln2, 5, fspar,
+                                           rspar, self.wing).parts
+        parallel = RibsBetweenPlanesByNumber('prib', pln1, pln2, 5, fspar,
+                                             rspar, self.wing,
+                                             nprocs=2).parts
+        self.assertEqual([rib.name for rib in parallel],
+                         ['prib 1', 'prib 2', 'prib 3', 'prib 4', 'prib 5'])
+        for rib1, rib2 in zip(serial, parallel):
+            self.assertIsInstance(rib2, Rib)
+            self.assertEqual(rib2.id, rib1.id + 5)
+            self.assertAlmostEqual(rib1.area, rib2.area)
+            self.assertAlmostEqual(rib1.cref.length, rib2.cref.length)
+
     def test_ribs_between_planes_by_distance(self):
         builder = SparByParameters('fspar', 0.15, 0.15, 0.15, 0.5, self.wing)
         fspar = builder.part
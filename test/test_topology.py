@@ -565,6 +565,47 @@ class TestTopologyDistance(unittest.TestCase):
         self.assertAlmostEqual(tool.sorted_distances[0], 5.)
         self.assertAlmostEqual(tool.sorted_distances[1], 10.)
 
+    def test_nearest_shapes(self):
+        v1 = VertexByPoint((0., 0., 0.)).vertex
+        others = [VertexByPoint((x, 0., 0.)).vertex for x in range(10, 0, -1)]
+        tool = NearestShapes(v1, others, k=2)
+        self.assertAlmostEqual(tool.dmin, 1.)
+        self.assertAlmostEqual(tool.sorted_distances[1], 2.)
+        self.assertEqual(tool.num_evaluated + tool.num_skipped, 10)
+        self.assertGreater(tool.num_skipped, 0)
+
+        tool = NearestShapes((0., 0., 0.), others, k=None, radius=3.5)
+        self.assertEqual(len(tool.sorted_shapes), 3)
+
+
+class TestTopologyTree(unittest.TestCase):
+    """
+    Test cases for afem.topoloy.tree.
+    """
+
+    def test_bbox_tree(self):
+        boxes = [BoxBy2Points((i, 0., 0.), (i + 0.5, 1., 1.)).solid
+                 for i in range(20)]
+        tree = BBoxTree(boxes)
+        self.assertEqual(tree.size, 20)
+
+        found = tree.point_inside((3.25, 0.5, 0.5))
+        self.assertEqual(len(found), 1)
+        self.assertTrue(found[0].is_same(boxes[3]))
+
+        pln = PlaneByAxes((10.25, 0., 0.), 'yz').plane
+        self.assertEqual(len(tree.plane_crossing(pln)), 1)
+        found = tree.ray_crossing((5.25, 0.5, 0.5), (1., 0., 0.))
+        self.assertEqual(len(found), 15)
+
+        d, shape = tree.nearest((-2., 0.5, 0.5))[0]
+        self.assertTrue(shape.is_same(boxes[0]))
+
+        tree.remove(boxes[0])
+        self.assertEqual(tree.size, 19)
+        d, shape = tree.nearest((-2., 0.5, 0.5))[0]
+        self.assertTrue(shape.is_same(boxes[1]))
+
 
 class TestTopologyExplore(unittest.TestCase):
     """